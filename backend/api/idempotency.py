@@ -0,0 +1,130 @@
+# api/idempotency.py
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+MAX_KEY_LENGTH = 255
+# Conflicts that may clear up on retry; replaying them would make them permanent
+TRANSIENT_STATUSES = (status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS)
+
+def request_fingerprint(request):
+    """sha256 of method, path and body; uploaded files count by name and size"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {key: values for key, values in data.lists()}
+    payload = json.dumps(
+        {'method': request.method, 'path': request.path, 'data': data},
+        sort_keys=True,
+        default=lambda value: f"{getattr(value, 'name', value)}:{getattr(value, 'size', '')}"
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def lock_key(user, key, fingerprint):
+    """
+    Insert or row-lock (user, key); must run inside transaction.atomic().
+    A second request with the same key waits here until the first one's
+    transaction ends, then sees its stored response (or nothing, if it
+    rolled back). Returns (record, True) if this request should run the view,
+    or (completed record, False) if not.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+    
+    while True:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    request_hash=fingerprint,
+                    created_at=now,
+                    expires_at=expires_at
+                )
+            return record, True
+        except IntegrityError:
+            pass
+        
+        record = IdempotencyKey.objects.select_for_update().filter(user=user, key=key).first()
+        if record is None:
+            # Purged in the meantime; try to create it again
+            continue
+        
+        if record.expires_at > now and record.status_code is not None:
+            return record, False
+        
+        # Expired, so the key is free to be used again
+        record.request_hash = fingerprint
+        record.status_code = None
+        record.response_body = None
+        record.etag = ''
+        record.created_at = now
+        record.expires_at = expires_at
+        return record, True
+
+def replay(record):
+    response = Response(record.response_body, status=record.status_code)
+    if record.etag:
+        response['ETag'] = record.etag
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(view):
+    """
+    Honour an Idempotency-Key header on a mutating function view. The first
+    response is stored per (user, key) and retries get it back without the
+    view running again; the view runs inside the same transaction as the
+    stored response. Place it below @permission_classes.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key or request.method in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        fingerprint = request_fingerprint(request)
+        
+        # The key row, the view's writes and the stored response commit (or
+        # roll back) together, so a crash can never leave a key whose writes
+        # landed without a response to replay
+        with transaction.atomic():
+            record, claimed = lock_key(request.user, key, fingerprint)
+            
+            if not claimed:
+                if record.request_hash != fingerprint:
+                    return Response(
+                        {'error': 'This Idempotency-Key was already used for a different request.'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                return replay(record)
+            
+            response = view(request, *args, **kwargs)
+            
+            if response.status_code >= 500 or response.status_code in TRANSIENT_STATUSES:
+                # Nothing reliable to replay; let the client retry for real
+                record.delete()
+            else:
+                record.status_code = response.status_code
+                record.response_body = getattr(response, 'data', None)
+                record.etag = response.get('ETag', '')
+                record.save()
+        return response
+    
+    return wrapper
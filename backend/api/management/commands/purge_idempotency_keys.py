@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.models import IdempotencyKey
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per delete statement")
+    
+    def handle(self, *args, **options):
+        now = timezone.now()
+        purged = 0
+        while True:
+            batch = list(IdempotencyKey.objects.filter(
+                expires_at__lte=now
+            ).values_list('id', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            deleted, _ = IdempotencyKey.objects.filter(id__in=batch).delete()
+            purged += deleted
+        
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} expired idempotency keys"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from api.models import User, hash_email
+
+class Command(BaseCommand):
+    help = "Recompute User.email_hash with the current EMAIL_HASH_KEY"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help="Users per bulk update")
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users = []
+        updated = 0
+        for user in User.objects.only('id', 'email').iterator(chunk_size=batch_size):
+            user.email_hash = hash_email(user.email) if user.email else ''
+            users.append(user)
+            if len(users) >= batch_size:
+                User.objects.bulk_update(users, ['email_hash'])
+                updated += len(users)
+                users = []
+        if users:
+            User.objects.bulk_update(users, ['email_hash'])
+            updated += len(users)
+        
+        self.stdout.write(self.style.SUCCESS(f"Rehashed {updated} user emails"))
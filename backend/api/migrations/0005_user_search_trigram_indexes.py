@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:23
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.db.models.functions.text
+from django.db import migrations
+
+# Requires PostgreSQL with the pg_trgm contrib extension available; it is a
+# trusted extension on PostgreSQL 13+, so the migration role needs CREATE on
+# the database (or a superuser must run CREATE EXTENSION pg_trgm beforehand).
+# On other databases the extension and indexes are skipped and user search
+# falls back to plain scans.
+TRIGRAM_INDEXES = [
+    django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('username'), name='gin_trgm_ops'), name='api_user_username_trgm'),
+    django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), name='api_user_email_trgm'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # gin_trgm_ops only exists on PostgreSQL
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    User = apps.get_model('api', 'User')
+    for index in TRIGRAM_INDEXES:
+        schema_editor.add_index(User, index)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    User = apps.get_model('api', 'User')
+    for index in TRIGRAM_INDEXES:
+        schema_editor.remove_index(User, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_userprofile_has_completed_onboarding'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+    
+    operations = [
+        # No-op on databases other than PostgreSQL
+        TrigramExtension(),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name='user', index=index) for index in TRIGRAM_INDEXES
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:26
+
+import hashlib
+from django.db import migrations, models
+
+
+def backfill_email_hashes(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    
+    users = []
+    for user in User.objects.only('id', 'email').iterator(chunk_size=2000):
+        user.email_hash = hashlib.sha256(user.email.strip().lower().encode('utf-8')).hexdigest() if user.email else ''
+        users.append(user)
+        if len(users) >= 2000:
+            User.objects.bulk_update(users, ['email_hash'])
+            users = []
+    if users:
+        User.objects.bulk_update(users, ['email_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_user_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_email_hashes, migrations.RunPython.noop),
+    ]
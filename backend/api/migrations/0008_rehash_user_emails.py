@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-19 13:10
+
+import hashlib
+import hmac
+from django.conf import settings
+from django.db import migrations
+
+
+def _rehash(apps, keyed):
+    User = apps.get_model('api', 'User')
+    key = (settings.EMAIL_HASH_KEY or settings.SECRET_KEY).encode('utf-8')
+    
+    users = []
+    for user in User.objects.only('id', 'email').iterator(chunk_size=2000):
+        digest = hashlib.sha256(user.email.strip().lower().encode('utf-8')).hexdigest() if user.email else ''
+        if digest and keyed:
+            digest = hmac.new(key, digest.encode('utf-8'), hashlib.sha256).hexdigest()
+        user.email_hash = digest
+        users.append(user)
+        if len(users) >= 2000:
+            User.objects.bulk_update(users, ['email_hash'])
+            users = []
+    if users:
+        User.objects.bulk_update(users, ['email_hash'])
+
+
+def key_email_hashes(apps, schema_editor):
+    _rehash(apps, keyed=True)
+
+
+def unkey_email_hashes(apps, schema_editor):
+    _rehash(apps, keyed=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_idempotency_keys'),
+    ]
+    
+    operations = [
+        migrations.RunPython(key_email_hashes, unkey_email_hashes),
+    ]
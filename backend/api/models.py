@@ -1,15 +1,51 @@
+import hashlib
+import hmac
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 from django.dispatch import receiver
 from django.db.models.signals import post_save
+from django.utils import timezone
+
+def contact_hash(email_digest):
+    """
+    Stored form of a client's email digest (sha256 hex of the trimmed,
+    lowercased email): an HMAC keyed with EMAIL_HASH_KEY, so stored hashes
+    cannot be matched against a dictionary of emails without the key.
+    """
+    key = settings.EMAIL_HASH_KEY or settings.SECRET_KEY
+    return hmac.new(key.encode('utf-8'), email_digest.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def hash_email(email):
+    """Keyed hash of a normalized (trimmed, lowercased) email, as kept in User.email_hash"""
+    return contact_hash(hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest())
 
 # Create models here.
 class User(AbstractUser):
     email = models.EmailField(unique=True)
-
+    email_hash = models.CharField(max_length=64, db_index=True, blank=True, editable=False)
+    
+    class Meta(AbstractUser.Meta):
+        # Trigram indexes over the same UPPER() expression icontains compiles to,
+        # so user search can use them instead of scanning the table
+        indexes = [
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='api_user_username_trgm'),
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='api_user_email_trgm'),
+        ]
+    
     def __str__(self):
         return self.email
     
+    def save(self, *args, **kwargs):
+        self.email_hash = hash_email(self.email) if self.email else ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'email' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'email_hash'}
+        super().save(*args, **kwargs)
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
@@ -20,6 +56,30 @@ class UserProfile(models.Model):
         return f"{self.user.username}'s profile"
 
 
+class IdempotencyKey(models.Model):
+    """
+    The response to a mutating request sent with an Idempotency-Key header,
+    replayed when the client retries with the same key (see api/idempotency.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    # sha256 of method, path and body, so a key reused for another request is rejected
+    request_hash = models.CharField(max_length=64)
+    # Set in the same transaction as the view's writes; null only inside it
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    etag = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}:{self.key} ({self.status_code or 'in progress'})"
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
@@ -1,3 +1,72 @@
 from django.test import TestCase
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from .idempotency import idempotent
+from .models import IdempotencyKey, User
 
-# Create your tests here.
+calls = []
+
+@api_view(['POST'])
+@idempotent
+def create_view(request):
+    calls.append(request.data)
+    # A business write that must commit or roll back with the stored key
+    User.objects.create_user(username=f"made{len(calls)}", email=f"made{len(calls)}@example.com")
+    return Response({'n': len(calls)}, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+@idempotent
+def conflict_view(request):
+    calls.append(request.data)
+    return Response({'error': 'Expense was modified by another request.'}, status=status.HTTP_409_CONFLICT)
+
+@api_view(['POST'])
+@idempotent
+def crashing_view(request):
+    calls.append(request.data)
+    User.objects.create_user(username='halfway', email='halfway@example.com')
+    raise RuntimeError("worker died")
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.user = User.objects.create_user(username='client', email='client@example.com')
+        self.factory = APIRequestFactory()
+    
+    def post(self, view, key, data=None):
+        request = self.factory.post('/x/', data or {'amount': '10.00'}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+        force_authenticate(request, user=self.user)
+        return view(request)
+    
+    def test_retry_replays_stored_response(self):
+        first = self.post(create_view, 'k1')
+        second = self.post(create_view, 'k1')
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(User.objects.filter(username__startswith='made').count(), 1)
+    
+    def test_key_reused_for_other_request_is_rejected(self):
+        self.post(create_view, 'k2')
+        response = self.post(create_view, 'k2', {'amount': '99.00'})
+        
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(len(calls), 1)
+    
+    def test_conflicts_are_not_replayed(self):
+        self.post(conflict_view, 'k3')
+        self.post(conflict_view, 'k3')
+        
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(IdempotencyKey.objects.filter(key='k3').exists())
+    
+    def test_failed_view_rolls_back_with_its_key(self):
+        with self.assertRaises(RuntimeError):
+            self.post(crashing_view, 'k4')
+        
+        self.assertFalse(IdempotencyKey.objects.filter(key='k4').exists())
+        self.assertFalse(User.objects.filter(username='halfway').exists())
@@ -0,0 +1,43 @@
+# api/tracking.py
+
+UNCHANGED = object()
+
+class TrackLoadedFields:
+    """
+    Model mixin that remembers `tracked_fields` as they were loaded from (or
+    last saved to) the database, so signal handlers can spot transitions
+    without re-reading the row. List it before models.Model.
+    """
+    tracked_fields = ()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: instance.__dict__[name] for name in cls.tracked_fields if name in instance.__dict__
+        }
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        loaded = getattr(self, '_loaded_values', {})
+        for name in self.tracked_fields:
+            if name in self.__dict__ and (update_fields is None or name in update_fields):
+                loaded[name] = self.__dict__[name]
+        self._loaded_values = loaded
+
+def previous_value(sender, instance, field, update_fields=None):
+    """
+    For a pre_save handler: the field's value before this save, None for a
+    new row, or UNCHANGED when the save does not write the field. Only
+    instances that were not loaded from the database need a query.
+    """
+    if instance.pk is None or instance._state.adding:
+        return None
+    if update_fields is not None and field not in update_fields:
+        return UNCHANGED
+    loaded = getattr(instance, '_loaded_values', {})
+    if field in loaded:
+        return loaded[field]
+    return sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
@@ -9,13 +9,15 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import api.routing
+import groups.routing
 
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            api.routing.websocket_urlpatterns
+            api.routing.websocket_urlpatterns +
+            groups.routing.websocket_urlpatterns
         )
     ),
 })
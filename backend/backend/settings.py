@@ -43,6 +43,10 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_THROTTLE_RATES": {
+        # Contact matching reveals which emails are registered; keep it slow
+        "contact_match": "30/hour",
+    },
 }
 
 SIMPLE_JWT = {
@@ -62,6 +66,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     "api.apps.ApiConfig",
     "rest_framework",
     "corsheaders",
@@ -110,6 +115,44 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Location ingestion
+# Fixes closer than LOCATION_MIN_DISTANCE_METERS to the point before them in time are
+# dropped unless LOCATION_HEARTBEAT_SECONDS have passed since it.
+LOCATION_MIN_DISTANCE_METERS = 10
+LOCATION_MIN_INTERVAL_SECONDS = 5
+LOCATION_HEARTBEAT_SECONDS = 300
+LOCATION_MAX_ACCURACY_METERS = 500
+LOCATION_MAX_BATCH_SIZE = 500
+
+# Location history retention (see `manage.py compact_locations`)
+# Tracks keep full resolution for LOCATION_FULL_RESOLUTION_DAYS, are then
+# simplified to within LOCATION_DOWNSAMPLE_TOLERANCE_METERS, and are deleted
+# after LOCATION_RETENTION_DAYS.
+LOCATION_FULL_RESOLUTION_DAYS = 7
+LOCATION_RETENTION_DAYS = 90
+LOCATION_DOWNSAMPLE_TOLERANCE_METERS = 25
+LOCATION_COMPACTION_BATCH_SIZE = 5000
+
+# Home dashboard cache; entries are also invalidated whenever one of the
+# user's groups changes
+DASHBOARD_CACHE_SECONDS = 300
+
+# Local, versioned FX rate table used to convert balances to a group's base
+# currency; reloaded automatically when the file changes
+FX_RATES_FILE = os.getenv('FX_RATES_FILE', os.path.join(BASE_DIR, 'expense', 'fx_rates.json'))
+
+# Expenses in the same group with the same rounded amount and title are treated
+# as likely duplicates when created within one to two windows of each other
+DUPLICATE_EXPENSE_WINDOW_HOURS = 24
+
+# Key for the HMAC over email digests in User.email_hash (contact matching);
+# defaults to SECRET_KEY. After changing it run `manage.py rehash_user_emails`.
+EMAIL_HASH_KEY = os.environ.get("EMAIL_HASH_KEY")
+
+# Idempotency-Key replay store (see api/idempotency.py); responses are kept for
+# IDEMPOTENCY_KEY_TTL_SECONDS
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
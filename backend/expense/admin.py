@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Expense, ExpenseParticipant
+from .models import Expense, ExpenseParticipant, Payment, RecurringExpense
 
 @admin.register(Expense)
 class ExpenseAdmin(admin.ModelAdmin):
@@ -26,4 +26,23 @@ class ExpenseParticipantAdmin(admin.ModelAdmin):
     list_display = ['user', 'expense', 'amount_owed', 'amount_paid', 'status']
     list_filter = ['status', 'expense__group', 'created_at']
     search_fields = ['user__username', 'expense__title']
-    readonly_fields = ['id', 'balance', 'created_at', 'updated_at']
\ No newline at end of file
+    readonly_fields = ['id', 'balance', 'created_at', 'updated_at']
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = ['payer', 'payee', 'amount', 'currency', 'expense', 'created_at']
+    list_filter = ['currency', 'created_at']
+    search_fields = ['payer__username', 'payee__username', 'expense__title']
+    readonly_fields = [field.name for field in Payment._meta.fields]
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(RecurringExpense)
+class RecurringExpenseAdmin(admin.ModelAdmin):
+    list_display = ['title', 'group', 'paid_by', 'total_amount', 'frequency', 'next_run_date', 'is_active']
+    list_filter = ['frequency', 'is_active', 'split_type']
+    search_fields = ['title', 'paid_by__username', 'group__name']
+    readonly_fields = ['id', 'created_at', 'updated_at']
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from expense.models import Expense
+from expense.utils import expense_fingerprint, fingerprint_bucket
+
+class Command(BaseCommand):
+    help = "Fingerprint existing expenses for duplicate detection"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--all', action='store_true', help="Recompute fingerprints that are already set")
+    
+    def handle(self, *args, **options):
+        expenses = Expense.objects.all() if options['all'] else Expense.objects.filter(fingerprint='')
+        expenses = expenses.only('id', 'group_id', 'total_amount', 'currency', 'title', 'created_at').order_by('id')
+        
+        updated = 0
+        last_id = None
+        while True:
+            batch = expenses.filter(id__gt=last_id) if last_id else expenses
+            batch = list(batch[:options['batch_size']])
+            if not batch:
+                break
+            
+            for expense in batch:
+                expense.fingerprint = expense_fingerprint(
+                    expense.group_id, expense.total_amount, expense.currency, expense.title
+                )
+                expense.fingerprint_bucket = fingerprint_bucket(expense.created_at)
+            Expense.objects.bulk_update(batch, ['fingerprint', 'fingerprint_bucket'])
+            
+            updated += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Fingerprinted {updated} expenses")
+        
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} expense fingerprints"))
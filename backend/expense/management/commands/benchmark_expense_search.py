@@ -0,0 +1,140 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from groups.models import Group
+from expense.models import Expense
+from expense.services.search_service import search_group_expenses
+
+User = get_user_model()
+
+SEED_PREFIX = 'search_bench_'
+
+MERCHANTS = [
+    'uber', 'lyft', 'airbnb', 'booking', 'starbucks', 'walmart', 'costco', 'netflix',
+    'spotify', 'shell', 'ikea', 'amazon', 'grab', 'highlands', 'circle k', 'vinmart',
+]
+WORDS = [
+    'dinner', 'lunch', 'breakfast', 'groceries', 'taxi', 'hotel', 'flight', 'tickets',
+    'rent', 'utilities', 'drinks', 'snacks', 'fuel', 'parking', 'gift', 'museum',
+]
+
+class Command(BaseCommand):
+    help = "Time group expense search latency over synthetic expenses (seeded only with --allow-writes)"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--expenses', type=int, default=1000000, help="Seeded expenses to ensure exist")
+        parser.add_argument('--groups', type=int, default=1000, help="Groups the seeded expenses are spread over")
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--queries', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--explain', action='store_true', help="Print the query plan for one search")
+        parser.add_argument(
+            '--allow-writes', action='store_true',
+            help="Seed missing groups and expenses into the configured database; without it the command only reads"
+        )
+        parser.add_argument('--cleanup', action='store_true', help="Delete seeded data and exit")
+    
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            Group.objects.filter(name__startswith=SEED_PREFIX).delete()
+            deleted, _ = User.objects.filter(username__startswith=SEED_PREFIX).delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} seeded rows"))
+            return
+        
+        if not options['allow_writes']:
+            group_count = Group.objects.filter(name__startswith=SEED_PREFIX).count()
+            expense_count = Expense.objects.filter(group__name__startswith=SEED_PREFIX).count()
+            if group_count < options['groups'] or expense_count < options['expenses']:
+                raise CommandError(
+                    f"Only {group_count} of {options['groups']} groups and {expense_count} of "
+                    f"{options['expenses']} expenses are seeded in database "
+                    f"'{connection.settings_dict['NAME']}'. Pass --allow-writes to seed the rest, "
+                    f"or smaller --groups/--expenses."
+                )
+        
+        rng = random.Random(options['seed'])
+        groups = self.seed_groups(options['groups'])
+        self.seed_expenses(groups, options['expenses'], options['batch_size'], rng)
+        
+        searches = [
+            (rng.choice(groups), rng.choice([rng.choice(MERCHANTS), rng.choice(WORDS)[:3], f"{rng.choice(MERCHANTS)} {rng.choice(WORDS)}"]))
+            for _ in range(options['queries'])
+        ]
+        
+        if options['explain'] and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN ANALYZE {self.search_sql(*searches[0])}")
+                for (line,) in cursor.fetchall():
+                    self.stdout.write(line)
+        
+        first_pages, next_pages = [], []
+        for group, query in searches:
+            start = time.perf_counter()
+            page, cursor = search_group_expenses(group, query)
+            first_pages.append((time.perf_counter() - start) * 1000)
+            if cursor:
+                start = time.perf_counter()
+                search_group_expenses(group, query, cursor=cursor)
+                next_pages.append((time.perf_counter() - start) * 1000)
+        
+        self.stdout.write(f"Expenses in table: {Expense.objects.count()}")
+        self.report("First page", first_pages)
+        self.report("Next page", next_pages)
+    
+    def search_sql(self, group, query):
+        """SQL of the first-page search, as executed (parameters inlined)"""
+        with CaptureQueriesContext(connection) as captured:
+            search_group_expenses(group, query)
+        return captured.captured_queries[-1]['sql']
+    
+    def report(self, label, timings):
+        if not timings:
+            self.stdout.write(f"{label}: no queries")
+            return
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label} latency over {len(timings)} queries: "
+            f"p50 {statistics.median(timings):.1f} ms, p95 {p95:.1f} ms, max {timings[-1]:.1f} ms"
+        )
+    
+    def seed_groups(self, count):
+        groups = list(Group.objects.filter(name__startswith=SEED_PREFIX).order_by('name'))
+        if len(groups) >= count:
+            return groups[:count]
+        
+        owner = User.objects.filter(username=f"{SEED_PREFIX}owner").first() or User.objects.create_user(
+            f"{SEED_PREFIX}owner", f"{SEED_PREFIX}owner@example.com"
+        )
+        groups += Group.objects.bulk_create([
+            Group(name=f"{SEED_PREFIX}{index:06d}", owner=owner)
+            for index in range(len(groups), count)
+        ])
+        return groups
+    
+    def seed_expenses(self, groups, target, batch_size, rng):
+        existing = Expense.objects.filter(group__name__startswith=SEED_PREFIX).count()
+        if existing >= target:
+            return
+        
+        owner_id = groups[0].owner_id
+        start = time.perf_counter()
+        for offset in range(existing, target, batch_size):
+            Expense.objects.bulk_create([
+                Expense(
+                    group=rng.choice(groups),
+                    paid_by_id=owner_id,
+                    title=f"{rng.choice(MERCHANTS).title()} {rng.choice(WORDS)}",
+                    description=' '.join(rng.choices(WORDS + MERCHANTS, k=rng.randint(0, 6))),
+                    total_amount=Decimal(rng.randint(100, 50000)) / 100,
+                    status='pending'
+                )
+                for _ in range(offset, min(offset + batch_size, target))
+            ], batch_size=batch_size)
+        
+        self.stdout.write(f"Seeded {target - existing} expenses in {time.perf_counter() - start:.1f} s")
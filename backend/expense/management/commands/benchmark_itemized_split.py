@@ -0,0 +1,42 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from expense.utils import allocate_itemized_cents
+
+class Command(BaseCommand):
+    help = "Time itemized split allocation on a large random receipt (invariants live in expense.tests)"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=200, help="Line items in the timed receipt")
+        parser.add_argument('--people', type=int, default=30, help="Participants in the timed receipt")
+        parser.add_argument('--runs', type=int, default=200, help="Timed allocations")
+        parser.add_argument('--seed', type=int, default=42)
+    
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        item_cents, item_weights, tax_cents, tip_cents = self.random_receipt(
+            rng, options['items'], options['people']
+        )
+        
+        timings = []
+        for _ in range(options['runs']):
+            start = time.perf_counter()
+            allocate_itemized_cents(item_cents, item_weights, tax_cents, tip_cents)
+            timings.append((time.perf_counter() - start) * 1_000_000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{options['items']} items x {options['people']} people: "
+            f"p50 {statistics.median(timings):.0f} us, p95 {p95:.0f} us"
+        )
+    
+    def random_receipt(self, rng, item_count, people):
+        item_cents = [rng.randint(1, 20000) for _ in range(item_count)]
+        item_weights = []
+        for _ in range(item_count):
+            row = [0] * people
+            for index in rng.sample(range(people), rng.randint(1, people)):
+                row[index] = rng.choice([1, 1, 1, 2, 3, 5])
+            item_weights.append(row)
+        return item_cents, item_weights, rng.randint(0, 5000), rng.randint(0, 5000)
@@ -0,0 +1,105 @@
+import time
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from groups.models import Group, GroupMembership
+from expense.models import Expense, RecurringExpense
+from expense.services.recurring_service import RecurringExpenseGenerator
+
+User = get_user_model()
+
+SEED_PREFIX = 'recurring_'
+
+class Command(BaseCommand):
+    help = "Seed many recurring templates and time a month-start generation run plus a re-run (needs --allow-writes)"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--templates', type=int, default=100000)
+        parser.add_argument('--group-size', type=int, default=4, help="Members per seeded group")
+        parser.add_argument('--templates-per-group', type=int, default=5)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--allow-writes', action='store_true',
+            help="Required: the benchmark seeds templates and generates their expenses"
+        )
+        parser.add_argument('--cleanup', action='store_true', help="Delete seeded data and exit")
+    
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            Group.objects.filter(name__startswith=SEED_PREFIX).delete()
+            deleted, _ = User.objects.filter(username__startswith=SEED_PREFIX).delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} seeded rows"))
+            return
+        
+        if not options['allow_writes']:
+            raise CommandError(
+                f"This benchmark writes users, groups, templates and expenses to database "
+                f"'{connection.settings_dict['NAME']}'. Pass --allow-writes to run it."
+            )
+        
+        run_date = date(2026, 11, 1)
+        start = time.perf_counter()
+        template_ids = self.seed(options, run_date)
+        self.stdout.write(f"Seeded {len(template_ids)} templates in {time.perf_counter() - start:.1f}s")
+        
+        # Only the seeded templates, so real ones due on run_date are left alone
+        generator = RecurringExpenseGenerator(
+            chunk_size=options['chunk_size'],
+            templates=RecurringExpense.objects.filter(group__name__startswith=SEED_PREFIX)
+        )
+        for label in ("First run", "Re-run"):
+            start = time.perf_counter()
+            stats = generator.run(run_date)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{label}: {stats['expenses']} expenses from {stats['templates']} templates "
+                f"in {stats['chunks']} chunks, {elapsed:.1f}s"
+            )
+        
+        occurrences = Expense.objects.filter(recurring_template_id__in=template_ids).count()
+        line = f"{occurrences} occurrences for {len(template_ids)} templates"
+        if occurrences == len(template_ids):
+            self.stdout.write(self.style.SUCCESS(line))
+        else:
+            self.stdout.write(self.style.ERROR(f"{line}: expected exactly one each"))
+    
+    def seed(self, options, run_date):
+        suffix = int(time.time() * 1000)
+        group_count = -(-options['templates'] // options['templates_per_group'])
+        group_size = options['group_size']
+        
+        users = User.objects.bulk_create([
+            User(username=f"{SEED_PREFIX}{suffix}_{index}", email=f"{SEED_PREFIX}{suffix}_{index}@example.com")
+            for index in range(group_count * group_size)
+        ], batch_size=1000)
+        groups = Group.objects.bulk_create([
+            Group(name=f"{SEED_PREFIX}{suffix}_{index}", owner=users[index * group_size])
+            for index in range(group_count)
+        ], batch_size=1000)
+        GroupMembership.objects.bulk_create([
+            GroupMembership(
+                group=group,
+                user=users[index * group_size + offset],
+                role='owner' if offset == 0 else 'member'
+            )
+            for index, group in enumerate(groups)
+            for offset in range(group_size)
+        ], batch_size=1000)
+        
+        templates = []
+        for number in range(options['templates']):
+            index = number // options['templates_per_group']
+            members = users[index * group_size:(index + 1) * group_size]
+            templates.append(RecurringExpense(
+                group=groups[index],
+                paid_by=members[number % group_size],
+                title=f"Subscription {number}",
+                total_amount=Decimal('100.00') + number % 50,
+                participant_ids=[member.id for member in members],
+                start_date=run_date,
+                next_run_date=run_date
+            ))
+        RecurringExpense.objects.bulk_create(templates, batch_size=1000)
+        return [template.id for template in templates]
@@ -0,0 +1,34 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from expense.services.recurring_service import RecurringExpenseGenerator
+
+class Command(BaseCommand):
+    help = "Create the due occurrences of recurring expense templates (safe to re-run)"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Generate as of this date (YYYY-MM-DD), default today")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Templates per transaction")
+        parser.add_argument('--max-seconds', type=float, help="Stop after this long; the rest is picked up next run")
+    
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['date']}")
+        
+        generator = RecurringExpenseGenerator(
+            chunk_size=options['chunk_size'],
+            max_seconds=options['max_seconds']
+        )
+        stats = generator.run(today)
+        
+        line = (
+            f"{stats['templates']} templates in {stats['chunks']} chunks: "
+            f"{stats['expenses']} expenses created, {stats['deactivated']} templates deactivated"
+        )
+        if stats['complete']:
+            self.stdout.write(self.style.SUCCESS(line))
+        else:
+            self.stdout.write(self.style.WARNING(f"{line} (time limit reached, more templates are due)"))
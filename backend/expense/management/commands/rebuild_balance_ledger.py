@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from expense.services.ledger_service import BalanceLedgerService
+
+class Command(BaseCommand):
+    help = "Recompute cross-group pairwise balances from posted expenses"
+    
+    def handle(self, *args, **options):
+        count = BalanceLedgerService().rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt balance ledger with {count} rows"))
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0004_expenseamountstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseStatusHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('pending_approval', 'Pending Approval'), ('auto_approved', 'Auto Approved'), ('approved', 'Manually Approved'), ('pending', 'Active - Pending Payment'), ('partial', 'Partially Paid'), ('settled', 'Settled'), ('rejected', 'Rejected')], max_length=20)),
+                ('to_status', models.CharField(choices=[('pending_approval', 'Pending Approval'), ('auto_approved', 'Auto Approved'), ('approved', 'Manually Approved'), ('pending', 'Active - Pending Payment'), ('partial', 'Partially Paid'), ('settled', 'Settled'), ('rejected', 'Rejected')], max_length=20)),
+                ('reason', models.CharField(blank=True, default='', max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='expense_status_changes', to=settings.AUTH_USER_MODEL)),
+                ('expense', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_history', to='expense.expense')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['expense', 'created_at'], name='expense_exp_expense_1f44ae_idx')],
+            },
+        ),
+    ]
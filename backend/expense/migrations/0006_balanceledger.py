@@ -0,0 +1,63 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:32
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from collections import defaultdict
+from django.db import migrations, models
+
+
+def backfill_balance_ledger(apps, schema_editor):
+    ExpenseParticipant = apps.get_model('expense', 'ExpenseParticipant')
+    BalanceLedger = apps.get_model('expense', 'BalanceLedger')
+    
+    debts = ExpenseParticipant.objects.filter(
+        is_active=True,
+        expense__is_active=True,
+        expense__status__in=['auto_approved', 'approved', 'pending', 'partial', 'settled'],
+        amount_owed__gt=models.F('amount_paid')
+    ).exclude(
+        user_id=models.F('expense__paid_by_id')
+    ).values(
+        'expense__paid_by_id', 'user_id', 'expense__currency'
+    ).annotate(
+        outstanding=models.Sum(models.F('amount_owed') - models.F('amount_paid'))
+    ).order_by()
+    
+    totals = defaultdict(Decimal)
+    for row in debts:
+        creditor_id, debtor_id, currency = row['expense__paid_by_id'], row['user_id'], row['expense__currency']
+        totals[(creditor_id, debtor_id, currency)] += row['outstanding']
+        totals[(debtor_id, creditor_id, currency)] -= row['outstanding']
+    
+    BalanceLedger.objects.bulk_create([
+        BalanceLedger(user_id=user_id, counterparty_id=counterparty_id, currency=currency, amount=amount)
+        for (user_id, counterparty_id, currency), amount in totals.items()
+        if amount
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0005_expensestatushistory'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(default='USD', max_length=3)),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('counterparty', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'counterparty', 'currency'), name='unique_balance_ledger_pair')],
+            },
+        ),
+        migrations.RunPython(backfill_balance_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:35
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_payments(apps, schema_editor):
+    ExpenseParticipant = apps.get_model('expense', 'ExpenseParticipant')
+    Payment = apps.get_model('expense', 'Payment')
+    
+    # Payments made before this table existed are only visible as amount_paid;
+    # record each as one payment. The payer's own share is not a payment.
+    participants = ExpenseParticipant.objects.filter(
+        amount_paid__gt=0
+    ).exclude(
+        user_id=models.F('expense__paid_by_id')
+    ).select_related('expense')
+    
+    Payment.objects.bulk_create([
+        Payment(
+            expense_id=participant.expense_id,
+            participant_id=participant.pk,
+            payer_id=participant.user_id,
+            payee_id=participant.expense.paid_by_id,
+            amount=participant.amount_paid,
+            currency=participant.expense.currency,
+            created_at=participant.updated_at
+        )
+        for participant in participants.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0006_balanceledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('currency', models.CharField(default='USD', max_length=3)),
+                ('settlement_id', models.UUIDField(blank=True, db_index=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expense', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='expense.expense')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='expense.expenseparticipant')),
+                ('payee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments_received', to=settings.AUTH_USER_MODEL)),
+                ('payer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments_made', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['payer', '-created_at'], name='expense_pay_payer_i_62d0a3_idx'), models.Index(fields=['payee', '-created_at'], name='expense_pay_payee_i_f129ef_idx'), models.Index(fields=['expense', '-created_at'], name='expense_pay_expense_262e85_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_payments, migrations.RunPython.noop),
+    ]
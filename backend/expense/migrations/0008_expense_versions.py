@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0007_payment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='expenseparticipant',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
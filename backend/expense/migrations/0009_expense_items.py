@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0008_expense_versions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expense',
+            name='split_type',
+            field=models.CharField(choices=[('equal', 'Equal Split'), ('custom', 'Custom Split'), ('percentage', 'Percentage Split'), ('itemized', 'Itemized Split')], default='equal', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ExpenseItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('item', 'Item'), ('tax', 'Tax'), ('tip', 'Tip')], default='item', max_length=10)),
+                ('description', models.CharField(blank=True, default='', max_length=200)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('shares', models.JSONField(blank=True, default=dict)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('expense', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='expense.expense')),
+            ],
+            options={
+                'ordering': ['expense', 'position'],
+            },
+        ),
+    ]
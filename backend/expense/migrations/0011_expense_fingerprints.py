@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0010_recurring_expenses'),
+        ('groups', '0006_group_base_currency'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='fingerprint_bucket',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='groupapprovalsettings',
+            name='reject_duplicates',
+            field=models.BooleanField(default=False, help_text='Reject likely duplicate expenses instead of holding them for approval'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['fingerprint', 'fingerprint_bucket'], name='expense_exp_fingerp_c09e77_idx'),
+        ),
+    ]
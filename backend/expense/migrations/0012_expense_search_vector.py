@@ -0,0 +1,65 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:54
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Must use the same text search config as services/search_service.py
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce({row}title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce({row}description, '')), 'B')"
+)
+
+
+def create_search_trigger(apps, schema_editor):
+    # tsvector and triggers are PostgreSQL only; elsewhere search falls back to icontains
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    
+    schema_editor.execute(f"""
+        CREATE OR REPLACE FUNCTION expense_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR_SQL.format(row='NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    schema_editor.execute("""
+        CREATE TRIGGER expense_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF title, description ON expense_expense
+        FOR EACH ROW EXECUTE FUNCTION expense_search_vector_update()
+    """)
+    schema_editor.execute(f"UPDATE expense_expense SET search_vector = {SEARCH_VECTOR_SQL.format(row='')}")
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    
+    schema_editor.execute("DROP TRIGGER IF EXISTS expense_search_vector_trigger ON expense_expense")
+    schema_editor.execute("DROP FUNCTION IF EXISTS expense_search_vector_update()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0011_expense_fingerprints'),
+        ('groups', '0006_group_base_currency'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # Backfill before building the index
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+        migrations.AddIndex(
+            model_name='expense',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='expense_search_vector_gin'),
+        ),
+    ]
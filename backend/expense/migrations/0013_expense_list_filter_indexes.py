@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0012_expense_search_vector'),
+        ('groups', '0006_group_base_currency'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+    
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['group', 'paid_by', '-created_at'], name='expense_exp_group_i_b73193_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['group', 'total_amount'], name='expense_exp_group_i_202def_idx'),
+        ),
+    ]
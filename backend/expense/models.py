@@ -1,10 +1,15 @@
 # expenses/models.py - Updated with Smart Approval System
 
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django.core.validators import MinValueValidator
+from collections import defaultdict
 from decimal import Decimal
+import math
 import uuid
 
 User = get_user_model()
@@ -14,6 +19,7 @@ class Expense(models.Model):
         ('equal', 'Equal Split'),
         ('custom', 'Custom Split'),
         ('percentage', 'Percentage Split'),
+        ('itemized', 'Itemized Split'),
     ]
     
     STATUS_CHOICES = [
@@ -72,12 +78,35 @@ class Expense(models.Model):
             ('auto_receipt', 'Auto-approved (Has Receipt)'),
             ('manual', 'Manually Approved'),
             ('batch', 'Batch Approved'),
+            ('auto_recurring', 'Auto-approved (Recurring)'),
         ],
         null=True,
         blank=True
     )
     rejection_reason = models.TextField(blank=True, null=True)
     
+    # Set on occurrences generated from a RecurringExpense template
+    recurring_template = models.ForeignKey(
+        'RecurringExpense',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='occurrences'
+    )
+    recurring_period = models.DateField(null=True, blank=True)
+    
+    # Duplicate detection (see utils.find_duplicate_expenses): hash of group,
+    # rounded amount, currency and normalized title, plus a created_at bucket
+    fingerprint = models.CharField(max_length=32, blank=True, default='')
+    fingerprint_bucket = models.IntegerField(null=True, blank=True)
+    
+    # Weighted title (A) + description (B), kept current by a database
+    # trigger (migration 0012); see services/search_service.py
+    search_vector = SearchVectorField(null=True, editable=False)
+    
+    # Bumped on every write; edits are conditional on it (see services/version_service.py)
+    version = models.PositiveIntegerField(default=1)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
@@ -89,6 +118,18 @@ class Expense(models.Model):
             models.Index(fields=['group', 'status']),
             models.Index(fields=['paid_by', '-created_at']),
             models.Index(fields=['status', 'created_at']),  # For pending approvals
+            # List filters (see services/filter_service.py)
+            models.Index(fields=['group', 'paid_by', '-created_at']),
+            models.Index(fields=['group', 'total_amount']),
+            models.Index(fields=['fingerprint', 'fingerprint_bucket']),  # Duplicate probe
+            GinIndex(fields=['search_vector'], name='expense_search_vector_gin'),
+        ]
+        constraints = [
+            # One occurrence per template and period, however often the scheduler runs
+            models.UniqueConstraint(
+                fields=['recurring_template', 'recurring_period'],
+                name='unique_recurring_occurrence'
+            ),
         ]
     
     def __str__(self):
@@ -107,61 +148,15 @@ class Expense(models.Model):
         Update expense status based on approval state and payment progress.
         This is called after expense creation and when payments are made.
         """
-        # Don't change status for rejected expenses
-        if self.status == 'rejected':
-            return
-        
-        # Handle approval-to-payment transition
-        if self.status in ['auto_approved', 'approved']:
-            # Move approved expenses to payment tracking
-            self._transition_to_payment_tracking()
-        
-        # Handle payment status updates for active expenses
-        elif self.status in ['pending', 'partial']:
-            self._update_payment_status()
-
-    def _transition_to_payment_tracking(self):
-        """Transition from approved state to payment tracking"""
-        # Check if participants exist (they should after create_group_expense)
-        if not self.participants.exists():
-            # If no participants yet, stay in current approval status
-            return
-        
-        # Move to payment tracking
-        self.status = 'pending'
-        self.save(update_fields=['status', 'updated_at'])
-
-    def _update_payment_status(self):
-        """Update status based on current payment state"""
-        participants = self.participants.filter(is_active=True)
-        
-        if not participants.exists():
-            return
-        
-        # Calculate payment totals
-        total_owed = sum(p.amount_owed for p in participants)
-        total_paid = sum(p.amount_paid for p in participants)
-        
-        # Determine new status
-        if total_paid >= total_owed:
-            new_status = 'settled'
-        elif total_paid > 0:
-            new_status = 'partial'  
-        else:
-            new_status = 'pending'
-        
-        # Only save if status changed
-        if self.status != new_status:
-            self.status = new_status
-            self.save(update_fields=['status', 'updated_at'])
-
+        from .services.status_service import ExpenseStatusService
+        ExpenseStatusService(self).sync_payment_status()
+    
     def refresh_status(self):
         """Force recalculate status - useful for manual corrections"""
         old_status = self.status
         
-        # Reset to appropriate state and recalculate
         if self.status in ['pending', 'partial', 'settled']:
-            self._update_payment_status()
+            self.update_status()
         
         return old_status != self.status
 
@@ -210,6 +205,14 @@ class GroupApprovalSettings(models.Model):
         blank=True,
         help_text="Require receipt for expenses above this amount"
     )
+    hold_above_group_p95 = models.BooleanField(
+        default=False,
+        help_text="Require manual approval for amounts above this group's 95th percentile"
+    )
+    reject_duplicates = models.BooleanField(
+        default=False,
+        help_text="Reject likely duplicate expenses instead of holding them for approval"
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -217,6 +220,34 @@ class GroupApprovalSettings(models.Model):
     def __str__(self):
         return f"Approval Settings - {self.group.name}"
 
+class ExpenseStatusHistory(models.Model):
+    """Append-only record of every expense status transition"""
+    expense = models.ForeignKey(
+        Expense,
+        on_delete=models.CASCADE,
+        related_name='status_history'
+    )
+    from_status = models.CharField(max_length=20, choices=Expense.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Expense.STATUS_CHOICES)
+    changed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='expense_status_changes'
+    )
+    reason = models.CharField(max_length=500, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['expense', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.expense_id}: {self.from_status} -> {self.to_status}"
+
 class ExpenseParticipant(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -251,6 +282,7 @@ class ExpenseParticipant(models.Model):
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     is_active = models.BooleanField(default=True)
+    version = models.PositiveIntegerField(default=1)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -268,6 +300,95 @@ class ExpenseParticipant(models.Model):
         """Returns the balance for this participant (negative = owes money)"""
         return self.amount_paid - self.amount_owed
 
+class RecurringExpense(models.Model):
+    """
+    Template for an expense that repeats (rent, subscriptions).
+    Occurrences are materialized by `manage.py generate_recurring_expenses`
+    (see services/recurring_service.py).
+    """
+    FREQUENCY_CHOICES = [
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+        ('yearly', 'Yearly'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    group = models.ForeignKey(
+        'groups.Group',
+        on_delete=models.CASCADE,
+        related_name='recurring_expenses'
+    )
+    paid_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recurring_expenses'
+    )
+    
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, default='')
+    total_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))]
+    )
+    currency = models.CharField(max_length=3, default='USD')
+    
+    # Split: participant user ids in order, plus amounts / percentages for
+    # custom and percentage splits (user id -> value)
+    split_type = models.CharField(max_length=20, choices=Expense.SPLIT_TYPE_CHOICES[:3], default='equal')
+    participant_ids = models.JSONField(default=list, blank=True)
+    split_values = models.JSONField(default=dict, blank=True)
+    
+    # Rule
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='monthly')
+    interval = models.PositiveSmallIntegerField(default=1)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    next_run_date = models.DateField()
+    
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['next_run_date']
+        indexes = [
+            models.Index(fields=['is_active', 'next_run_date']),
+            models.Index(fields=['group', 'is_active']),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} every {self.interval} {self.frequency} ({self.group_id})"
+
+class ExpenseItem(models.Model):
+    """
+    One line of an itemized receipt. Tax and tip lines have no shares and are
+    pro-rated by each participant's item subtotal (see utils.calculate_itemized_split).
+    """
+    KIND_CHOICES = [
+        ('item', 'Item'),
+        ('tax', 'Tax'),
+        ('tip', 'Tip'),
+    ]
+    
+    expense = models.ForeignKey(
+        Expense,
+        on_delete=models.CASCADE,
+        related_name='items'
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='item')
+    description = models.CharField(max_length=200, blank=True, default='')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # user id -> integer or decimal weight; empty means split equally
+    shares = models.JSONField(default=dict, blank=True)
+    position = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['expense', 'position']
+    
+    def __str__(self):
+        return f"{self.description or self.kind}: {self.amount}"
+
 # 🆕 Trust Level System
 class GroupMemberTrust(models.Model):
     """Track trust levels for group members"""
@@ -348,4 +469,240 @@ class ApprovalQueue(models.Model):
         ordering = ['-priority', 'created_at']
         indexes = [
             models.Index(fields=['group', '-priority', 'created_at']),
-        ]
\ No newline at end of file
+        ]
+
+# Running amount statistics for adaptive approval thresholds
+class ExpenseAmountStats(models.Model):
+    """
+    Incrementally maintained amount statistics for a group (user is NULL)
+    or for a single member of a group.
+    
+    Mean and variance use Welford's online algorithm and percentiles come
+    from a log-bucketed sketch, so recording an amount is O(1) and never
+    rescans expense history.
+    """
+    # Bucket i covers (SKETCH_GAMMA ** (i - 1), SKETCH_GAMMA ** i] cents,
+    # which keeps percentile estimates within ~2% relative error.
+    SKETCH_GAMMA = 1.04
+    MIN_SAMPLES = 10  # Below this the statistics are not trusted
+    
+    group = models.ForeignKey(
+        'groups.Group',
+        on_delete=models.CASCADE,
+        related_name='amount_stats'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='expense_amount_stats'
+    )
+    
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0.0)
+    m2 = models.FloatField(default=0.0)  # Sum of squared deviations from the mean
+    min_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    sketch = models.JSONField(default=dict, blank=True)  # bucket index -> count
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'user'],
+                name='unique_member_amount_stats'
+            ),
+            models.UniqueConstraint(
+                fields=['group'],
+                condition=models.Q(user__isnull=True),
+                name='unique_group_amount_stats'
+            ),
+        ]
+    
+    def __str__(self):
+        scope = self.user.username if self.user_id else 'all members'
+        return f"Amount stats for {scope} in {self.group.name} (n={self.count})"
+    
+    @property
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+    
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+    
+    @property
+    def has_enough_samples(self):
+        return self.count >= self.MIN_SAMPLES
+    
+    @classmethod
+    def _bucket_for(cls, amount):
+        cents = max(int(Decimal(amount) * 100), 1)
+        return math.ceil(math.log(cents) / math.log(cls.SKETCH_GAMMA))
+    
+    def record_amount(self, amount):
+        """Fold a new expense amount into the running statistics (in memory)"""
+        value = float(amount)
+        
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        
+        if self.min_amount is None or amount < self.min_amount:
+            self.min_amount = amount
+        if self.max_amount is None or amount > self.max_amount:
+            self.max_amount = amount
+        
+        bucket = str(self._bucket_for(amount))
+        self.sketch[bucket] = self.sketch.get(bucket, 0) + 1
+    
+    @classmethod
+    def record_expense_amounts(cls, entries):
+        """
+        Fold many expenses into their group and payer statistics at once.
+        `entries` are (group_id, paid_by_id, amount); rows are created as
+        needed, locked with one query and saved with one bulk update.
+        """
+        amounts = defaultdict(list)
+        for group_id, paid_by_id, amount in entries:
+            amounts[(group_id, None)].append(amount)
+            amounts[(group_id, paid_by_id)].append(amount)
+        if not amounts:
+            return
+        
+        cls.objects.bulk_create(
+            [cls(group_id=group_id, user_id=user_id) for group_id, user_id in amounts],
+            ignore_conflicts=True
+        )
+        rows = list(cls.objects.select_for_update().filter(
+            Q(user__isnull=True) | Q(user_id__in={user_id for _, user_id in amounts if user_id}),
+            group_id__in={group_id for group_id, _ in amounts}
+        ).order_by('id'))
+        
+        now = timezone.now()
+        changed = []
+        for stats in rows:
+            for amount in amounts.get((stats.group_id, stats.user_id), []):
+                stats.record_amount(amount)
+            if (stats.group_id, stats.user_id) in amounts:
+                stats.updated_at = now
+                changed.append(stats)
+        cls.objects.bulk_update(
+            changed,
+            ['count', 'mean', 'm2', 'min_amount', 'max_amount', 'sketch', 'updated_at']
+        )
+    
+    def percentile(self, q):
+        """
+        Estimate the q-th percentile (0-100) from the sketch.
+        Returns None when no amounts have been recorded.
+        """
+        if self.count == 0 or not self.sketch:
+            return None
+        
+        rank = q / 100 * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.sketch, key=int):
+            seen += self.sketch[bucket]
+            if seen > rank:
+                # Midpoint of the bucket, in the same relative-error sense
+                index = int(bucket)
+                cents = 2 * self.SKETCH_GAMMA ** index / (self.SKETCH_GAMMA + 1)
+                estimate = Decimal(str(round(cents / 100, 2)))
+                # The sketch can overshoot the true extremes slightly
+                return min(max(estimate, self.min_amount), self.max_amount)
+        
+        return self.max_amount
+
+# Cross-group pairwise balances
+class BalanceLedger(models.Model):
+    """
+    Net amount between two users in one currency, across all groups.
+    
+    Rows are kept in mirrored pairs: amount > 0 on (user, counterparty)
+    means the counterparty owes the user, and (counterparty, user) holds
+    the negated amount. Maintained by services/ledger_service.py.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='balance_ledger'
+    )
+    counterparty = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    currency = models.CharField(max_length=3, default='USD')
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'counterparty', 'currency'],
+                name='unique_balance_ledger_pair'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.counterparty_id} owes {self.user_id}: {self.amount} {self.currency}"
+
+class Payment(models.Model):
+    """
+    Append-only record of one payment from a participant to the person who
+    paid for an expense. ExpenseParticipant.amount_paid is maintained next to
+    it with atomic increments; rows are never updated or deleted.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    expense = models.ForeignKey(
+        Expense,
+        on_delete=models.CASCADE,
+        related_name='payments'
+    )
+    participant = models.ForeignKey(
+        ExpenseParticipant,
+        on_delete=models.CASCADE,
+        related_name='payments'
+    )
+    payer = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='payments_made'
+    )
+    payee = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='payments_received'
+    )
+    amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))]
+    )
+    currency = models.CharField(max_length=3, default='USD')
+    # Shared by every allocation of one settle-up
+    settlement_id = models.UUIDField(null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['payer', '-created_at']),
+            models.Index(fields=['payee', '-created_at']),
+            models.Index(fields=['expense', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.payer_id} paid {self.payee_id} {self.amount} {self.currency}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Payments are append-only")
+        super().save(*args, **kwargs)
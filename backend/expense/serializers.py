@@ -5,9 +5,9 @@ from django.contrib.auth import get_user_model
 from groups.models import Group, GroupMembership
 from .models import (
     Expense, ExpenseParticipant, GroupApprovalSettings, 
-    GroupMemberTrust, ApprovalQueue
+    GroupMemberTrust, ApprovalQueue, Payment, ExpenseItem, RecurringExpense
 )
-from .utils import create_group_expense
+from .utils import create_group_expense, calculate_split_amounts
 from decimal import Decimal
 
 User = get_user_model()
@@ -21,7 +21,7 @@ class ExpenseParticipantSerializer(serializers.ModelSerializer):
         model = ExpenseParticipant
         fields = [
             'id', 'user', 'amount_owed', 'amount_paid', 
-            'status', 'balance', 'created_at'
+            'status', 'balance', 'version', 'created_at'
         ]
     
     def get_user(self, obj):
@@ -31,23 +31,47 @@ class ExpenseParticipantSerializer(serializers.ModelSerializer):
             'email': obj.user.email,
         }
 
+class PaymentSerializer(serializers.ModelSerializer):
+    payer = serializers.SerializerMethodField()
+    payee = serializers.SerializerMethodField()
+    expense_title = serializers.CharField(source='expense.title', read_only=True)
+    
+    class Meta:
+        model = Payment
+        fields = [
+            'id', 'expense', 'expense_title', 'payer', 'payee',
+            'amount', 'currency', 'settlement_id', 'created_at'
+        ]
+    
+    def get_payer(self, obj):
+        return {'id': str(obj.payer.id), 'username': obj.payer.username}
+    
+    def get_payee(self, obj):
+        return {'id': str(obj.payee.id), 'username': obj.payee.username}
+
+class ExpenseItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExpenseItem
+        fields = ['kind', 'description', 'amount', 'shares']
+
 class ExpenseSerializer(serializers.ModelSerializer):
     paid_by = serializers.SerializerMethodField()
     participants = ExpenseParticipantSerializer(many=True, read_only=True)
     participant_count = serializers.SerializerMethodField()
+    items = ExpenseItemSerializer(many=True, read_only=True)
     
     class Meta:
         model = Expense
         fields = [
             'id', 'title', 'description', 'total_amount', 'currency',
             'paid_by', 'split_type', 'status', 'participants',
-            'participant_count', 'has_receipt', 'approved_by', 
+            'participant_count', 'items', 'has_receipt', 'approved_by', 
             'approved_at', 'approval_type', 'rejection_reason',
-            'created_at', 'updated_at'
+            'version', 'created_at', 'updated_at'
         ]
         read_only_fields = [
             'id', 'status', 'approved_by', 'approved_at', 
-            'approval_type', 'created_at', 'updated_at'
+            'approval_type', 'version', 'created_at', 'updated_at'
         ]
     
     def get_paid_by(self, obj):
@@ -60,8 +84,32 @@ class ExpenseSerializer(serializers.ModelSerializer):
     def get_participant_count(self, obj):
         return obj.participants.filter(is_active=True).count()
 
+class ExpenseSearchResultSerializer(serializers.ModelSerializer):
+    """Compact expense row for search results"""
+    paid_by = serializers.SerializerMethodField()
+    rank = serializers.DecimalField(max_digits=12, decimal_places=6, read_only=True)
+    
+    class Meta:
+        model = Expense
+        fields = [
+            'id', 'title', 'description', 'total_amount', 'currency',
+            'paid_by', 'status', 'rank', 'created_at'
+        ]
+    
+    def get_paid_by(self, obj):
+        return {'id': str(obj.paid_by.id), 'username': obj.paid_by.username}
+
 # 🆕 Smart Approval Serializers
 
+class ReceiptItemSerializer(serializers.Serializer):
+    description = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    shares = serializers.DictField(
+        child=serializers.DecimalField(max_digits=10, decimal_places=4, min_value=Decimal('0')),
+        required=False,
+        help_text="User id -> weight. Omit to split the item equally."
+    )
+
 class SmartCreateExpenseSerializer(serializers.Serializer):
     title = serializers.CharField(max_length=200)
     description = serializers.CharField(required=False, allow_blank=True)
@@ -75,11 +123,20 @@ class SmartCreateExpenseSerializer(serializers.Serializer):
     )
     has_receipt = serializers.BooleanField(default=False)
     # receipt_image handled in view via request.FILES
+    allow_duplicate = serializers.BooleanField(
+        default=False,
+        help_text="Create it even if it looks like a recent expense in this group."
+    )
+    
+    # Itemized split only
+    items = ReceiptItemSerializer(many=True, required=False, max_length=500)
+    tax = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), default=Decimal('0.00'))
+    tip = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), default=Decimal('0.00'))
     
     def validate_participant_ids(self, value):
         if not value:
             return value
-            
+        
         # Remove duplicates
         return list(set(value))
     
@@ -112,6 +169,21 @@ class SmartCreateExpenseSerializer(serializers.Serializer):
                     f"Users {list(invalid_ids)} are not active members of this group."
                 )
         
+        if data.get('split_type') == 'itemized':
+            items = data.get('items')
+            if not items:
+                raise serializers.ValidationError("Itemized expenses need at least one item.")
+            
+            receipt_total = sum(item['amount'] for item in items) + data['tax'] + data['tip']
+            if receipt_total != data['total_amount']:
+                raise serializers.ValidationError(
+                    f"Items, tax and tip sum to {receipt_total}, but total is {data['total_amount']}."
+                )
+            
+            shared_ids = {str(user_id) for item in items for user_id in item.get('shares', {})}
+            if participant_ids and not shared_ids <= set(participant_ids):
+                raise serializers.ValidationError("Every user on an item must be a participant.")
+        
         return data
 
 class GroupApprovalSettingsSerializer(serializers.ModelSerializer):
@@ -121,7 +193,7 @@ class GroupApprovalSettingsSerializer(serializers.ModelSerializer):
             'auto_approve_limit', 'receipt_auto_approve_limit',
             'batch_notifications', 'notification_time',
             'auto_approve_recurring', 'require_receipt_above',
-            'created_at', 'updated_at'
+            'hold_above_group_p95', 'reject_duplicates', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
 
@@ -174,6 +246,118 @@ class BatchApprovalSerializer(serializers.Serializer):
         help_text="List of expense IDs to approve"
     )
 
+class ExpenseSplitUpdateSerializer(serializers.Serializer):
+    """Optional new split sent along with an expense edit, keyed by user id"""
+    split_amounts = serializers.DictField(
+        child=serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.00')),
+        required=False
+    )
+    split_percentages = serializers.DictField(
+        child=serializers.FloatField(min_value=0),
+        required=False
+    )
+
+class SettleUpSerializer(serializers.Serializer):
+    counterparty_id = serializers.IntegerField(help_text="User being paid back")
+    amount = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        min_value=Decimal('0.01')
+    )
+    currency = serializers.CharField(max_length=3, default='USD')
+    group_id = serializers.UUIDField(required=False, help_text="Only settle expenses in this group")
+    
+    def validate_currency(self, value):
+        return value.upper()
+
+class RecurringExpenseSerializer(serializers.ModelSerializer):
+    paid_by = serializers.SerializerMethodField()
+    participant_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        help_text="User ids to split between. If empty, all members at the time of each occurrence."
+    )
+    split_values = serializers.DictField(
+        child=serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.00')),
+        required=False,
+        help_text="User id -> amount (custom) or percentage (percentage split)"
+    )
+    
+    class Meta:
+        model = RecurringExpense
+        fields = [
+            'id', 'title', 'description', 'total_amount', 'currency', 'paid_by',
+            'split_type', 'participant_ids', 'split_values', 'frequency', 'interval',
+            'start_date', 'end_date', 'next_run_date', 'is_active', 'created_at'
+        ]
+        read_only_fields = ['id', 'next_run_date', 'is_active', 'created_at']
+    
+    def get_paid_by(self, obj):
+        return {'id': str(obj.paid_by.id), 'username': obj.paid_by.username}
+    
+    def validate_currency(self, value):
+        return value.upper()
+    
+    def validate_participant_ids(self, value):
+        # Keep order (it is the split order) but drop duplicates
+        return list(dict.fromkeys(value))
+    
+    def validate(self, data):
+        group = self.context['group']
+        participant_ids = data.get('participant_ids', [])
+        split_type = data.get('split_type', 'equal')
+        
+        if data.get('interval', 1) < 1:
+            raise serializers.ValidationError("Interval must be at least 1.")
+        if data.get('end_date') and data['end_date'] < data['start_date']:
+            raise serializers.ValidationError("End date must not be before the start date.")
+        
+        if participant_ids:
+            valid_member_ids = set(
+                GroupMembership.objects.filter(
+                    group=group,
+                    user_id__in=participant_ids,
+                    is_active=True
+                ).values_list('user_id', flat=True)
+            )
+            invalid_ids = set(participant_ids) - valid_member_ids
+            if invalid_ids:
+                raise serializers.ValidationError(
+                    f"Users {list(invalid_ids)} are not active members of this group."
+                )
+        
+        if split_type in ('custom', 'percentage'):
+            values = data.get('split_values', {})
+            if not participant_ids or set(values) != {str(user_id) for user_id in participant_ids}:
+                raise serializers.ValidationError(
+                    f"A {split_type} split needs participant_ids and one split value per participant."
+                )
+            ordered = [values[str(user_id)] for user_id in participant_ids]
+            try:
+                calculate_split_amounts(
+                    split_type,
+                    data['total_amount'],
+                    len(participant_ids),
+                    split_amounts=ordered if split_type == 'custom' else None,
+                    split_percentages=ordered if split_type == 'percentage' else None
+                )
+            except ValueError as e:
+                raise serializers.ValidationError(str(e))
+            # Stored as JSON
+            data['split_values'] = {user_id: str(value) for user_id, value in values.items()}
+        else:
+            data['split_values'] = {}
+        
+        return data
+    
+    def create(self, validated_data):
+        return RecurringExpense.objects.create(
+            group=self.context['group'],
+            paid_by=self.context['request'].user,
+            next_run_date=validated_data['start_date'],
+            **validated_data
+        )
+
 class RejectExpenseSerializer(serializers.Serializer):
     reason = serializers.CharField(
         max_length=500,
@@ -185,13 +369,17 @@ class RejectExpenseSerializer(serializers.Serializer):
 # Update existing serializers to handle approval status
 class GroupExpenseSummarySerializer(serializers.Serializer):
     total_expenses = serializers.IntegerField()
-    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    # Totals are in the group's base currency; null when a rate is missing
+    currency = serializers.CharField()
+    total_amount = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    totals_by_currency = serializers.DictField(child=serializers.DecimalField(max_digits=12, decimal_places=2))
     pending_count = serializers.IntegerField()
     settled_count = serializers.IntegerField()
-    user_balance = serializers.DecimalField(max_digits=10, decimal_places=2)
+    user_balance = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    user_balances = serializers.DictField(child=serializers.DecimalField(max_digits=12, decimal_places=2))
     user_expense_count = serializers.IntegerField()
-    user_total_owed = serializers.DecimalField(max_digits=10, decimal_places=2)
-    user_total_paid = serializers.DecimalField(max_digits=10, decimal_places=2)
+    user_total_owed = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
+    user_total_paid = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
     
     # 🆕 Smart approval fields
     pending_approvals = serializers.IntegerField(default=0)
@@ -0,0 +1,86 @@
+# expenses/services/filter_service.py
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from ..models import Expense, ExpenseParticipant
+
+# ?ordering= values; each is served by an index that starts with group
+EXPENSE_ORDERINGS = {
+    '-created_at': ['-created_at', '-id'],      # (group, -created_at)
+    'created_at': ['created_at', 'id'],         # (group, -created_at), scanned backwards
+    '-total_amount': ['-total_amount', '-id'],  # (group, total_amount)
+    'total_amount': ['total_amount', 'id'],     # (group, total_amount)
+}
+
+def _parse_bound(value, name, next_day=False):
+    """A datetime or date query parameter as an aware datetime (dates at midnight)"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"{name} must be a date (YYYY-MM-DD) or an ISO datetime.")
+        moment = datetime.combine(day + timedelta(days=1) if next_day else day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+def _parse_amount(value, name):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"{name} must be a number.")
+
+def filter_expenses(expenses, params, user):
+    """
+    Apply list query parameters to a group's expense queryset:
+    paid_by, status (comma separated), created_after, created_before,
+    min_amount, max_amount, involves_me and ordering.
+    Raises ValueError for invalid values.
+    """
+    paid_by = params.get('paid_by')
+    if paid_by:
+        if not paid_by.isdigit():
+            raise ValueError("paid_by must be a user id.")
+        expenses = expenses.filter(paid_by_id=int(paid_by))
+    
+    statuses = [value for value in params.get('status', '').split(',') if value]
+    if statuses:
+        valid = {choice for choice, _ in Expense.STATUS_CHOICES}
+        invalid = [value for value in statuses if value not in valid]
+        if invalid:
+            raise ValueError(f"Unknown status {invalid}.")
+        expenses = expenses.filter(status__in=statuses)
+    
+    if params.get('created_after'):
+        expenses = expenses.filter(created_at__gte=_parse_bound(params['created_after'], 'created_after'))
+    if params.get('created_before'):
+        before = params['created_before']
+        if parse_datetime(before) is None:
+            # A bare end date includes the whole day
+            expenses = expenses.filter(created_at__lt=_parse_bound(before, 'created_before', next_day=True))
+        else:
+            expenses = expenses.filter(created_at__lte=_parse_bound(before, 'created_before'))
+    
+    if params.get('min_amount'):
+        expenses = expenses.filter(total_amount__gte=_parse_amount(params['min_amount'], 'min_amount'))
+    if params.get('max_amount'):
+        expenses = expenses.filter(total_amount__lte=_parse_amount(params['max_amount'], 'max_amount'))
+    
+    if params.get('involves_me', '').lower() in ('1', 'true', 'yes'):
+        # Per-row probe on the (expense, user) unique index
+        expenses = expenses.filter(
+            Q(paid_by=user) |
+            Exists(ExpenseParticipant.objects.filter(
+                expense=OuterRef('pk'),
+                user=user,
+                is_active=True
+            ))
+        )
+    
+    ordering = params.get('ordering', '-created_at')
+    if ordering not in EXPENSE_ORDERINGS:
+        raise ValueError(f"ordering must be one of {sorted(EXPENSE_ORDERINGS)}.")
+    return expenses.order_by(*EXPENSE_ORDERINGS[ordering])
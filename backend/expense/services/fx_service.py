@@ -0,0 +1,100 @@
+# expenses/services/fx_service.py
+
+from decimal import Decimal, ROUND_HALF_UP
+import json
+import logging
+import os
+import threading
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+class MissingRate(ValueError):
+    """No rate for a currency in the loaded FX table"""
+
+class FxRateTable:
+    """
+    One version of the local FX file: units of each currency per one unit
+    of the base currency.
+    """
+    
+    def __init__(self, version, base, rates):
+        self.version = version
+        self.base = base
+        self.rates = rates
+    
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as handle:
+            data = json.load(handle)
+        # Callers fall back on ValueError, so a malformed file must not escape as anything else
+        try:
+            rates = {currency.upper(): Decimal(str(rate)) for currency, rate in data['rates'].items()}
+            version = str(data['version'])
+            base = data.get('base', 'USD').upper()
+        except (KeyError, TypeError, AttributeError, ArithmeticError) as e:
+            raise ValueError(f"FX file {path} is malformed: {e!r}")
+        if any(not rate.is_finite() or rate <= 0 for rate in rates.values()):
+            raise ValueError(f"FX file {path} has invalid or non-positive rates")
+        return cls(version, base, rates)
+    
+    def rate(self, currency):
+        try:
+            return self.rates[currency.upper()]
+        except KeyError:
+            raise MissingRate(f"No FX rate for {currency} in table {self.version}")
+    
+    def convert_totals(self, totals, target):
+        """
+        Convert {currency: amount} sums into a single amount in `target`.
+        Works on already aggregated per-currency totals, one multiply per
+        currency, and rounds once at the end.
+        """
+        target_rate = self.rate(target)
+        converted = sum(
+            (amount * target_rate / self.rate(currency)
+             for currency, amount in totals.items() if amount),
+            Decimal('0')
+        )
+        return converted.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def get_rate_table(path=None):
+    """
+    The FX table from settings.FX_RATES_FILE, kept in memory and only
+    re-read when the file's mtime changes.
+    """
+    path = path or settings.FX_RATES_FILE
+    key = (path, os.stat(path).st_mtime_ns)
+    
+    table = _cache.get(key)
+    if table is None:
+        with _cache_lock:
+            table = _cache.get(key)
+            if table is None:
+                table = FxRateTable.from_file(path)
+                _cache.clear()
+                _cache[key] = table
+                logger.info(f"Loaded FX rate table {table.version} from {path}")
+    return table
+
+def convert_balances(totals, target):
+    """
+    {'currency', 'amount', 'fx_version'} for per-currency totals converted to
+    `target`, or None when the FX table cannot convert them.
+    """
+    if set(totals) <= {target}:
+        return {'currency': target, 'amount': totals.get(target, Decimal('0.00')), 'fx_version': None}
+    
+    try:
+        table = get_rate_table()
+        return {
+            'currency': target,
+            'amount': table.convert_totals(totals, target),
+            'fx_version': table.version,
+        }
+    except (OSError, ValueError) as e:
+        logger.warning(f"Cannot convert balances to {target}: {e}")
+        return None
@@ -0,0 +1,121 @@
+# expenses/services/ledger_service.py
+
+from collections import defaultdict
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from ..models import BalanceLedger, ExpenseParticipant
+import logging
+
+logger = logging.getLogger(__name__)
+
+class BalanceLedgerService:
+    """
+    Keeps BalanceLedger in step with expenses.
+    
+    An expense is posted once, when the status engine approves it: each
+    participant's outstanding share becomes a debt to the payer. Payments
+    and deletions then adjust the same rows, so cross-group balances are a
+    single indexed read instead of a per-group aggregation.
+    """
+    
+    # Statuses in which an expense's outstanding shares count as debts
+    POSTED_STATUSES = ['auto_approved', 'approved', 'pending', 'partial', 'settled']
+    
+    def outstanding_shares(self, expense):
+        """(debtor_id, outstanding) for every participant who owes the payer"""
+        return [
+            (user_id, amount_owed - amount_paid)
+            for user_id, amount_owed, amount_paid in ExpenseParticipant.objects.filter(
+                expense=expense,
+                is_active=True
+            ).exclude(
+                user_id=expense.paid_by_id
+            ).values_list('user_id', 'amount_owed', 'amount_paid')
+            if amount_owed > amount_paid
+        ]
+    
+    def post_expense(self, expense, sign=1):
+        """Record (sign=1) or reverse (sign=-1) an expense's outstanding debts"""
+        deltas = [
+            (expense.paid_by_id, debtor_id, expense.currency, sign * outstanding)
+            for debtor_id, outstanding in self.outstanding_shares(expense)
+        ]
+        self.apply(deltas)
+    
+    def unpost_expense(self, expense):
+        self.post_expense(expense, sign=-1)
+    
+    def record_payment(self, expense, debtor_id, amount):
+        """A participant paid part of their share back to the payer"""
+        if debtor_id == expense.paid_by_id or expense.status not in self.POSTED_STATUSES:
+            return
+        self.apply([(expense.paid_by_id, debtor_id, expense.currency, -amount)])
+    
+    def apply(self, deltas):
+        """
+        Add (creditor_id, debtor_id, currency, amount) deltas to both mirrored
+        rows with INSERT ... ON CONFLICT DO UPDATE.
+        """
+        totals = defaultdict(Decimal)
+        for creditor_id, debtor_id, currency, amount in deltas:
+            if amount and creditor_id != debtor_id:
+                totals[(creditor_id, debtor_id, currency)] += amount
+                totals[(debtor_id, creditor_id, currency)] -= amount
+        
+        if not totals:
+            return
+        
+        table = connection.ops.quote_name(BalanceLedger._meta.db_table)
+        now = timezone.now()
+        values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(totals))
+        params = []
+        # Rows are locked in VALUES order; a fixed key order keeps concurrent
+        # A->B and B->A writers from taking the mirrored pair in opposite order
+        for (user_id, counterparty_id, currency), amount in sorted(totals.items()):
+            params.extend([user_id, counterparty_id, currency, amount, now])
+        
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, counterparty_id, currency, amount, updated_at) "
+                f"VALUES {values} "
+                f"ON CONFLICT (user_id, counterparty_id, currency) DO UPDATE SET "
+                f"amount = {table}.amount + EXCLUDED.amount, "
+                f"updated_at = EXCLUDED.updated_at",
+                params
+            )
+    
+    def rebuild(self):
+        """Recompute every ledger row from posted expenses in one grouped query"""
+        debts = ExpenseParticipant.objects.filter(
+            is_active=True,
+            expense__is_active=True,
+            expense__status__in=self.POSTED_STATUSES,
+            amount_owed__gt=F('amount_paid')
+        ).exclude(
+            user_id=F('expense__paid_by_id')
+        ).values(
+            'expense__paid_by_id', 'user_id', 'expense__currency'
+        ).annotate(
+            outstanding=Sum(F('amount_owed') - F('amount_paid'))
+        ).order_by()
+        
+        totals = defaultdict(Decimal)
+        for row in debts:
+            creditor_id, debtor_id, currency = row['expense__paid_by_id'], row['user_id'], row['expense__currency']
+            totals[(creditor_id, debtor_id, currency)] += row['outstanding']
+            totals[(debtor_id, creditor_id, currency)] -= row['outstanding']
+        
+        rows = [
+            BalanceLedger(user_id=user_id, counterparty_id=counterparty_id, currency=currency, amount=amount)
+            for (user_id, counterparty_id, currency), amount in sorted(totals.items())
+            if amount
+        ]
+        
+        with transaction.atomic():
+            BalanceLedger.objects.all().delete()
+            BalanceLedger.objects.bulk_create(rows, batch_size=1000)
+        
+        logger.info(f"Rebuilt balance ledger: {len(rows)} rows")
+        return len(rows)
@@ -0,0 +1,234 @@
+# expenses/services/recurring_service.py
+
+import calendar
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from ..models import (
+    Expense, ExpenseAmountStats, ExpenseParticipant, ExpenseStatusHistory, RecurringExpense
+)
+from ..utils import calculate_split_amounts, expense_fingerprint, fingerprint_bucket
+from .ledger_service import BalanceLedgerService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A template that fell behind catches up at most this many periods per run
+MAX_CATCH_UP_PERIODS = 12
+
+def next_period(template, period):
+    """The occurrence date after `period` under a template's rule"""
+    if template.frequency == 'weekly':
+        return period + timedelta(weeks=template.interval)
+    
+    months = template.interval * (12 if template.frequency == 'yearly' else 1)
+    month_index = period.month - 1 + months
+    year = period.year + month_index // 12
+    month = month_index % 12 + 1
+    # Anchor on the start date's day, so the 31st becomes the 28th/30th and back
+    day = min(template.start_date.day, calendar.monthrange(year, month)[1])
+    return period.replace(year=year, month=month, day=day)
+
+def template_split(template, participant_ids):
+    """Per-participant amounts for one occurrence of a template"""
+    values = template.split_values or {}
+    ordered = None
+    if template.split_type in ('custom', 'percentage'):
+        missing = [user_id for user_id in participant_ids if str(user_id) not in values]
+        if missing:
+            raise ValueError(f"No split value for users {missing}")
+        ordered = [Decimal(str(values[str(user_id)])) for user_id in participant_ids]
+    
+    return calculate_split_amounts(
+        template.split_type,
+        template.total_amount,
+        len(participant_ids),
+        split_amounts=ordered if template.split_type == 'custom' else None,
+        split_percentages=ordered if template.split_type == 'percentage' else None
+    )
+
+class RecurringExpenseGenerator:
+    """
+    Materializes due occurrences of recurring expense templates.
+    
+    Templates are processed in keyset-paginated chunks, each in its own
+    transaction with the templates locked (SKIP LOCKED, so parallel runs
+    split the work). A chunk is written with one bulk_create per table, one
+    ledger update and one amount statistics update; the (template, period) unique constraint makes any
+    re-run a no-op for periods that already exist.
+    """
+    
+    def __init__(self, chunk_size=1000, max_seconds=None, templates=None):
+        self.chunk_size = chunk_size
+        self.max_seconds = max_seconds
+        # Restricts a run to some templates (benchmarks); all of them by default
+        self.templates = templates if templates is not None else RecurringExpense.objects.all()
+    
+    def run(self, today=None):
+        today = today or timezone.localdate()
+        deadline = time.monotonic() + self.max_seconds if self.max_seconds else None
+        stats = {'chunks': 0, 'templates': 0, 'expenses': 0, 'deactivated': 0, 'complete': True}
+        last_id = None
+        
+        while True:
+            with transaction.atomic():
+                templates = self.templates.select_for_update(skip_locked=True).filter(
+                    is_active=True,
+                    next_run_date__lte=today
+                ).order_by('id')
+                if last_id is not None:
+                    templates = templates.filter(id__gt=last_id)
+                templates = list(templates[:self.chunk_size])
+                if not templates:
+                    break
+                
+                last_id = templates[-1].id
+                created, deactivated = self.generate_chunk(templates, today)
+            
+            stats['chunks'] += 1
+            stats['templates'] += len(templates)
+            stats['expenses'] += created
+            stats['deactivated'] += deactivated
+            
+            if deadline and time.monotonic() > deadline:
+                # The rest is still due and is picked up by the next run
+                stats['complete'] = False
+                break
+        
+        logger.info(f"Recurring expenses for {today}: {stats}")
+        return stats
+    
+    def generate_chunk(self, templates, today):
+        """Create every due occurrence for a chunk of locked templates"""
+        from groups.models import GroupMembership
+        from groups.services.dashboard_service import bump_dashboard_versions
+        
+        members = defaultdict(set)
+        for group_id, user_id in GroupMembership.objects.filter(
+            group_id__in={template.group_id for template in templates},
+            group__is_active=True,
+            is_active=True
+        ).values_list('group_id', 'user_id'):
+            members[group_id].add(user_id)
+        
+        existing = set(Expense.objects.filter(
+            recurring_template__in=templates,
+            recurring_period__gte=min(template.next_run_date for template in templates)
+        ).values_list('recurring_template_id', 'recurring_period'))
+        
+        now = timezone.now()
+        expenses = []
+        participants = []
+        history = []
+        deltas = []
+        deactivated = 0
+        
+        for template in templates:
+            group_members = members.get(template.group_id, set())
+            participant_ids = [
+                user_id for user_id in (template.participant_ids or sorted(group_members))
+                if user_id in group_members
+            ]
+            
+            try:
+                if template.paid_by_id not in group_members:
+                    raise ValueError("payer is no longer an active member")
+                amounts = template_split(template, participant_ids) if participant_ids else []
+            except ValueError as e:
+                logger.warning(f"Deactivating recurring expense {template.id}: {e}")
+                template.is_active = False
+                deactivated += 1
+                continue
+            
+            period = template.next_run_date
+            for _ in range(MAX_CATCH_UP_PERIODS):
+                if period > today or (template.end_date and period > template.end_date):
+                    break
+                
+                if (template.id, period) not in existing:
+                    expense = self.build_occurrence(template, period, participant_ids, amounts, now)
+                    expenses.append(expense)
+                    history.extend(self.build_history(expense, now))
+                    for user_id, amount in zip(participant_ids, amounts):
+                        is_payer = user_id == template.paid_by_id
+                        participants.append(ExpenseParticipant(
+                            expense=expense,
+                            user_id=user_id,
+                            amount_owed=amount,
+                            amount_paid=amount if is_payer else Decimal('0.00'),
+                            status='paid' if is_payer else 'pending'
+                        ))
+                        if not is_payer and amount:
+                            deltas.append((template.paid_by_id, user_id, template.currency, amount))
+                
+                period = next_period(template, period)
+            
+            template.next_run_date = period
+            if template.end_date and period > template.end_date:
+                template.is_active = False
+        
+        Expense.objects.bulk_create(expenses, batch_size=1000)
+        ExpenseParticipant.objects.bulk_create(participants, batch_size=1000)
+        ExpenseStatusHistory.objects.bulk_create(history, batch_size=1000)
+        # Most templates land on the same few next dates, so one UPDATE per
+        # distinct value is much cheaper than bulk_update's per-row CASE
+        schedule = defaultdict(list)
+        for template in templates:
+            schedule[(template.next_run_date, template.is_active)].append(template.id)
+        for (next_run_date, is_active), template_ids in schedule.items():
+            RecurringExpense.objects.filter(id__in=template_ids).update(
+                next_run_date=next_run_date,
+                is_active=is_active,
+                updated_at=now
+            )
+        BalanceLedgerService().apply(deltas)
+        # Same statistics the approval flow keeps, so priorities see these amounts
+        ExpenseAmountStats.record_expense_amounts(
+            (expense.group_id, expense.paid_by_id, expense.total_amount) for expense in expenses
+        )
+        
+        bump_dashboard_versions(
+            user_id
+            for group_id in {expense.group_id for expense in expenses}
+            for user_id in members[group_id]
+        )
+        
+        return len(expenses), deactivated
+    
+    def build_occurrence(self, template, period, participant_ids, amounts, now):
+        # Templates were set up deliberately, so occurrences skip the approval queue
+        return Expense(
+            id=uuid.uuid4(),
+            group_id=template.group_id,
+            paid_by_id=template.paid_by_id,
+            title=template.title,
+            description=template.description,
+            total_amount=template.total_amount,
+            currency=template.currency,
+            split_type=template.split_type,
+            status='pending' if participant_ids else 'auto_approved',
+            approved_at=now,
+            approval_type='auto_recurring',
+            recurring_template=template,
+            recurring_period=period,
+            fingerprint=expense_fingerprint(template.group_id, template.total_amount, template.currency, template.title),
+            fingerprint_bucket=fingerprint_bucket(now)
+        )
+    
+    def build_history(self, expense, now):
+        path = ['pending_approval', 'auto_approved']
+        if expense.status == 'pending':
+            path.append('pending')
+        return [
+            ExpenseStatusHistory(
+                expense=expense,
+                from_status=from_status,
+                to_status=to_status,
+                reason='auto_recurring'
+            )
+            for from_status, to_status in zip(path, path[1:])
+        ]
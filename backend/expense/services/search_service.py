@@ -0,0 +1,90 @@
+# expenses/services/search_service.py
+
+import base64
+import json
+import re
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import DecimalField, F, Q, Value
+from django.db.models.functions import Cast
+from ..models import Expense
+
+# Must match the config used by the search_vector trigger (migration 0012)
+SEARCH_CONFIG = 'simple'
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+MEMBER_VISIBLE_STATUSES = ['auto_approved', 'approved', 'pending', 'partial', 'settled']
+
+def search_terms(query):
+    """Words of a user query, safe to put in a raw tsquery"""
+    return re.findall(r'\w+', query.lower())[:10]
+
+def encode_cursor(expense):
+    position = [str(expense.rank), expense.created_at.isoformat(), str(expense.id)]
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """(rank, created_at, id) from an opaque cursor; ValueError if it is malformed"""
+    try:
+        rank, created_at, expense_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return Decimal(rank), datetime.fromisoformat(created_at), uuid.UUID(expense_id)
+    except Exception:
+        raise ValueError("Invalid cursor.")
+
+def search_group_expenses(group, query, include_unapproved=False, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of a group's expenses matching `query`, best match first.
+    
+    Every word must match the start of a word in the title or description
+    ('ube' finds "Uber"). On PostgreSQL this is a tsquery against the
+    GIN-indexed search_vector, ranked with ts_rank (title outweighs
+    description); elsewhere it falls back to unranked icontains.
+    Pages are keyset-paginated on (rank, created_at, id), so later pages
+    cost the same as the first. Returns (expenses, next_cursor).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], None
+    
+    expenses = Expense.objects.filter(
+        group=group,
+        is_active=True
+    ).select_related('paid_by').defer('search_vector')
+    if not include_unapproved:
+        expenses = expenses.filter(status__in=MEMBER_VISIBLE_STATUSES)
+    
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms),
+            config=SEARCH_CONFIG,
+            search_type='raw'
+        )
+        # Rank as fixed-point numeric so cursor comparisons are exact
+        expenses = expenses.filter(search_vector=search_query).annotate(
+            rank=Cast(
+                SearchRank(F('search_vector'), search_query),
+                DecimalField(max_digits=12, decimal_places=6)
+            )
+        )
+    else:
+        for term in terms:
+            expenses = expenses.filter(Q(title__icontains=term) | Q(description__icontains=term))
+        expenses = expenses.annotate(
+            rank=Value(Decimal('0'), output_field=DecimalField(max_digits=12, decimal_places=6))
+        )
+    
+    if cursor:
+        rank, created_at, expense_id = decode_cursor(cursor)
+        expenses = expenses.filter(
+            Q(rank__lt=rank) |
+            Q(rank=rank, created_at__lt=created_at) |
+            Q(rank=rank, created_at=created_at, id__lt=expense_id)
+        )
+    
+    page = list(expenses.order_by('-rank', '-created_at', '-id')[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
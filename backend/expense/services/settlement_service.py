@@ -0,0 +1,129 @@
+# expenses/services/settlement_service.py
+
+from decimal import Decimal
+import uuid
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from ..models import ExpenseParticipant, Payment
+from .ledger_service import BalanceLedgerService
+from .status_service import ExpenseStatusService
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SettleUpService:
+    """
+    Pay a counterpart back across many expenses at once.
+    
+    The payment is allocated to the payer's oldest open shares in expenses
+    the counterpart paid for, written with one bulk_update plus one Payment
+    row per allocation, and expense statuses are recomputed in a single
+    pass, all in one transaction.
+    """
+    
+    SETTLEABLE_STATUSES = ['pending', 'partial']
+    
+    def __init__(self, payer, counterparty):
+        self.payer = payer
+        self.counterparty = counterparty
+    
+    def open_participations(self, currency, group=None):
+        """The payer's unpaid shares owed to the counterpart, oldest expense first"""
+        participations = ExpenseParticipant.objects.filter(
+            user=self.payer,
+            is_active=True,
+            expense__paid_by=self.counterparty,
+            expense__is_active=True,
+            expense__status__in=self.SETTLEABLE_STATUSES,
+            expense__currency=currency,
+            amount_owed__gt=F('amount_paid')
+        ).select_related('expense').order_by('expense__created_at', 'id')
+        
+        if group is not None:
+            participations = participations.filter(expense__group=group)
+        
+        return participations
+    
+    def outstanding(self, currency, group=None):
+        return sum(
+            (participant.amount_owed - participant.amount_paid
+             for participant in self.open_participations(currency, group)),
+            Decimal('0.00')
+        )
+    
+    def settle(self, amount, currency='USD', group=None):
+        """
+        Apply `amount` to the oldest open shares first.
+        Returns (settlement_id, [(participant, amount_applied), ...]).
+        """
+        if amount <= 0:
+            raise ValueError("Settlement amount must be positive")
+        
+        with transaction.atomic():
+            participations = list(
+                self.open_participations(currency, group).select_for_update(of=('self', 'expense'))
+            )
+            
+            outstanding = sum(
+                (participant.amount_owed - participant.amount_paid for participant in participations),
+                Decimal('0.00')
+            )
+            if amount > outstanding:
+                raise ValueError(f"Cannot settle more than owed. Maximum: {outstanding}")
+            
+            now = timezone.now()
+            remaining = amount
+            allocations = []
+            for participant in participations:
+                if remaining <= 0:
+                    break
+                
+                applied = min(remaining, participant.amount_owed - participant.amount_paid)
+                participant.amount_paid += applied
+                if participant.amount_paid >= participant.amount_owed:
+                    participant.status = 'paid'
+                participant.updated_at = now
+                participant.version += 1
+                
+                allocations.append((participant, applied))
+                remaining -= applied
+            
+            # Rows are locked above, so writing the computed totals is safe here
+            ExpenseParticipant.objects.bulk_update(
+                [participant for participant, _ in allocations],
+                ['amount_paid', 'status', 'updated_at', 'version']
+            )
+            
+            settlement_id = uuid.uuid4()
+            Payment.objects.bulk_create([
+                Payment(
+                    expense=participant.expense,
+                    participant=participant,
+                    payer=self.payer,
+                    payee=self.counterparty,
+                    amount=applied,
+                    currency=currency,
+                    settlement_id=settlement_id,
+                    created_at=now
+                )
+                for participant, applied in allocations
+            ])
+            
+            BalanceLedgerService().apply([
+                (self.counterparty.id, self.payer.id, currency, -amount)
+            ])
+            
+            ExpenseStatusService.sync_payment_statuses(
+                [participant.expense for participant, _ in allocations],
+                changed_by=self.payer
+            )
+        
+        from groups.services.dashboard_service import bump_dashboard_versions
+        bump_dashboard_versions([self.payer.id, self.counterparty.id])
+        
+        logger.info(
+            f"User {self.payer.id} settled {amount} {currency} with user {self.counterparty.id} "
+            f"across {len(allocations)} expenses"
+        )
+        return settlement_id, allocations
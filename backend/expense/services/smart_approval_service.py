@@ -3,9 +3,14 @@
 from decimal import Decimal
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import Q
 from django.contrib.auth import get_user_model
-from ..models import Expense, GroupApprovalSettings, GroupMemberTrust, ApprovalQueue
+from ..models import (
+    Expense, GroupApprovalSettings, GroupMemberTrust, ApprovalQueue,
+    ExpenseAmountStats
+)
 from ..utils import create_group_expense
+from .status_service import ExpenseStatusService, ExpenseStatusConflict
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,6 +28,7 @@ class SmartApprovalService:
     def __init__(self, group):
         self.group = group
         self.settings = self._get_or_create_settings()
+        self._amount_stats = {}
     
     def _get_or_create_settings(self):
         """Get or create approval settings for the group"""
@@ -40,10 +46,18 @@ class SmartApprovalService:
     
     def create_expense_with_smart_approval(self, paid_by_user, expense_data, 
                                          participant_user_ids=None, has_receipt=False, 
-                                         receipt_image=None):
+                                         receipt_image=None, itemization=None,
+                                         allow_duplicate=False):
         """
-        Create expense and automatically determine if it needs approval
+        Create expense and automatically determine if it needs approval.
+        Likely duplicates are held for approval, or rejected with
+        DuplicateExpense when the group says so, unless allow_duplicate.
         """
+        if allow_duplicate:
+            on_duplicate = 'ignore'
+        else:
+            on_duplicate = 'reject' if self.settings.reject_duplicates else 'flag'
+        
         with transaction.atomic():
             # Create expense with pending_approval status initially
             expense_data['status'] = 'pending_approval'
@@ -59,19 +73,32 @@ class SmartApprovalService:
                 group=self.group,
                 paid_by_user=paid_by_user,
                 expense_data=expense_data,
-                participant_user_ids=participant_user_ids
+                participant_user_ids=participant_user_ids,
+                itemization=itemization,
+                on_duplicate=on_duplicate
             )
             
             # Apply smart approval logic
             approval_result = self._evaluate_auto_approval(expense, paid_by_user)
+            approval_result['possible_duplicates'] = [
+                str(expense_id) for expense_id in expense.possible_duplicates
+            ]
             
             if approval_result['auto_approve']:
-                self._auto_approve_expense(expense, approval_result['reason'])
+                self._auto_approve_expense(
+                    expense,
+                    approval_result['reason'],
+                    has_participants=participant_user_ids is None or bool(participant_user_ids)
+                )
                 logger.info(f"Auto-approved expense {expense.id}: {approval_result['reason']}")
             else:
                 self._queue_for_approval(expense, approval_result.get('priority', 0))
                 logger.info(f"Queued expense {expense.id} for manual approval")
             
+            # Fold the amount into the running statistics after evaluation,
+            # so an expense is never compared against itself
+            self._record_amount_stats(expense)
+            
             return expense, approval_result
     
     def _evaluate_auto_approval(self, expense, creator):
@@ -81,6 +108,27 @@ class SmartApprovalService:
         """
         amount = expense.total_amount
         
+        # Likely duplicates always need a human (set by create_group_expense)
+        duplicate_ids = getattr(expense, 'possible_duplicates', None)
+        if duplicate_ids:
+            return {
+                'auto_approve': False,
+                'reason': 'possible_duplicate',
+                'priority': self._calculate_approval_priority(expense, creator),
+                'details': f'Matches {len(duplicate_ids)} recent expense(s) in this group'
+            }
+        
+        # Rule 0: Unusually large amounts for this group always need a human
+        if self.settings.hold_above_group_p95:
+            group_p95 = self._get_amount_percentile(95)
+            if group_p95 is not None and amount > group_p95:
+                return {
+                    'auto_approve': False,
+                    'reason': 'manual_approval_required',
+                    'priority': self._calculate_approval_priority(expense, creator),
+                    'details': f'Amount ${amount} above group 95th percentile ${group_p95}'
+                }
+        
         # Rule 1: Small amounts auto-approve
         if amount <= self.settings.auto_approve_limit:
             return {
@@ -158,11 +206,26 @@ class SmartApprovalService:
         """Calculate priority for manual approval queue"""
         priority = 0
         
-        # Higher priority for larger amounts
-        if expense.total_amount > 100:
-            priority += 2
-        if expense.total_amount > 200:
-            priority += 3
+        # Higher priority for larger amounts, relative to what is normal for
+        # this group once enough history exists
+        group_p75 = self._get_amount_percentile(75)
+        group_p95 = self._get_amount_percentile(95)
+        if group_p75 is not None and group_p95 is not None:
+            if expense.total_amount > group_p75:
+                priority += 2
+            if expense.total_amount > group_p95:
+                priority += 3
+        else:
+            if expense.total_amount > 100:
+                priority += 2
+            if expense.total_amount > 200:
+                priority += 3
+        
+        # Unusual amount for this particular member; member statistics are
+        # kept per payer (see _record_amount_stats)
+        member_p95 = self._get_amount_percentile(95, user=expense.paid_by)
+        if member_p95 is not None and expense.total_amount > member_p95:
+            priority += 1
         
         # Lower priority for trusted members
         trust = self._get_user_trust(creator)
@@ -178,20 +241,41 @@ class SmartApprovalService:
         
         return max(0, priority)  # Don't go below 0
     
-    def _auto_approve_expense(self, expense, reason):
-        """Auto-approve an expense"""
-        expense.status = 'auto_approved'
-        expense.approved_by = None  # System approval
-        expense.approved_at = timezone.now()
-        expense.approval_type = reason
-        expense.save()
+    def _get_amount_stats(self, user=None):
+        """Get running amount statistics for the group, or for one member"""
+        key = user.id if user else None
+        if key not in self._amount_stats:
+            self._amount_stats[key] = ExpenseAmountStats.objects.filter(
+                group=self.group,
+                user=user
+            ).first()
+        return self._amount_stats[key]
+    
+    def _get_amount_percentile(self, q, user=None):
+        """Percentile of past amounts, or None until there is enough history"""
+        stats = self._get_amount_stats(user)
+        if stats is None or not stats.has_enough_samples:
+            return None
+        return stats.percentile(q)
+    
+    def _record_amount_stats(self, expense):
+        """Update group and payer statistics with a new expense amount (O(1))"""
+        ExpenseAmountStats.record_expense_amounts([
+            (self.group.id, expense.paid_by_id, expense.total_amount)
+        ])
+        # Refresh the cached rows so priority reads see the new amount
+        for stats in ExpenseAmountStats.objects.filter(
+            Q(user__isnull=True) | Q(user_id=expense.paid_by_id),
+            group=self.group
+        ):
+            self._amount_stats[stats.user_id] = stats
+    
+    def _auto_approve_expense(self, expense, reason, has_participants=None):
+        """Auto-approve an expense and make it active for payments"""
+        ExpenseStatusService(expense).approve(reason, has_participants=has_participants)
         
         # Update user trust metrics
         self._update_user_trust_metrics(expense.paid_by, approved=True)
-        
-        # Set expense to active status
-        expense.status = 'pending'  # Now active for payments
-        expense.save()
     
     def _queue_for_approval(self, expense, priority=0):
         """Add expense to approval queue"""
@@ -224,11 +308,10 @@ class SmartApprovalService:
     def manually_approve_expense(self, expense, approver, batch_approval=False):
         """Manually approve an expense"""
         with transaction.atomic():
-            expense.status = 'approved'
-            expense.approved_by = approver
-            expense.approved_at = timezone.now()
-            expense.approval_type = 'batch' if batch_approval else 'manual'
-            expense.save()
+            ExpenseStatusService(expense).approve(
+                'batch' if batch_approval else 'manual',
+                approver=approver
+            )
             
             # Remove from approval queue
             ApprovalQueue.objects.filter(expense=expense).delete()
@@ -236,20 +319,12 @@ class SmartApprovalService:
             # Update trust metrics
             self._update_user_trust_metrics(expense.paid_by, approved=True)
             
-            # Set to active status
-            expense.status = 'pending'
-            expense.save()
-            
             logger.info(f"Manually approved expense {expense.id} by {approver.username}")
     
     def reject_expense(self, expense, approver, reason=""):
         """Reject an expense"""
         with transaction.atomic():
-            expense.status = 'rejected'
-            expense.approved_by = approver
-            expense.approved_at = timezone.now()
-            expense.rejection_reason = reason
-            expense.save()
+            ExpenseStatusService(expense).reject(approver, reason)
             
             # Remove from approval queue
             ApprovalQueue.objects.filter(expense=expense).delete()
@@ -279,7 +354,7 @@ class SmartApprovalService:
                     )
                     self.manually_approve_expense(expense, approver, batch_approval=True)
                     approved_count += 1
-                except Expense.DoesNotExist:
+                except (Expense.DoesNotExist, ExpenseStatusConflict):
                     continue
         
         logger.info(f"Batch approved {approved_count} expenses by {approver.username}")
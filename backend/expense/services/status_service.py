@@ -0,0 +1,262 @@
+# expenses/services/status_service.py
+
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Sum, Count, F
+from django.utils import timezone
+from decimal import Decimal
+from ..models import Expense, ExpenseParticipant, ExpenseStatusHistory
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ExpenseStatusConflict(Exception):
+    """Raised when an expense's status changed underneath a transition"""
+    pass
+
+class ExpenseStatusService:
+    """
+    Central status transition engine for expenses.
+    
+    The final status is computed up front and persisted with a single
+    UPDATE ... WHERE status = <expected>, so two concurrent writers can
+    never silently overwrite each other's transition. Every step of the
+    path (e.g. pending_approval -> auto_approved -> pending) is recorded in
+    ExpenseStatusHistory instead of being saved on the expense in turn.
+    """
+    
+    TRANSITIONS = {
+        'pending_approval': {'auto_approved', 'approved', 'rejected'},
+        'auto_approved': {'pending', 'partial', 'settled'},
+        'approved': {'pending', 'partial', 'settled'},
+        'pending': {'partial', 'settled'},
+        'partial': {'pending', 'settled'},
+        'settled': {'pending', 'partial'},
+        'rejected': set(),
+    }
+    
+    APPROVED_STATUSES = ['auto_approved', 'approved']
+    PAYMENT_STATUSES = ['pending', 'partial', 'settled']
+    
+    def __init__(self, expense):
+        self.expense = expense
+    
+    @staticmethod
+    def payment_status(total_owed, total_paid):
+        """Status implied by the participants' payment totals"""
+        if total_paid >= total_owed:
+            return 'settled'
+        if total_paid > 0:
+            return 'partial'
+        return 'pending'
+    
+    def participant_totals(self):
+        """Return (count, total_owed, total_paid) for active participants in one query"""
+        totals = self.expense.participants.filter(is_active=True).aggregate(
+            count=Count('id'),
+            total_owed=Sum('amount_owed'),
+            total_paid=Sum('amount_paid')
+        )
+        return (
+            totals['count'],
+            totals['total_owed'] or Decimal('0.00'),
+            totals['total_paid'] or Decimal('0.00'),
+        )
+    
+    def transition(self, path, changed_by=None, reason='', **fields):
+        """
+        Move the expense through each status in `path` with one write.
+        Extra keyword arguments are stored on the expense in the same UPDATE.
+        """
+        expense = self.expense
+        expected = expense.status
+        
+        steps = []
+        current = expected
+        for next_status in path:
+            if next_status not in self.TRANSITIONS.get(current, set()):
+                raise ValueError(f"Invalid status transition {current} -> {next_status}")
+            steps.append((current, next_status))
+            current = next_status
+        
+        if not steps:
+            return expense
+        
+        now = timezone.now()
+        with transaction.atomic():
+            updated = Expense.objects.filter(
+                pk=expense.pk,
+                status=expected
+            ).update(status=current, updated_at=now, version=F('version') + 1, **fields)
+            
+            if not updated:
+                raise ExpenseStatusConflict(
+                    f"Expense {expense.pk} is no longer in status '{expected}'"
+                )
+            
+            # Outstanding shares become cross-group debts once the expense is approved
+            from .ledger_service import BalanceLedgerService
+            posted = BalanceLedgerService.POSTED_STATUSES
+            if expected not in posted and current in posted:
+                BalanceLedgerService().post_expense(expense)
+            
+            ExpenseStatusHistory.objects.bulk_create([
+                ExpenseStatusHistory(
+                    expense=expense,
+                    from_status=from_status,
+                    to_status=to_status,
+                    changed_by=changed_by,
+                    reason=reason
+                )
+                for from_status, to_status in steps
+            ])
+        
+        # Keep the in-memory instance in step with the row
+        expense.status = current
+        expense.updated_at = now
+        expense.version += 1
+        for field, value in fields.items():
+            setattr(expense, field, value)
+        
+        # The UPDATE above bypasses post_save, so invalidate dashboards here
+        from groups.services.dashboard_service import bump_group_dashboards
+        bump_group_dashboards(expense.group_id)
+        
+        logger.info(f"Expense {expense.pk}: {' -> '.join([expected] + list(path))}")
+        return expense
+    
+    def approve(self, approval_type, approver=None, has_participants=None):
+        """
+        Approve a pending expense and move it straight into payment tracking.
+        Only the final status is written; the approval step goes to history.
+        """
+        approved_status = 'approved' if approver else 'auto_approved'
+        path = [approved_status]
+        
+        if has_participants is None:
+            has_participants = self.expense.participants.filter(is_active=True).exists()
+        if has_participants:
+            # Approved expenses become active for payments
+            path.append('pending')
+        
+        return self.transition(
+            path,
+            changed_by=approver,
+            reason=approval_type,
+            approved_by=approver,
+            approved_at=timezone.now(),
+            approval_type=approval_type
+        )
+    
+    def reject(self, approver, reason=''):
+        """Reject a pending expense"""
+        return self.transition(
+            ['rejected'],
+            changed_by=approver,
+            reason=reason,
+            approved_by=approver,
+            approved_at=timezone.now(),
+            rejection_reason=reason
+        )
+    
+    def sync_payment_status(self, changed_by=None, max_attempts=3):
+        """
+        Recompute the payment status from participant totals and persist it
+        if it changed. Retries when another writer moved the status first.
+        """
+        expense = self.expense
+        
+        for attempt in range(max_attempts):
+            if expense.status not in self.APPROVED_STATUSES + self.PAYMENT_STATUSES:
+                return expense
+            
+            count, total_owed, total_paid = self.participant_totals()
+            if not count:
+                return expense
+            
+            new_status = self.payment_status(total_owed, total_paid)
+            if new_status == expense.status:
+                return expense
+            
+            try:
+                return self.transition([new_status], changed_by=changed_by, reason='payment')
+            except ExpenseStatusConflict:
+                expense.refresh_from_db(fields=['status'])
+        
+        raise ExpenseStatusConflict(f"Expense {expense.pk} status kept changing, giving up")
+    
+    @classmethod
+    def sync_payment_statuses(cls, expenses, changed_by=None, reason='payment'):
+        """
+        Recompute payment status for many expenses in one pass: one aggregate
+        over their participants, then one conditional UPDATE per distinct
+        (from, to) status pair. Callers should hold row locks on the expenses.
+        Returns the expenses whose status changed.
+        """
+        expenses = {
+            expense.pk: expense for expense in expenses
+            if expense.status in cls.APPROVED_STATUSES + cls.PAYMENT_STATUSES
+        }
+        if not expenses:
+            return []
+        
+        totals = ExpenseParticipant.objects.filter(
+            expense_id__in=expenses,
+            is_active=True
+        ).values('expense_id').annotate(
+            total_owed=Sum('amount_owed'),
+            total_paid=Sum('amount_paid')
+        ).order_by()
+        
+        moves = defaultdict(list)
+        for row in totals:
+            expense = expenses[row['expense_id']]
+            new_status = cls.payment_status(
+                row['total_owed'] or Decimal('0.00'),
+                row['total_paid'] or Decimal('0.00')
+            )
+            if new_status != expense.status:
+                if new_status not in cls.TRANSITIONS.get(expense.status, set()):
+                    raise ValueError(f"Invalid status transition {expense.status} -> {new_status}")
+                moves[(expense.status, new_status)].append(expense)
+        
+        if not moves:
+            return []
+        
+        now = timezone.now()
+        changed = []
+        with transaction.atomic():
+            for (from_status, to_status), moved in moves.items():
+                updated = Expense.objects.filter(
+                    pk__in=[expense.pk for expense in moved],
+                    status=from_status
+                ).update(status=to_status, updated_at=now, version=F('version') + 1)
+                
+                if updated != len(moved):
+                    raise ExpenseStatusConflict(
+                        f"{len(moved) - updated} expenses left status '{from_status}' during a bulk update"
+                    )
+                
+                for expense in moved:
+                    expense.status = to_status
+                    expense.updated_at = now
+                    expense.version += 1
+                changed.extend((from_status, expense) for expense in moved)
+            
+            ExpenseStatusHistory.objects.bulk_create([
+                ExpenseStatusHistory(
+                    expense=expense,
+                    from_status=from_status,
+                    to_status=expense.status,
+                    changed_by=changed_by,
+                    reason=reason
+                )
+                for from_status, expense in changed
+            ])
+        
+        from groups.services.dashboard_service import bump_group_dashboards
+        for group_id in {expense.group_id for _, expense in changed}:
+            bump_group_dashboards(group_id)
+        
+        logger.info(f"Bulk status sync moved {len(changed)} expenses")
+        return [expense for _, expense in changed]
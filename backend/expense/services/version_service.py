@@ -0,0 +1,75 @@
+# expenses/services/version_service.py
+
+from django.db.models import F
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+class VersionConflict(Exception):
+    """The row was changed by someone else since the client read it"""
+    
+    def __init__(self, instance, expected_version):
+        self.instance = instance
+        self.expected_version = expected_version
+        self.current_version = type(instance).objects.filter(
+            pk=instance.pk
+        ).values_list('version', flat=True).first()
+        super().__init__(
+            f"{type(instance).__name__} {instance.pk} is at version "
+            f"{self.current_version}, not {expected_version}"
+        )
+
+# Each versioned model gets its own ETag format, so an expense ETag echoed
+# into a participant's If-Match can never match by accident
+ETAG_PREFIXES = {
+    'Expense': '',
+    'ExpenseParticipant': 'p',
+}
+
+def etag_for(instance, version=None):
+    """Strong ETag for a versioned row (or for `version` of it)"""
+    prefix = ETAG_PREFIXES[type(instance).__name__]
+    return f'"{prefix}{instance.version if version is None else version}"'
+
+def parse_if_match(request, model):
+    """
+    Version of `model` a client expects from its If-Match header.
+    None when the header is missing or '*'; ValueError when malformed,
+    weak, or an ETag of another kind of row.
+    """
+    header = request.headers.get('If-Match', '').strip()
+    if not header or header == '*':
+        return None
+    
+    prefix = ETAG_PREFIXES[model.__name__]
+    example = f'"{prefix}3"'
+    if header.startswith('W/'):
+        raise ValueError(f"If-Match must be a strong ETag such as {example}.")
+    
+    value = header[1:-1] if len(header) > 1 and header[0] == header[-1] == '"' else ''
+    if not value.startswith(prefix) or not value[len(prefix):].isdigit():
+        raise ValueError(f"If-Match must be an ETag of this {model._meta.verbose_name}, such as {example}.")
+    return int(value[len(prefix):])
+
+def save_versioned(instance, fields, expected_version=None):
+    """
+    Write `fields` of an instance with UPDATE ... WHERE version = n, bumping
+    the version. Raises VersionConflict instead of overwriting a newer row.
+    """
+    expected = instance.version if expected_version is None else expected_version
+    values = {field: getattr(instance, field) for field in fields}
+    if hasattr(instance, 'updated_at'):
+        values['updated_at'] = instance.updated_at = timezone.now()
+    
+    updated = type(instance).objects.filter(
+        pk=instance.pk,
+        version=expected
+    ).update(version=F('version') + 1, **values)
+    
+    if not updated:
+        logger.info(f"Version conflict on {type(instance).__name__} {instance.pk} (expected {expected})")
+        raise VersionConflict(instance, expected)
+    
+    instance.version = expected + 1
+    return instance
@@ -1,3 +1,1041 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from urllib.parse import parse_qs, urlparse
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from friends.models import FriendShip
+from groups.models import Group, GroupMembership
+from .models import (
+    ApprovalQueue, BalanceLedger, Expense, ExpenseAmountStats, ExpenseParticipant, ExpenseStatusHistory,
+    GroupApprovalSettings, Payment, RecurringExpense
+)
+from .serializers import GroupExpenseSummarySerializer
+from .services.filter_service import filter_expenses
+from .services.fx_service import FxRateTable, convert_balances, get_rate_table
+from .services.ledger_service import BalanceLedgerService
+from .services.recurring_service import RecurringExpenseGenerator
+from .services.search_service import (
+    MEMBER_VISIBLE_STATUSES, decode_cursor, encode_cursor, search_group_expenses, search_terms
+)
+from .services.smart_approval_service import SmartApprovalService
+from .services.status_service import ExpenseStatusConflict, ExpenseStatusService
+from .services.version_service import VersionConflict, save_versioned
+from .utils import (
+    DuplicateExpense, allocate_cents, allocate_itemized_cents, calculate_itemized_split, create_group_expense,
+    get_group_expense_summary, get_user_group_balance, resplit_expense, settle_expense_for_user
+)
 
-# Create your tests here.
+User = get_user_model()
+
+def make_group_expense(total_amount=Decimal('100000.00'), split_type='equal', member_count=2):
+    """A group with `member_count` members and one approved expense paid by the first"""
+    users = [
+        User.objects.create_user(f"member{index}", f"member{index}@example.com")
+        for index in range(member_count)
+    ]
+    group = Group.objects.create(name='Test group', owner=users[0])
+    for user in users:
+        GroupMembership.objects.create(group=group, user=user)
+    
+    return users, group, add_expense(group, users[0], 'Test expense', total_amount, split_type=split_type)
+
+def add_expense(group, paid_by, title, total_amount, currency='USD', split_type='equal'):
+    """An approved expense split between all members, through smart approval"""
+    approval_service = SmartApprovalService(group)
+    expense, _ = approval_service.create_expense_with_smart_approval(paid_by, {
+        'title': title,
+        'total_amount': total_amount,
+        'currency': currency,
+        'split_type': split_type,
+    }, allow_duplicate=True)
+    if expense.status == 'pending_approval':
+        approval_service.manually_approve_expense(expense, group.owner)
+    return expense
+
+class ExpenseVersionConcurrencyTests(TransactionTestCase):
+    """Many threads writing one expense; versioned writes must never lose an update"""
+    
+    threads = 8
+    iterations = 25
+    
+    def setUp(self):
+        (self.payer, self.debtor), _, self.expense = make_group_expense()
+    
+    def run_concurrently(self, operation):
+        results = {'ok': 0, 'conflict': 0, 'error': 0}
+        errors = []
+        lock = threading.Lock()
+        
+        def worker():
+            try:
+                for _ in range(self.iterations):
+                    try:
+                        operation()
+                        outcome = 'ok'
+                    except VersionConflict:
+                        outcome = 'conflict'
+                    except Exception as e:
+                        errors.append(f"{type(e).__name__}: {e}")
+                        outcome = 'error'
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connection.close()
+        
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for worker_thread in workers:
+            worker_thread.start()
+        for worker_thread in workers:
+            worker_thread.join()
+        
+        # sqlite serializes writers and may refuse one with "table is locked";
+        # that is a failed write, not a lost one, so it is tolerated there
+        if connection.vendor == 'postgresql':
+            self.assertEqual(errors, [])
+        self.assertGreater(results['ok'], 0)
+        return results
+    
+    def test_versioned_edits_lose_no_updates(self):
+        Expense.objects.filter(pk=self.expense.pk).update(description='0')
+        
+        def versioned_edit():
+            expense = Expense.objects.get(pk=self.expense.pk)
+            expense.description = str(int(expense.description) + 1)
+            save_versioned(expense, ['description'])
+        
+        results = self.run_concurrently(versioned_edit)
+        
+        final = int(Expense.objects.get(pk=self.expense.pk).description)
+        self.assertEqual(final, results['ok'])
+    
+    def test_versioned_payments_match_amount_paid(self):
+        def versioned_payment():
+            expense = Expense.objects.get(pk=self.expense.pk)
+            version = ExpenseParticipant.objects.filter(
+                expense=expense,
+                user=self.debtor
+            ).values_list('version', flat=True).get()
+            settle_expense_for_user(expense, self.debtor, Decimal('1.00'), expected_version=version)
+        
+        results = self.run_concurrently(versioned_payment)
+        
+        participant = ExpenseParticipant.objects.get(expense=self.expense, user=self.debtor)
+        payments = list(Payment.objects.filter(participant=participant).values_list('amount', flat=True))
+        if connection.vendor == 'postgresql':
+            # On sqlite a locked follow-up write can fail after its payment committed
+            self.assertEqual(len(payments), results['ok'])
+        self.assertEqual(participant.amount_paid, sum(payments))
+        self.assertLessEqual(participant.amount_paid, participant.amount_owed)
+
+def random_receipt(rng, item_count, people):
+    """Item cents, per-item participant weights (0 = not on it), tax and tip"""
+    item_cents = [rng.randint(1, 20000) for _ in range(item_count)]
+    item_weights = []
+    for _ in range(item_count):
+        row = [0] * people
+        for index in rng.sample(range(people), rng.randint(1, people)):
+            row[index] = rng.choice([1, 1, 1, 2, 3, 5])
+        item_weights.append(row)
+    return item_cents, item_weights, rng.randint(0, 5000), rng.randint(0, 5000)
+
+class ItemizedSplitTests(SimpleTestCase):
+    """Invariants of the integer-cents allocators on seeded random receipts"""
+    
+    cases = 500
+    
+    def setUp(self):
+        self.rng = random.Random(42)
+    
+    def test_allocate_cents_uses_largest_remainder_order(self):
+        for _ in range(self.cases):
+            weights = [self.rng.randint(0, 9) for _ in range(self.rng.randint(1, 12))]
+            weights[self.rng.randrange(len(weights))] += 1
+            total = self.rng.randint(0, 100000)
+            weight_sum = sum(weights)
+            
+            shares = allocate_cents(total, weights)
+            
+            self.assertEqual(sum(shares), total)
+            floors = [total * weight // weight_sum for weight in weights]
+            remainders = [total * weight % weight_sum for weight in weights]
+            extra = [share - floor for share, floor in zip(shares, floors)]
+            self.assertTrue(all(cents in (0, 1) for cents in extra), (total, weights, shares))
+            # Every leftover cent beats everyone who missed out: a larger
+            # remainder, or the same remainder at an earlier position
+            for winner in (index for index, cents in enumerate(extra) if cents):
+                for loser in (index for index, cents in enumerate(extra) if not cents):
+                    self.assertGreaterEqual(remainders[winner], remainders[loser])
+                    if remainders[winner] == remainders[loser]:
+                        self.assertLess(winner, loser)
+    
+    def test_receipt_sums_exactly_without_negative_shares(self):
+        for _ in range(self.cases):
+            item_cents, item_weights, tax_cents, tip_cents = random_receipt(
+                self.rng, self.rng.randint(1, 40), self.rng.randint(1, 12)
+            )
+            
+            result = allocate_itemized_cents(item_cents, item_weights, tax_cents, tip_cents)
+            
+            self.assertEqual(sum(result), sum(item_cents) + tax_cents + tip_cents)
+            self.assertTrue(all(share >= 0 for share in result), result)
+            self.assertEqual(result, allocate_itemized_cents(item_cents, item_weights, tax_cents, tip_cents))
+    
+    def test_item_shares_are_within_a_cent(self):
+        for _ in range(self.cases):
+            people = self.rng.randint(1, 12)
+            weights = [0] * people
+            for index in self.rng.sample(range(people), self.rng.randint(1, people)):
+                weights[index] = self.rng.randint(1, 5)
+            cents = self.rng.randint(1, 20000)
+            weight_sum = sum(weights)
+            
+            for share, weight in zip(allocate_cents(cents, weights), weights):
+                if not weight:
+                    self.assertEqual(share, 0)
+                self.assertLess(abs(share * weight_sum - cents * weight), weight_sum)
+    
+    def test_tax_and_tip_are_pro_rata_within_a_cent(self):
+        for case in range(self.cases):
+            item_cents, item_weights, tax_cents, tip_cents = random_receipt(
+                self.rng, self.rng.randint(1, 40), self.rng.randint(1, 12)
+            )
+            # Tax alone, tip alone and both together
+            tax_cents, tip_cents = [(tax_cents, 0), (0, tip_cents), (tax_cents, tip_cents)][case % 3]
+            surcharge = tax_cents + tip_cents
+            
+            subtotals = allocate_itemized_cents(item_cents, item_weights)
+            result = allocate_itemized_cents(item_cents, item_weights, tax_cents, tip_cents)
+            subtotal_sum = sum(subtotals)
+            
+            for subtotal, share in zip(subtotals, result):
+                surcharge_share = share - subtotal
+                # Participants without items pay no tax or tip
+                if not subtotal:
+                    self.assertEqual(surcharge_share, 0)
+                self.assertLess(abs(surcharge_share * subtotal_sum - surcharge * subtotal), subtotal_sum)
+    
+    def test_calculate_itemized_split_in_decimals(self):
+        amounts = calculate_itemized_split(
+            [1, 2, 3],
+            [
+                {'amount': Decimal('10.00')},
+                {'amount': Decimal('7.01'), 'shares': {1: 1, 2: 2}},
+            ],
+            tax=Decimal('1.35'),
+            tip=Decimal('2.00')
+        )
+        
+        self.assertEqual(sum(amounts), Decimal('20.36'))
+        self.assertEqual(amounts, [Decimal('6.80'), Decimal('9.57'), Decimal('3.99')])
+
+# Filter combinations the expense list endpoint is indexed for
+SUPPORTED_FILTERS = [
+    {},
+    {'status': 'pending'},
+    {'status': 'pending,partial', 'ordering': 'created_at'},
+    {'paid_by': '{user_id}'},
+    {'paid_by': '{user_id}', 'created_after': '2026-01-01'},
+    {'created_after': '2026-01-01', 'created_before': '2026-06-30'},
+    {'min_amount': '100', 'max_amount': '500'},
+    {'min_amount': '100', 'ordering': '-total_amount'},
+    {'involves_me': 'true'},
+    {'involves_me': 'true', 'status': 'pending', 'created_after': '2026-01-01'},
+]
+
+class ExpenseFilterPlanTests(TestCase):
+    """Every supported list filter must be served by an index, never a full table scan"""
+    
+    def setUp(self):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            self.skipTest(f"Plan checks are not implemented for {connection.vendor}")
+        _, self.group, _ = make_group_expense(member_count=3)
+        if connection.vendor == 'postgresql':
+            # Tiny test tables make a seq scan cheapest; forbid it so the plan
+            # shows whether an index *can* serve the query
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+    
+    def build_queryset(self, params, role):
+        """The list query exactly as group_expenses builds it"""
+        expenses = Expense.objects.filter(group=self.group, is_active=True)
+        if role == 'member':
+            expenses = expenses.filter(status__in=MEMBER_VISIBLE_STATUSES)
+        return filter_expenses(expenses.defer('search_vector'), params, self.group.owner)
+    
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f"EXPLAIN {sql}", params)
+                return [row[0] for row in cursor.fetchall()]
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+    
+    def full_scans(self, plan):
+        """Tables (or subquery aliases) the plan reads in full"""
+        scans = set()
+        for line in plan:
+            if connection.vendor == 'postgresql':
+                match = re.search(r'Seq Scan on (\S+)', line)
+            else:
+                # sqlite: SEARCH uses an index key; SCAN without an index reads every row
+                match = re.match(r'\s*SCAN (\S+)', line) if 'INDEX' not in line else None
+            if match:
+                scans.add(match.group(1))
+        return sorted(scans)
+    
+    def test_supported_filters_use_indexes(self):
+        for filters in SUPPORTED_FILTERS:
+            params = {key: value.format(user_id=self.group.owner_id) for key, value in filters.items()}
+            for role in ('owner', 'member'):
+                with self.subTest(role=role, params=params):
+                    plan = self.explain(self.build_queryset(params, role))
+                    self.assertEqual(self.full_scans(plan), [], "\n".join(plan))
+
+class AmountStatsTests(TestCase):
+    """Group and payer amount statistics behind approval priority"""
+    
+    def setUp(self):
+        (self.payer, self.other), self.group, _ = make_group_expense(total_amount=Decimal('10.00'))
+    
+    def stats_count(self, user=None):
+        return ExpenseAmountStats.objects.get(group=self.group, user=user).count
+    
+    def test_priority_reads_the_stats_it_records(self):
+        service = SmartApprovalService(self.group)
+        for _ in range(ExpenseAmountStats.MIN_SAMPLES):
+            service.create_expense_with_smart_approval(self.payer, {
+                'title': 'Coffee',
+                'total_amount': Decimal('10.00'),
+                'currency': 'USD',
+                'split_type': 'equal',
+            }, allow_duplicate=True)
+        
+        service = SmartApprovalService(self.group)
+        expense = Expense(group=self.group, paid_by=self.payer, total_amount=Decimal('500.00'))
+        
+        self.assertEqual(self.stats_count(self.payer), ExpenseAmountStats.MIN_SAMPLES + 1)
+        self.assertIsNotNone(service._get_amount_percentile(95, user=expense.paid_by))
+        # Above the group p75 and p95 (+5) and above the payer's own p95 (+1)
+        self.assertGreaterEqual(service._calculate_approval_priority(expense, self.payer), 6)
+    
+    def test_recurring_generation_records_stats(self):
+        RecurringExpense.objects.create(
+            group=self.group,
+            paid_by=self.other,
+            title='Rent',
+            total_amount=Decimal('900.00'),
+            participant_ids=[self.payer.id, self.other.id],
+            start_date=date(2026, 1, 1),
+            next_run_date=date(2026, 1, 1)
+        )
+        
+        RecurringExpenseGenerator().run(date(2026, 3, 15))
+        
+        self.assertEqual(self.stats_count(), 4)
+        self.assertEqual(self.stats_count(self.other), 3)
+        self.assertEqual(self.stats_count(self.payer), 1)
+
+class ResplitExpenseTests(TestCase):
+    def setUp(self):
+        self.users, self.group, _ = make_group_expense(member_count=3)
+    
+    def owed(self, expense):
+        return {
+            participant.user_id: participant.amount_owed
+            for participant in ExpenseParticipant.objects.filter(expense=expense, is_active=True)
+        }
+    
+    def test_percentage_split_keeps_exact_proportions(self):
+        expense = create_group_expense(self.group, self.users[0], {
+            'title': 'Villa',
+            'total_amount': Decimal('100.00'),
+            'split_type': 'percentage',
+        }, split_percentages=[Decimal('33.33'), Decimal('33.33'), Decimal('33.34')], on_duplicate='ignore')
+        before = self.owed(expense)
+        
+        expense.total_amount = Decimal('200.00')
+        resplit_expense(expense)
+        
+        after = self.owed(expense)
+        self.assertEqual(sum(after.values()), Decimal('200.00'))
+        self.assertEqual(after, {user_id: amount * 2 for user_id, amount in before.items()})
+    
+    def test_itemized_total_edit_is_rejected_explicitly(self):
+        expense = create_group_expense(self.group, self.users[0], {
+            'title': 'Dinner',
+            'total_amount': Decimal('60.00'),
+            'split_type': 'itemized',
+        }, itemization={
+            'items': [
+                {'amount': Decimal('30.00'), 'shares': {self.users[1].id: 1}},
+                {'amount': Decimal('24.00')},
+            ],
+            'tax': Decimal('6.00'),
+        }, on_duplicate='ignore')
+        before = self.owed(expense)
+        
+        # Re-splitting from the stored items reproduces the shares
+        self.assertEqual(resplit_expense(expense), [])
+        
+        expense.total_amount = Decimal('75.00')
+        with self.assertRaisesMessage(ValueError, "itemized"):
+            resplit_expense(expense)
+        self.assertEqual(self.owed(expense), before)
+
+class BalanceLedgerTests(TestCase):
+    def setUp(self):
+        (self.payer, self.first, self.second), self.group, self.expense = make_group_expense(
+            total_amount=Decimal('90.00'), member_count=3
+        )
+    
+    def ledger(self):
+        return {
+            (row.user_id, row.counterparty_id, row.currency): row.amount
+            for row in BalanceLedger.objects.exclude(amount=0)
+        }
+    
+    def test_posted_expense_records_mirrored_debts(self):
+        self.assertEqual(self.ledger(), {
+            (self.payer.id, self.first.id, 'USD'): Decimal('30.00'),
+            (self.first.id, self.payer.id, 'USD'): Decimal('-30.00'),
+            (self.payer.id, self.second.id, 'USD'): Decimal('30.00'),
+            (self.second.id, self.payer.id, 'USD'): Decimal('-30.00'),
+        })
+    
+    def test_unpost_reverses_the_expense(self):
+        BalanceLedgerService().unpost_expense(self.expense)
+        
+        self.assertEqual(self.ledger(), {})
+    
+    def test_payment_reduces_the_debt(self):
+        settle_expense_for_user(self.expense, self.first, Decimal('10.00'))
+        
+        self.assertEqual(self.ledger()[(self.payer.id, self.first.id, 'USD')], Decimal('20.00'))
+        self.assertEqual(self.ledger()[(self.first.id, self.payer.id, 'USD')], Decimal('-20.00'))
+    
+    def test_payment_on_unposted_expense_is_ignored(self):
+        self.expense.status = 'pending_approval'
+        
+        BalanceLedgerService().record_payment(self.expense, self.first.id, Decimal('10.00'))
+        
+        self.assertEqual(self.ledger()[(self.payer.id, self.first.id, 'USD')], Decimal('30.00'))
+    
+    def test_rebuild_matches_incremental_rows(self):
+        settle_expense_for_user(self.expense, self.first, Decimal('12.34'))
+        settle_expense_for_user(self.expense, self.second)
+        add_expense(self.group, self.first, 'Taxi', Decimal('45.00'), currency='EUR')
+        incremental = self.ledger()
+        
+        BalanceLedgerService().rebuild()
+        
+        self.assertEqual(self.ledger(), incremental)
+        self.assertEqual(incremental[(self.first.id, self.payer.id, 'EUR')], Decimal('15.00'))
+    
+    def test_apply_writes_rows_in_key_order(self):
+        with CaptureQueriesContext(connection) as queries:
+            BalanceLedgerService().apply([
+                (self.second.id, self.first.id, 'USD', Decimal('5.00')),
+                (self.first.id, self.payer.id, 'USD', Decimal('7.00')),
+            ])
+        
+        sql = next(query['sql'] for query in queries if 'ON CONFLICT' in query['sql'])
+        keys = [
+            (int(user_id), int(counterparty_id))
+            for user_id, counterparty_id in re.findall(r"\((\d+), (\d+), '?USD", sql)
+        ]
+        self.assertEqual(len(keys), 4)
+        self.assertEqual(keys, sorted(keys))
+    
+    def test_net_balances_view(self):
+        FriendShip.objects.create(from_user=self.payer, to_user=self.first, status='accepted')
+        settle_expense_for_user(self.expense, self.second)
+        client = APIClient()
+        client.force_authenticate(self.payer)
+        
+        response = client.get(reverse('net_balances'))
+        
+        self.assertEqual(response.status_code, 200)
+        # Settled debts drop out; friendship is flagged
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['user']['id'], str(self.first.id))
+        self.assertTrue(response.data[0]['is_friend'])
+        self.assertEqual(response.data[0]['balances'], [
+            {'currency': 'USD', 'amount': Decimal('30.00'), 'status': 'owed'}
+        ])
+        
+        client.force_authenticate(self.first)
+        response = client.get(reverse('net_balances'), {'user_id': self.payer.id})
+        self.assertEqual(response.data[0]['balances'][0]['status'], 'owes')
+        self.assertEqual(client.get(reverse('net_balances'), {'user_id': 'abc'}).status_code, 400)
+
+class SettleUpTests(TestCase):
+    def setUp(self):
+        (self.creditor, self.debtor), self.group, first = make_group_expense(total_amount=Decimal('60.00'))
+        self.expenses = [first] + [
+            add_expense(self.group, self.creditor, title, Decimal('60.00'))
+            for title in ('Second', 'Third')
+        ]
+        # Oldest first, regardless of insert timing
+        for days, expense in enumerate(reversed(self.expenses), start=1):
+            Expense.objects.filter(pk=expense.pk).update(created_at=expense.created_at - timedelta(days=days))
+        self.client = APIClient()
+        self.client.force_authenticate(self.debtor)
+    
+    def settle(self, amount, **extra):
+        return self.client.post(reverse('settle_up'), {
+            'counterparty_id': self.creditor.id,
+            'amount': amount,
+            'currency': 'USD',
+            **extra
+        }, format='json')
+    
+    def shares(self):
+        return [
+            (participant.amount_paid, participant.status, participant.expense.status)
+            for participant in ExpenseParticipant.objects.filter(
+                user=self.debtor
+            ).select_related('expense').order_by('expense__created_at')
+        ]
+    
+    def owed_to_creditor(self):
+        return BalanceLedger.objects.get(user=self.creditor, counterparty=self.debtor, currency='USD').amount
+    
+    def test_partial_amount_is_spread_oldest_first(self):
+        response = self.settle('45.00')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['expense_id'], item['amount'], item['remaining']) for item in response.data['allocations']],
+            [(str(self.expenses[0].id), Decimal('30.00'), Decimal('0.00')),
+             (str(self.expenses[1].id), Decimal('15.00'), Decimal('15.00'))]
+        )
+        self.assertEqual(self.shares(), [
+            (Decimal('30.00'), 'paid', 'settled'),
+            (Decimal('15.00'), 'pending', 'partial'),
+            (Decimal('0.00'), 'pending', 'pending'),
+        ])
+    
+    def test_payments_share_one_settlement(self):
+        response = self.settle('45.00')
+        
+        payments = Payment.objects.filter(payer=self.debtor).order_by('-amount')
+        self.assertEqual([payment.amount for payment in payments], [Decimal('30.00'), Decimal('15.00')])
+        self.assertEqual({str(payment.settlement_id) for payment in payments}, {response.data['settlement_id']})
+        self.assertTrue(all(payment.payee_id == self.creditor.id for payment in payments))
+    
+    def test_ledger_reflects_the_settlement(self):
+        self.assertEqual(self.owed_to_creditor(), Decimal('90.00'))
+        
+        self.settle('45.00')
+        
+        self.assertEqual(self.owed_to_creditor(), Decimal('45.00'))
+        self.assertEqual(
+            BalanceLedger.objects.get(user=self.debtor, counterparty=self.creditor, currency='USD').amount,
+            Decimal('-45.00')
+        )
+    
+    def test_overpayment_is_rejected_without_writes(self):
+        response = self.settle('90.01')
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('90.00', response.data['error'])
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(self.owed_to_creditor(), Decimal('90.00'))
+    
+    def test_settling_everything_closes_every_expense(self):
+        self.assertEqual(self.settle('90.00').status_code, 200)
+        
+        self.assertEqual({status for _, _, status in self.shares()}, {'settled'})
+        self.assertEqual(self.owed_to_creditor(), Decimal('0.00'))
+        self.assertEqual(self.settle('1.00').status_code, 400)
+    
+    def test_group_filter_and_self_settlement(self):
+        other_group = Group.objects.create(name='Other', owner=self.creditor)
+        GroupMembership.objects.create(group=other_group, user=self.creditor)
+        GroupMembership.objects.create(group=other_group, user=self.debtor)
+        
+        self.assertEqual(self.settle('10.00', group_id=str(other_group.id)).status_code, 400)
+        self.assertEqual(self.client.post(reverse('settle_up'), {
+            'counterparty_id': self.debtor.id, 'amount': '10.00'
+        }, format='json').status_code, 400)
+
+class PaymentLedgerTests(TestCase):
+    """Payments are an append-only log that always adds up to amount_paid"""
+    
+    def setUp(self):
+        (self.payee, self.payer), self.group, self.expense = make_group_expense(total_amount=Decimal('100.00'))
+    
+    def test_one_payment_row_per_settlement(self):
+        for amount in ('10.00', '15.50', '0.01'):
+            settle_expense_for_user(self.expense, self.payer, Decimal(amount))
+        
+        participant = ExpenseParticipant.objects.get(expense=self.expense, user=self.payer)
+        payments = Payment.objects.filter(participant=participant)
+        self.assertEqual(payments.count(), 3)
+        self.assertEqual(sum(payment.amount for payment in payments), participant.amount_paid)
+        self.assertEqual(participant.amount_paid, Decimal('25.51'))
+    
+    def test_rejected_payment_leaves_no_row(self):
+        with self.assertRaises(ValueError):
+            settle_expense_for_user(self.expense, self.payer, Decimal('50.01'))
+        
+        self.assertFalse(Payment.objects.exists())
+    
+    def test_saved_payment_cannot_be_updated(self):
+        settle_expense_for_user(self.expense, self.payer, Decimal('10.00'))
+        payment = Payment.objects.get()
+        
+        payment.amount = Decimal('50.00')
+        with self.assertRaisesMessage(ValueError, "append-only"):
+            payment.save()
+        self.assertEqual(Payment.objects.get().amount, Decimal('10.00'))
+    
+    def test_payment_history_lists_both_sides(self):
+        settle_expense_for_user(self.expense, self.payer, Decimal('10.00'))
+        settle_expense_for_user(self.expense, self.payer, Decimal('5.00'))
+        client = APIClient()
+        
+        for user in (self.payer, self.payee):
+            client.force_authenticate(user)
+            response = client.get(reverse('payment_history'), {'expense_id': str(self.expense.id)})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['count'], 2)
+            # Newest first
+            self.assertEqual([item['amount'] for item in response.data['results']], ['5.00', '10.00'])
+        
+        self.assertEqual(client.get(reverse('payment_history'), {'expense_id': 'nope'}).status_code, 400)
+
+class ExpenseStatusServiceTests(TestCase):
+    def setUp(self):
+        (self.payer, self.debtor), self.group, _ = make_group_expense(total_amount=Decimal('10.00'))
+    
+    def new_expense(self, title='Groceries', total_amount=Decimal('40.00')):
+        return create_group_expense(self.group, self.payer, {
+            'title': title,
+            'total_amount': total_amount,
+            'status': 'pending_approval',
+        }, on_duplicate='ignore')
+    
+    def history(self, expense):
+        return list(ExpenseStatusHistory.objects.filter(expense=expense).order_by('id').values_list(
+            'from_status', 'to_status'
+        ))
+    
+    def expense_updates(self, queries):
+        table = Expense._meta.db_table
+        return [query for query in queries if query['sql'].startswith(f'UPDATE "{table}"')]
+    
+    def test_path_is_one_conditional_update_with_history_per_step(self):
+        expense = self.new_expense()
+        
+        with CaptureQueriesContext(connection) as queries:
+            ExpenseStatusService(expense).approve('manual', approver=self.payer)
+        
+        self.assertEqual(len(self.expense_updates(queries)), 1)
+        self.assertEqual(Expense.objects.get(pk=expense.pk).status, 'pending')
+        self.assertEqual(expense.status, 'pending')
+        self.assertEqual(self.history(expense), [('pending_approval', 'approved'), ('approved', 'pending')])
+    
+    def test_status_moved_underneath_raises_conflict(self):
+        expense = self.new_expense()
+        Expense.objects.filter(pk=expense.pk).update(status='rejected')
+        
+        with self.assertRaises(ExpenseStatusConflict):
+            ExpenseStatusService(expense).approve('manual', approver=self.payer)
+        
+        self.assertEqual(Expense.objects.get(pk=expense.pk).status, 'rejected')
+        self.assertEqual(self.history(expense), [])
+    
+    def test_invalid_transition_is_rejected_before_writing(self):
+        expense = self.new_expense()
+        
+        with self.assertRaisesMessage(ValueError, "pending_approval -> settled"):
+            ExpenseStatusService(expense).transition(['settled'])
+        with self.assertRaises(ValueError):
+            ExpenseStatusService(expense).transition(['approved', 'rejected'])
+        
+        self.assertEqual(Expense.objects.get(pk=expense.pk).status, 'pending_approval')
+    
+    def test_entering_a_posted_status_posts_the_ledger(self):
+        expense = self.new_expense()
+        ledger = BalanceLedger.objects.filter(user=self.payer, counterparty=self.debtor)
+        before = ledger.get().amount
+        
+        ExpenseStatusService(expense).reject(self.payer, reason='duplicate')
+        self.assertEqual(ledger.get().amount, before)
+        
+        expense = self.new_expense(title='Rent')
+        ExpenseStatusService(expense).approve('manual', approver=self.payer)
+        self.assertEqual(ledger.get().amount, before + Decimal('20.00'))
+        
+        # Moving between posted statuses does not post twice
+        settle_expense_for_user(expense, self.debtor, Decimal('5.00'))
+        self.assertEqual(Expense.objects.get(pk=expense.pk).status, 'partial')
+        self.assertEqual(ledger.get().amount, before + Decimal('15.00'))
+    
+    def test_sync_payment_status_follows_participant_totals(self):
+        expense = self.new_expense()
+        ExpenseStatusService(expense).approve('manual', approver=self.payer)
+        ExpenseParticipant.objects.filter(expense=expense, user=self.debtor).update(amount_paid=Decimal('20.00'))
+        
+        ExpenseStatusService(expense).sync_payment_status(changed_by=self.debtor)
+        
+        self.assertEqual(Expense.objects.get(pk=expense.pk).status, 'settled')
+        self.assertEqual(self.history(expense)[-1], ('pending', 'settled'))
+    
+    def test_bulk_sync_moves_each_status_pair_in_one_update(self):
+        expenses = [self.new_expense(title=f'Trip {index}') for index in range(4)]
+        for expense in expenses:
+            ExpenseStatusService(expense).approve('manual', approver=self.payer)
+        paid = [Decimal('20.00'), Decimal('20.00'), Decimal('5.00'), Decimal('0.00')]
+        for expense, amount in zip(expenses, paid):
+            ExpenseParticipant.objects.filter(expense=expense, user=self.debtor).update(amount_paid=amount)
+        
+        with CaptureQueriesContext(connection) as queries:
+            changed = ExpenseStatusService.sync_payment_statuses(expenses, changed_by=self.debtor)
+        
+        # The payer's own share counts as paid, so nobody stays 'pending'
+        self.assertEqual(len(self.expense_updates(queries)), 2)
+        self.assertEqual(len(changed), 4)
+        self.assertEqual(
+            [Expense.objects.get(pk=expense.pk).status for expense in expenses],
+            ['settled', 'settled', 'partial', 'partial']
+        )
+        self.assertEqual(self.history(expenses[3])[-1], ('pending', 'partial'))
+        
+        self.assertEqual(ExpenseStatusService.sync_payment_statuses(expenses), [])
+    
+    def test_bulk_sync_detects_concurrent_moves(self):
+        expense = self.new_expense()
+        ExpenseStatusService(expense).approve('manual', approver=self.payer)
+        ExpenseParticipant.objects.filter(expense=expense, user=self.debtor).update(amount_paid=Decimal('20.00'))
+        Expense.objects.filter(pk=expense.pk).update(status='partial')
+        
+        with self.assertRaises(ExpenseStatusConflict):
+            ExpenseStatusService.sync_payment_statuses([expense])
+
+class ExpenseETagTests(TestCase):
+    def setUp(self):
+        (self.payer, self.debtor), self.group, self.expense = make_group_expense(total_amount=Decimal('40.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.debtor)
+        self.detail_url = reverse('expense_detail', args=[self.group.id, self.expense.id])
+        self.settle_url = reverse('settle_expense', args=[self.group.id, self.expense.id])
+    
+    def settle(self, etag):
+        return self.client.post(self.settle_url, {}, format='json', HTTP_IF_MATCH=etag)
+    
+    def test_expense_and_participant_etags_differ_in_form(self):
+        expense_etag = self.client.get(self.detail_url)['ETag']
+        response = self.client.get(self.settle_url)
+        
+        self.assertEqual(expense_etag, f'"{self.expense.version}"')
+        self.assertEqual(response['ETag'], f'"p{response.data["version"]}"')
+    
+    def test_settle_honours_the_participant_etag(self):
+        etag = self.client.get(self.settle_url)['ETag']
+        
+        response = self.settle(etag)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"p{int(etag[2:-1]) + 1}"')
+        self.assertEqual(Payment.objects.get().amount, Decimal('20.00'))
+    
+    def test_stale_participant_etag_conflicts(self):
+        etag = self.client.get(self.settle_url)['ETag']
+        ExpenseParticipant.objects.filter(expense=self.expense, user=self.debtor).update(version=99)
+        
+        response = self.settle(etag)
+        
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['ETag'], '"p99"')
+        self.assertFalse(Payment.objects.exists())
+    
+    def test_other_kinds_of_etag_are_refused(self):
+        expense_etag = self.client.get(self.detail_url)['ETag']
+        participant_etag = self.client.get(self.settle_url)['ETag']
+        
+        for etag in (expense_etag, f'W/{participant_etag}', 'p1', '"p"'):
+            with self.subTest(etag=etag):
+                self.assertEqual(self.settle(etag).status_code, 400)
+        self.assertFalse(Payment.objects.exists())
+        
+        self.client.force_authenticate(self.payer)
+        response = self.client.patch(self.detail_url, {'title': 'Renamed'}, format='json', HTTP_IF_MATCH=participant_etag)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(self.detail_url, {'title': 'Renamed'}, format='json', HTTP_IF_MATCH=expense_etag)
+        self.assertEqual(response.status_code, 200)
+
+FX_LOGGER = 'expense.services.fx_service'
+
+class FxRatesTestMixin:
+    """Points settings.FX_RATES_FILE at a temporary file for each test"""
+    
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'fx_rates.json')
+        self.write_rates({'version': 'v1', 'base': 'USD', 'rates': {'USD': '1', 'EUR': '0.8'}})
+        override = override_settings(FX_RATES_FILE=self.path)
+        override.enable()
+        self.addCleanup(override.disable)
+    
+    def write_rates(self, data, mtime_ns=None):
+        with open(self.path, 'w', encoding='utf-8') as handle:
+            handle.write(data if isinstance(data, str) else json.dumps(data))
+        # Distinct mtimes even when rewritten within the clock's resolution
+        self.mtime_ns = mtime_ns or getattr(self, 'mtime_ns', 10 ** 18) + 10 ** 9
+        os.utime(self.path, ns=(self.mtime_ns, self.mtime_ns))
+
+class FxRateTableTests(FxRatesTestMixin, SimpleTestCase):
+    def test_converts_aggregated_totals_and_rounds_once(self):
+        table = get_rate_table()
+        
+        self.assertEqual(table.convert_totals({'USD': Decimal('10.00'), 'EUR': Decimal('8.00')}, 'USD'), Decimal('20.00'))
+        self.assertEqual(table.convert_totals({'USD': Decimal('0.01'), 'EUR': Decimal('0.01')}, 'EUR'), Decimal('0.02'))
+    
+    def test_table_is_reread_only_when_mtime_changes(self):
+        first = get_rate_table()
+        self.assertIs(get_rate_table(), first)
+        
+        self.write_rates({'version': 'v2', 'rates': {'USD': '1', 'EUR': '0.5'}})
+        second = get_rate_table()
+        
+        self.assertIsNot(second, first)
+        self.assertEqual(second.version, 'v2')
+        self.assertEqual(convert_balances({'EUR': Decimal('1.00')}, 'USD')['amount'], Decimal('2.00'))
+    
+    def test_malformed_files_raise_value_error(self):
+        for data in (
+            {'version': 'v3'},
+            {'rates': {'USD': '1'}},
+            {'version': 'v3', 'rates': ['USD']},
+            {'version': 'v3', 'rates': {'USD': 'lots'}},
+            {'version': 'v3', 'rates': {'USD': 'NaN'}},
+            {'version': 'v3', 'rates': {'USD': '0'}},
+            ['not', 'a', 'table'],
+            '{"version": ',
+        ):
+            with self.subTest(data=data):
+                self.write_rates(data)
+                with self.assertRaises(ValueError):
+                    FxRateTable.from_file(self.path)
+                with self.assertLogs(FX_LOGGER, 'WARNING'):
+                    self.assertIsNone(convert_balances({'EUR': Decimal('1.00')}, 'USD'))
+    
+    def test_missing_rate_or_file_gives_none(self):
+        with self.assertLogs(FX_LOGGER, 'WARNING'):
+            self.assertIsNone(convert_balances({'GBP': Decimal('1.00')}, 'USD'))
+        
+        os.remove(self.path)
+        with self.assertLogs(FX_LOGGER, 'WARNING'):
+            self.assertIsNone(convert_balances({'EUR': Decimal('1.00')}, 'USD'))
+        # A single currency matching the target needs no table
+        self.assertEqual(convert_balances({'USD': Decimal('3.00')}, 'USD')['amount'], Decimal('3.00'))
+
+class GroupBalanceConversionTests(FxRatesTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        (self.payer, self.debtor), self.group, _ = make_group_expense(total_amount=Decimal('10.00'))
+        add_expense(self.group, self.payer, 'Museum', Decimal('16.00'), currency='EUR')
+    
+    def test_balances_are_converted_to_the_base_currency(self):
+        # -5 USD and -8 EUR at 0.8 EUR per USD
+        self.assertEqual(get_user_group_balance(self.group, self.debtor), Decimal('-15.00'))
+        
+        summary = GroupExpenseSummarySerializer(get_group_expense_summary(self.group, self.debtor)).data
+        self.assertEqual(summary['total_amount'], '30.00')
+        self.assertEqual(summary['user_balance'], '-15.00')
+    
+    def test_unconvertible_balances_are_none(self):
+        self.write_rates({'rates': {'USD': '1', 'EUR': '0.8'}})
+        
+        with self.assertLogs(FX_LOGGER, 'WARNING'):
+            self.assertIsNone(get_user_group_balance(self.group, self.debtor))
+            summary = GroupExpenseSummarySerializer(get_group_expense_summary(self.group, self.debtor)).data
+        self.assertIsNone(summary['total_amount'])
+        self.assertIsNone(summary['user_balance'])
+        self.assertEqual(summary['totals_by_currency'], {'USD': '10.00', 'EUR': '16.00'})
+        
+        client = APIClient()
+        client.force_authenticate(self.debtor)
+        with self.assertLogs(FX_LOGGER, 'WARNING'):
+            response = client.get(reverse('user_group_balance', args=[self.group.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'unknown')
+
+class DuplicateExpenseTests(TestCase):
+    def setUp(self):
+        (self.payer, self.other), self.group, _ = make_group_expense(total_amount=Decimal('10.00'))
+        self.original = self.submit('Dinner at Pho 24')[0]
+    
+    def submit(self, title, total_amount=Decimal('18.00'), **options):
+        return SmartApprovalService(self.group).create_expense_with_smart_approval(self.payer, {
+            'title': title,
+            'total_amount': total_amount,
+            'currency': 'USD',
+            'split_type': 'equal',
+        }, **options)
+    
+    def test_likely_duplicate_is_flagged_and_held(self):
+        # Same normalized title, amount rounding to the same whole unit
+        expense, result = self.submit('dinner at PHO 24!', total_amount=Decimal('18.20'))
+        
+        self.assertEqual(result['reason'], 'possible_duplicate')
+        self.assertEqual(result['possible_duplicates'], [str(self.original.id)])
+        self.assertEqual(expense.status, 'pending_approval')
+        self.assertTrue(ApprovalQueue.objects.filter(expense=expense).exists())
+    
+    def test_duplicates_are_rejected_when_the_group_says_so(self):
+        GroupApprovalSettings.objects.filter(group=self.group).update(reject_duplicates=True)
+        count = Expense.objects.count()
+        
+        with self.assertRaises(DuplicateExpense) as raised:
+            self.submit('Dinner at Pho 24')
+        
+        self.assertEqual(raised.exception.expense_ids, [self.original.id])
+        self.assertEqual(Expense.objects.count(), count)
+    
+    def test_allow_duplicate_and_different_expenses_pass(self):
+        GroupApprovalSettings.objects.filter(group=self.group).update(reject_duplicates=True)
+        
+        expense, result = self.submit('Dinner at Pho 24', allow_duplicate=True)
+        self.assertEqual(result['possible_duplicates'], [])
+        self.assertEqual(expense.status, 'pending')
+        
+        _, result = self.submit('Dinner at Pho 24', total_amount=Decimal('19.00'))
+        self.assertEqual(result['possible_duplicates'], [])
+    
+    def test_probe_runs_under_a_group_lock(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.submit('Breakfast')
+        
+        group_table = Group._meta.db_table
+        sql = [query['sql'] for query in queries]
+        lock = next(index for index, statement in enumerate(sql)
+                    if statement.startswith(f'SELECT "{group_table}"."id" FROM "{group_table}"'))
+        probe = next(index for index, statement in enumerate(sql) if '"fingerprint_bucket" IN' in statement)
+        self.assertLess(lock, probe)
+        if connection.vendor == 'postgresql':
+            self.assertIn('FOR UPDATE', sql[lock])
+
+@skipUnless(connection.vendor == 'postgresql', "sqlite has no row locks to serialize the probe")
+class ConcurrentDuplicateTests(TransactionTestCase):
+    def test_identical_concurrent_submissions_create_one_expense(self):
+        users, group, _ = make_group_expense(total_amount=Decimal('10.00'))
+        barrier = threading.Barrier(4)
+        outcomes = []
+        
+        def submit():
+            try:
+                barrier.wait()
+                create_group_expense(group, users[0], {
+                    'title': 'Concert tickets',
+                    'total_amount': Decimal('120.00'),
+                }, on_duplicate='reject')
+                outcomes.append('created')
+            except DuplicateExpense:
+                outcomes.append('duplicate')
+            finally:
+                connection.close()
+        
+        workers = [threading.Thread(target=submit) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        self.assertEqual(sorted(outcomes), ['created', 'duplicate', 'duplicate', 'duplicate'])
+        self.assertEqual(Expense.objects.filter(title='Concert tickets').count(), 1)
+
+class ExpenseSearchTests(TestCase):
+    """Search on the portable icontains path (the tsquery path needs PostgreSQL)"""
+    
+    def setUp(self):
+        (self.owner, self.member), self.group, _ = make_group_expense(total_amount=Decimal('10.00'))
+        self.taxis = [add_expense(self.group, self.owner, f'Taxi to stop {index}', Decimal('12.00')) for index in range(5)]
+        for minutes, expense in enumerate(self.taxis):
+            Expense.objects.filter(pk=expense.pk).update(created_at=expense.created_at + timedelta(minutes=minutes))
+        self.hidden = create_group_expense(self.group, self.member, {
+            'title': 'Taxi nobody approved',
+            'total_amount': Decimal('500.00'),
+            'status': 'pending_approval',
+        }, on_duplicate='ignore')
+        self.client = APIClient()
+        self.url = reverse('search_expenses', args=[self.group.id])
+    
+    def search(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get(self.url, params)
+    
+    def test_terms_are_sanitized(self):
+        self.assertEqual(search_terms("Ube:* & (r | !x)"), ['ube', 'r', 'x'])
+        self.assertEqual(search_terms("' ; -- :*"), [])
+        self.assertEqual(len(search_terms(' '.join(['word'] * 20))), 10)
+        self.assertEqual(search_group_expenses(self.group, '&|!'), ([], None))
+    
+    def test_cursor_round_trip(self):
+        expense = Expense.objects.get(pk=self.taxis[0].pk)
+        expense.rank = Decimal('0.607927')
+        
+        self.assertEqual(
+            decode_cursor(encode_cursor(expense)),
+            (Decimal('0.607927'), expense.created_at, expense.id)
+        )
+    
+    def test_malformed_cursors_are_rejected(self):
+        def encoded(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+        
+        for cursor in (
+            'not base64!',
+            base64.urlsafe_b64encode(b'not json').decode(),
+            encoded(['0', '2026-01-01T00:00:00']),
+            encoded(['rank', '2026-01-01T00:00:00', str(self.taxis[0].id)]),
+            encoded(['0', 'yesterday', str(self.taxis[0].id)]),
+            encoded(['0', '2026-01-01T00:00:00', 'not-a-uuid']),
+        ):
+            with self.subTest(cursor=cursor):
+                with self.assertRaisesMessage(ValueError, "Invalid cursor"):
+                    decode_cursor(cursor)
+                self.assertEqual(self.search(self.member, q='taxi', cursor=cursor).status_code, 400)
+    
+    def test_pages_cover_every_match_once(self):
+        seen = []
+        params = {'q': 'TAXI sto', 'limit': 2}
+        while True:
+            response = self.search(self.member, **params)
+            self.assertEqual(response.status_code, 200)
+            seen += [item['id'] for item in response.data['results']]
+            if not response.data['next']:
+                break
+            params['cursor'] = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+        
+        self.assertEqual(seen, [str(expense.id) for expense in reversed(self.taxis)])
+    
+    def test_unapproved_expenses_are_hidden_from_members(self):
+        member_ids = [item['id'] for item in self.search(self.member, q='taxi').data['results']]
+        owner_ids = [item['id'] for item in self.search(self.owner, q='taxi').data['results']]
+        
+        self.assertNotIn(str(self.hidden.id), member_ids)
+        self.assertIn(str(self.hidden.id), owner_ids)
+        self.assertEqual(len(owner_ids), len(member_ids) + 1)
+    
+    def test_request_validation(self):
+        self.assertEqual(self.search(self.member).status_code, 400)
+        self.assertEqual(self.search(self.member, q='taxi', limit=0).status_code, 400)
+        self.assertEqual(self.search(self.member, q='taxi', limit='x').status_code, 400)
@@ -5,12 +5,20 @@ from . import views
 urlpatterns = [
     # Group expense endpoints
     path('groups/<uuid:group_id>/expenses/', views.group_expenses, name='group_expenses'),
+    path('groups/<uuid:group_id>/expenses/search/', views.search_expenses, name='search_expenses'),
     path('groups/<uuid:group_id>/expenses/<uuid:expense_id>/', views.expense_detail, name='expense_detail'),
     path('groups/<uuid:group_id>/expenses/<uuid:expense_id>/settle/', views.settle_expense, name='settle_expense'),
     
     # Group summary and balance endpoints
     path('groups/<uuid:group_id>/summary/', views.group_expense_summary, name='group_expense_summary'),
     path('groups/<uuid:group_id>/balance/', views.user_group_balance, name='user_group_balance'),
+    path('balances/', views.net_balances, name='net_balances'),
+    path('settle-up/', views.settle_up, name='settle_up'),
+    path('payments/', views.payment_history, name='payment_history'),
+    
+    # Recurring expenses
+    path('groups/<uuid:group_id>/recurring/', views.recurring_expenses, name='recurring_expenses'),
+    path('groups/<uuid:group_id>/recurring/<uuid:template_id>/', views.recurring_expense_detail, name='recurring_expense_detail'),
     
     # 🆕 Smart Approval System endpoints
     path('groups/<uuid:group_id>/pending-approvals/', views.pending_approvals, name='pending_approvals'),
@@ -1,12 +1,19 @@
 # expenses/utils.py - Group-specific utility functions
 from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Sum, Count, Q, F
+from django.db.models import Sum, Count, Q, F, Case, Value, When
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from collections import defaultdict
+from fractions import Fraction
 from typing import List, Dict, Optional, Tuple
+import hashlib
 import logging
+import math
+import re
+import unicodedata
 from .models import Expense, ExpenseParticipant
 
 logger = logging.getLogger(__name__)
@@ -77,28 +84,14 @@ def calculate_equal_split(total_amount: Decimal, participant_count: int) -> List
 def calculate_percentage_split(total_amount: Decimal, percentages: List[float]) -> List[Decimal]:
     """
     Calculate split based on percentages.
-    Percentages should sum to 100.0
+    Percentages should sum to 100.0; the split is done in integer cents
+    with largest-remainder rounding, so it always sums to the total.
     """
-    if abs(sum(percentages) - 100.0) > 0.01:
+    if abs(sum(Decimal(str(percentage)) for percentage in percentages) - 100) > Decimal('0.01'):
         raise ValueError("Percentages must sum to 100")
     
-    amounts = []
-    total_assigned = Decimal('0.00')
-    
-    # Calculate amounts for all but the last participant
-    for i, percentage in enumerate(percentages[:-1]):
-        amount = (total_amount * Decimal(str(percentage)) / 100).quantize(
-            Decimal('0.01'),
-            rounding=ROUND_HALF_UP
-        )
-        amounts.append(amount)
-        total_assigned += amount
-    
-    # Last participant gets the remainder to ensure exact total
-    last_amount = total_amount - total_assigned
-    amounts.append(last_amount)
-    
-    return amounts
+    cents = allocate_cents(to_cents(total_amount), integer_weights(percentages))
+    return [from_cents(amount) for amount in cents]
 
 def calculate_custom_split(total_amount: Decimal, custom_amounts: List[Decimal]) -> List[Decimal]:
     """
@@ -111,10 +104,188 @@ def calculate_custom_split(total_amount: Decimal, custom_amounts: List[Decimal])
     
     return custom_amounts
 
+def calculate_split_amounts(split_type: str, total_amount: Decimal, participant_count: int,
+                            split_amounts: Optional[List[Decimal]] = None,
+                            split_percentages: Optional[List[float]] = None,
+                            itemization: Optional[Dict] = None,
+                            participant_ids: Optional[List] = None) -> List[Decimal]:
+    """Per-participant amounts, in participant order, for any split type"""
+    if split_type == 'itemized':
+        if not itemization or not itemization.get('items'):
+            raise ValueError("Itemized split requires items")
+        amounts = calculate_itemized_split(
+            participant_ids,
+            itemization['items'],
+            tax=itemization.get('tax', Decimal('0.00')),
+            tip=itemization.get('tip', Decimal('0.00'))
+        )
+        if sum(amounts) != total_amount:
+            raise ValueError(f"Items, tax and tip sum to {sum(amounts)}, but total is {total_amount}")
+        return amounts
+    elif split_type == 'equal':
+        return calculate_equal_split(total_amount, participant_count)
+    elif split_type == 'percentage':
+        if not split_percentages:
+            raise ValueError("Percentage split requires split_percentages")
+        return calculate_percentage_split(total_amount, split_percentages)
+    elif split_type == 'custom':
+        if not split_amounts:
+            raise ValueError("Custom split requires split_amounts")
+        return calculate_custom_split(total_amount, split_amounts)
+    else:
+        raise ValueError(f"Invalid split type: {split_type}")
+
+# ===== ITEMIZED SPLIT UTILITIES =====
+# Everything below works in integer minor units (cents); Decimal only at the edges.
+
+def to_cents(amount) -> int:
+    """Decimal amount -> integer cents (amounts are already 2-dp)"""
+    return int((Decimal(str(amount)) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+def from_cents(cents: int) -> Decimal:
+    return Decimal(cents).scaleb(-2)
+
+def integer_weights(weights) -> List[int]:
+    """Scale non-negative weights (ints, Decimals, floats) to integers with the same ratios"""
+    fractions = [Fraction(str(weight)) for weight in weights]
+    if any(fraction < 0 for fraction in fractions):
+        raise ValueError("Weights cannot be negative")
+    
+    denominator = 1
+    for fraction in fractions:
+        denominator = math.lcm(denominator, fraction.denominator)
+    return [int(fraction * denominator) for fraction in fractions]
+
+def allocate_cents(total_cents: int, weights: List[int]) -> List[int]:
+    """
+    Split total_cents in proportion to integer weights with largest-remainder
+    rounding: everyone gets floor(total * w / W), and the leftover cents go to
+    the largest remainders (earlier positions win ties). Sums to total_cents.
+    """
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        raise ValueError("At least one weight must be positive")
+    
+    shares = []
+    remainders = []
+    for weight in weights:
+        share, remainder = divmod(total_cents * weight, weight_sum)
+        shares.append(share)
+        remainders.append(remainder)
+    
+    leftover = total_cents - sum(shares)
+    if leftover:
+        for index in sorted(range(len(weights)), key=lambda i: -remainders[i])[:leftover]:
+            shares[index] += 1
+    return shares
+
+def allocate_itemized_cents(item_cents: List[int], item_weights: List[List[int]],
+                            tax_cents: int = 0, tip_cents: int = 0) -> List[int]:
+    """
+    Batch allocation of a receipt over dense arrays.
+    item_weights[i][p] is participant p's integer weight on item i (0 = not on it).
+    Tax and tip are pro-rated by each participant's item subtotal.
+    Returns per-participant cents summing exactly to items + tax + tip.
+    """
+    participant_count = len(item_weights[0]) if item_weights else 0
+    subtotals = [0] * participant_count
+    
+    for cents, weights in zip(item_cents, item_weights):
+        # Only the participants on the item take part in its allocation
+        indexes = [index for index, weight in enumerate(weights) if weight]
+        shares = allocate_cents(cents, [weights[index] for index in indexes])
+        for index, share in zip(indexes, shares):
+            subtotals[index] += share
+    
+    surcharge = tax_cents + tip_cents
+    if surcharge:
+        # Pro-rate on positive subtotals; a receipt of only discounts falls back to equal
+        basis = [max(subtotal, 0) for subtotal in subtotals]
+        if not any(basis):
+            basis = [1] * participant_count
+        for index, share in enumerate(allocate_cents(surcharge, basis)):
+            subtotals[index] += share
+    
+    return subtotals
+
+def calculate_itemized_split(participant_ids: List, items: List[Dict],
+                             tax: Decimal = Decimal('0.00'),
+                             tip: Decimal = Decimal('0.00')) -> List[Decimal]:
+    """
+    Split a receipt of line items across participants.
+    Each item is {'amount': Decimal, 'shares': {participant_id: weight}};
+    items without shares are split equally between all participants.
+    Returns amounts in participant_ids order.
+    """
+    if not participant_ids:
+        raise ValueError("Itemized split requires participants")
+    
+    position = {str(participant_id): index for index, participant_id in enumerate(participant_ids)}
+    item_cents = []
+    item_weights = []
+    
+    for item in items:
+        row = [0] * len(participant_ids)
+        shares = item.get('shares')
+        if shares:
+            keys = list(shares)
+            for key, weight in zip(keys, integer_weights(shares[key] for key in keys)):
+                if str(key) not in position:
+                    raise ValueError(f"User {key} is on an item but not a participant")
+                row[position[str(key)]] = weight
+        else:
+            row = [1] * len(participant_ids)
+        
+        item_cents.append(to_cents(item['amount']))
+        item_weights.append(row)
+    
+    cents = allocate_itemized_cents(item_cents, item_weights, to_cents(tax), to_cents(tip))
+    return [from_cents(amount) for amount in cents]
+
+# ===== DUPLICATE DETECTION UTILITIES =====
+
+class DuplicateExpense(ValueError):
+    """A likely duplicate of recent expenses, raised when duplicates are rejected"""
+    def __init__(self, expense_ids):
+        self.expense_ids = expense_ids
+        super().__init__(f"This looks like a duplicate of {len(expense_ids)} recent expense(s).")
+
+def normalize_title(title: str) -> str:
+    """Case-, accent- and punctuation-insensitive form of an expense title"""
+    decomposed = unicodedata.normalize('NFKD', title or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'\w+', stripped.casefold()))
+
+def expense_fingerprint(group_id, total_amount, currency: str, title: str) -> str:
+    """Hash of group, amount rounded to whole units, currency and normalized title"""
+    rounded = Decimal(str(total_amount)).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+    key = f"{group_id}|{rounded}|{(currency or '').upper()}|{normalize_title(title)}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+def fingerprint_bucket(when) -> int:
+    """Index of the DUPLICATE_EXPENSE_WINDOW_HOURS-long window containing `when`"""
+    return int(when.timestamp() // (settings.DUPLICATE_EXPENSE_WINDOW_HOURS * 3600))
+
+def find_duplicate_expenses(fingerprint: str, bucket: int, limit: int = 10) -> List:
+    """
+    Ids of live expenses with the same fingerprint in this or the previous
+    time bucket, newest first. One range probe on (fingerprint, fingerprint_bucket).
+    """
+    return list(
+        Expense.objects.filter(
+            fingerprint=fingerprint,
+            fingerprint_bucket__in=[bucket - 1, bucket],
+            is_active=True
+        ).exclude(
+            status='rejected'
+        ).order_by('-created_at').values_list('id', flat=True)[:limit]
+    )
+
 # ===== EXPENSE CREATION UTILITIES =====
 
 def create_group_expense(group, paid_by_user, expense_data, participant_user_ids=None, 
-                        split_amounts=None, split_percentages=None):
+                        split_amounts=None, split_percentages=None, itemization=None,
+                        on_duplicate='flag'):
     """
     Create an expense for a specific group with proper validation.
     Uses groups.utils for membership validation.
@@ -126,11 +297,17 @@ def create_group_expense(group, paid_by_user, expense_data, participant_user_ids
         participant_user_ids: List of user IDs to include (optional)
         split_amounts: List of custom amounts for custom split (optional)
         split_percentages: List of percentages for percentage split (optional)
+        itemization: Dict with 'items' (amount, shares, description), 'tax' and 'tip'
+            for itemized split (optional)
+        on_duplicate: 'flag' to note likely duplicates on the expense, 'reject' to
+            raise DuplicateExpense instead, 'ignore' to skip the check
     
     Returns:
-        Created Expense instance
+        Created Expense instance; `possible_duplicates` holds the ids of likely
+        duplicates found at creation time
     """
-    from .models import Expense, ExpenseParticipant
+    from .models import Expense, ExpenseParticipant, ExpenseItem
+    from groups.models import Group
     
     # Validate that paid_by_user is a member of the group using groups.utils
     if not validate_group_membership(group, paid_by_user):
@@ -149,30 +326,62 @@ def create_group_expense(group, paid_by_user, expense_data, participant_user_ids
     # Convert to list to maintain order
     participant_user_ids = list(valid_member_ids)
     
+    fingerprint = expense_fingerprint(
+        group.id,
+        expense_data['total_amount'],
+        expense_data.get('currency', 'USD'),
+        expense_data['title']
+    )
+    bucket = fingerprint_bucket(timezone.now())
+    
     with transaction.atomic():
+        duplicate_ids = []
+        if on_duplicate != 'ignore':
+            # Serialize creations in the group so two identical concurrent
+            # submissions cannot both pass the probe before either commits
+            list(Group.objects.select_for_update().filter(pk=group.pk).values_list('pk', flat=True))
+            duplicate_ids = find_duplicate_expenses(fingerprint, bucket)
+            if duplicate_ids and on_duplicate == 'reject':
+                raise DuplicateExpense(duplicate_ids)
+        
         # Create the expense
         expense = Expense.objects.create(
             group=group,
             paid_by=paid_by_user,
+            fingerprint=fingerprint,
+            fingerprint_bucket=bucket,
             **expense_data
         )
+        expense.possible_duplicates = duplicate_ids
         
         # Calculate split amounts based on split type
-        split_type = expense_data.get('split_type', 'equal')
-        total_amount = expense_data['total_amount']
+        amounts = calculate_split_amounts(
+            expense_data.get('split_type', 'equal'),
+            expense_data['total_amount'],
+            len(participant_user_ids),
+            split_amounts=split_amounts,
+            split_percentages=split_percentages,
+            itemization=itemization,
+            participant_ids=participant_user_ids
+        )
         
-        if split_type == 'equal':
-            amounts = calculate_equal_split(total_amount, len(participant_user_ids))
-        elif split_type == 'percentage':
-            if not split_percentages:
-                raise ValueError("Percentage split requires split_percentages")
-            amounts = calculate_percentage_split(total_amount, split_percentages)
-        elif split_type == 'custom':
-            if not split_amounts:
-                raise ValueError("Custom split requires split_amounts")
-            amounts = calculate_custom_split(total_amount, split_amounts)
-        else:
-            raise ValueError(f"Invalid split type: {split_type}")
+        if itemization:
+            lines = [('item', item) for item in itemization.get('items', [])]
+            lines += [
+                (kind, {'amount': itemization[kind]})
+                for kind in ('tax', 'tip') if itemization.get(kind)
+            ]
+            ExpenseItem.objects.bulk_create([
+                ExpenseItem(
+                    expense=expense,
+                    kind=kind,
+                    description=line.get('description', ''),
+                    amount=line['amount'],
+                    shares={str(key): str(weight) for key, weight in (line.get('shares') or {}).items()},
+                    position=position
+                )
+                for position, (kind, line) in enumerate(lines)
+            ])
         
         # Create participants
         participants = []
@@ -197,48 +406,207 @@ def create_group_expense(group, paid_by_user, expense_data, participant_user_ids
         
         return expense
 
-# ===== BALANCE CALCULATION UTILITIES =====
-
-def get_user_group_balance(group, user):
-    """Get a user's total balance across all expenses in a group"""
-    from django.db.models import Sum
-    from decimal import Decimal
+def _itemized_amounts(expense, participant_ids):
+    """Shares of an itemized expense, recomputed from its stored ExpenseItem rows"""
+    from .models import ExpenseItem
+    
+    itemization = {'items': []}
+    for item in ExpenseItem.objects.filter(expense=expense).order_by('position'):
+        if item.kind == 'item':
+            itemization['items'].append({'amount': item.amount, 'shares': item.shares})
+        else:
+            itemization[item.kind] = itemization.get(item.kind, Decimal('0.00')) + item.amount
+    if not itemization['items']:
+        raise ValueError("This itemized expense has no stored items to split.")
+    
+    receipt_total = sum(item['amount'] for item in itemization['items'])
+    receipt_total += itemization.get('tax', Decimal('0.00')) + itemization.get('tip', Decimal('0.00'))
+    if receipt_total != expense.total_amount:
+        raise ValueError(
+            f"This expense is itemized and its items, tax and tip sum to {receipt_total}; "
+            f"total_amount cannot be changed to {expense.total_amount} without changing the items."
+        )
     
-    user_data = ExpenseParticipant.objects.filter(
-        expense__group=group,
-        user=user,
-        is_active=True
-    ).aggregate(
-        total_owed=Sum('amount_owed'),
-        total_paid=Sum('amount_paid')
+    return calculate_split_amounts(
+        'itemized',
+        expense.total_amount,
+        len(participant_ids),
+        itemization=itemization,
+        participant_ids=participant_ids
     )
+
+def resplit_expense(expense, split_amounts=None, split_percentages=None):
+    """
+    Recompute participant shares after an expense's total or split changed.
     
-    # 🔧 FIX: Handle None values from aggregate
-    total_owed = user_data['total_owed'] or Decimal('0.00')
-    total_paid = user_data['total_paid'] or Decimal('0.00')
+    split_amounts / split_percentages map user id -> value; percentage splits
+    keep their current proportions when none are given, and itemized ones are
+    recomputed from their stored items. Only participants
+    whose share changed are written (one bulk_update), and the ledger gets
+    the matching deltas in the same transaction. Returns the changed rows.
+    """
+    from .services.ledger_service import BalanceLedgerService
+    from groups.services.dashboard_service import bump_dashboard_versions
     
-    return total_paid - total_owed
+    with transaction.atomic():
+        participants = list(
+            ExpenseParticipant.objects.select_for_update().filter(
+                expense=expense,
+                is_active=True
+            ).order_by('created_at', 'id')
+        )
+        if not participants:
+            return []
+        
+        user_ids = [str(participant.user_id) for participant in participants]
+        
+        def ordered(values, label):
+            if values is None:
+                return None
+            keys = {str(key) for key in values}
+            if keys != set(user_ids):
+                raise ValueError(f"{label} must have exactly one entry per participant")
+            values = {str(key): value for key, value in values.items()}
+            return [values[user_id] for user_id in user_ids]
+        
+        amounts_list = ordered(split_amounts, 'split_amounts')
+        percentages_list = ordered(split_percentages, 'split_percentages')
+        
+        if expense.split_type == 'itemized':
+            if amounts_list is not None or percentages_list is not None:
+                raise ValueError("Itemized expenses are split by their items, not split_amounts or split_percentages")
+            amounts = _itemized_amounts(expense, [participant.user_id for participant in participants])
+        elif expense.split_type == 'percentage' and percentages_list is None:
+            # Keep the current proportions, as integer cents weights
+            weights = [to_cents(participant.amount_owed) for participant in participants]
+            if not any(weights):
+                raise ValueError("Percentage split requires split_percentages")
+            amounts = [
+                from_cents(cents)
+                for cents in allocate_cents(to_cents(expense.total_amount), weights)
+            ]
+        else:
+            amounts = calculate_split_amounts(
+                expense.split_type,
+                expense.total_amount,
+                len(participants),
+                split_amounts=amounts_list,
+                split_percentages=percentages_list
+            )
+        
+        now = timezone.now()
+        changed = []
+        deltas = []
+        for participant, amount in zip(participants, amounts):
+            if amount == participant.amount_owed:
+                continue
+            
+            is_payer = participant.user_id == expense.paid_by_id
+            old_outstanding = max(participant.amount_owed - participant.amount_paid, Decimal('0.00'))
+            if is_payer:
+                # The payer's own share is always covered
+                participant.amount_paid = amount
+            elif participant.amount_paid > amount:
+                raise ValueError(
+                    f"User {participant.user_id} already paid {participant.amount_paid}, "
+                    f"more than their new share of {amount}"
+                )
+            else:
+                deltas.append((
+                    expense.paid_by_id,
+                    participant.user_id,
+                    expense.currency,
+                    (amount - participant.amount_paid) - old_outstanding
+                ))
+            
+            participant.amount_owed = amount
+            participant.status = 'paid' if participant.amount_paid >= amount else 'pending'
+            participant.updated_at = now
+            participant.version += 1
+            changed.append(participant)
+        
+        if not changed:
+            return []
+        
+        ExpenseParticipant.objects.bulk_update(
+            changed,
+            ['amount_owed', 'amount_paid', 'status', 'updated_at', 'version']
+        )
+        
+        if expense.status in BalanceLedgerService.POSTED_STATUSES:
+            BalanceLedgerService().apply(deltas)
+        
+        expense.update_status()
+    
+    # bulk_update bypasses post_save
+    bump_dashboard_versions([participant.user_id for participant in changed])
+    
+    logger.info(f"Re-split expense {expense.id}: {len(changed)} of {len(participants)} shares changed")
+    return changed
+
+# ===== BALANCE CALCULATION UTILITIES =====
+
+def get_user_group_balances(group, user):
+    """A user's balance in a group per currency, from one grouped query"""
+    return {
+        row['expense__currency']: (row['total_paid'] or Decimal('0.00')) - (row['total_owed'] or Decimal('0.00'))
+        for row in ExpenseParticipant.objects.filter(
+            expense__group=group,
+            user=user,
+            is_active=True
+        ).values('expense__currency').annotate(
+            total_owed=Sum('amount_owed'),
+            total_paid=Sum('amount_paid')
+        ).order_by()
+    }
+
+def get_user_group_balance(group, user):
+    """
+    Get a user's total balance across all expenses in a group, in the group's
+    base currency. None when the FX table cannot convert every currency.
+    """
+    from .services.fx_service import convert_balances
+    
+    converted = convert_balances(get_user_group_balances(group, user), group.base_currency)
+    return converted['amount'] if converted else None
 
 def get_group_balances_matrix(group):
     """
-    Get a matrix of who owes whom in the group.
-    Uses groups.utils for member management.
+    Get a matrix of who owes whom in the group, per currency, with each
+    member's total converted to the group's base currency.
     """
-    # Get all active members using groups.utils
+    from .services.fx_service import convert_balances
+    
     members = get_active_group_members(group)
-    balances = {}
+    per_user = defaultdict(dict)
+    for row in ExpenseParticipant.objects.filter(
+        expense__group=group,
+        is_active=True
+    ).values('user_id', 'expense__currency').annotate(
+        total_owed=Sum('amount_owed'),
+        total_paid=Sum('amount_paid')
+    ).order_by():
+        per_user[row['user_id']][row['expense__currency']] = (
+            (row['total_paid'] or Decimal('0.00')) - (row['total_owed'] or Decimal('0.00'))
+        )
     
-    # Calculate balances for each member
+    balances = {}
     for member in members:
-        user_balance = get_user_group_balance(group, member.user)
+        by_currency = per_user.get(member.user.id, {})
+        converted = convert_balances(by_currency, group.base_currency)
+        user_balance = converted['amount'] if converted else None
         balances[str(member.user.id)] = {
             'user': {
                 'id': str(member.user.id),
                 'username': member.user.username,
                 'email': member.user.email,
             },
+            'balances': by_currency,
             'balance': user_balance,
-            'status': 'settled' if user_balance == 0 else 'owed' if user_balance > 0 else 'owes'
+            'status': (
+                'unknown' if user_balance is None else
+                'settled' if user_balance == 0 else 'owed' if user_balance > 0 else 'owes'
+            )
         }
     
     return balances
@@ -247,51 +615,54 @@ def calculate_optimal_settlements(group):
     """
     Calculate the optimal way to settle debts within a group.
     Returns a list of settlements that minimize the number of transactions.
+    Debts are settled in the currency they were incurred in, so every
+    settlement carries a currency and amounts are never mixed.
     """
     balances = get_group_balances_matrix(group)
+    currencies = sorted({currency for data in balances.values() for currency in data['balances']})
     
-    # Separate creditors (positive balance) and debtors (negative balance)
-    creditors = []
-    debtors = []
-    
-    for user_id, data in balances.items():
-        balance = data['balance']
-        if balance > 0:
-            creditors.append({'user_id': user_id, 'amount': balance, 'user': data['user']})
-        elif balance < 0:
-            debtors.append({'user_id': user_id, 'amount': abs(balance), 'user': data['user']})
-    
-    # Calculate settlements
     settlements = []
-    
-    # Sort creditors and debtors by amount (descending)
-    creditors.sort(key=lambda x: x['amount'], reverse=True)
-    debtors.sort(key=lambda x: x['amount'], reverse=True)
-    
-    i, j = 0, 0
-    while i < len(creditors) and j < len(debtors):
-        creditor = creditors[i]
-        debtor = debtors[j]
+    for currency in currencies:
+        # Separate creditors (positive balance) and debtors (negative balance)
+        creditors = []
+        debtors = []
         
-        # Calculate settlement amount
-        settlement_amount = min(creditor['amount'], debtor['amount'])
+        for user_id, data in balances.items():
+            balance = data['balances'].get(currency, Decimal('0.00'))
+            if balance > 0:
+                creditors.append({'user_id': user_id, 'amount': balance, 'user': data['user']})
+            elif balance < 0:
+                debtors.append({'user_id': user_id, 'amount': abs(balance), 'user': data['user']})
         
-        if settlement_amount > 0:
-            settlements.append({
-                'from_user': debtor['user'],
-                'to_user': creditor['user'],
-                'amount': settlement_amount
-            })
-            
-            # Update balances
-            creditor['amount'] -= settlement_amount
-            debtor['amount'] -= settlement_amount
+        # Sort creditors and debtors by amount (descending)
+        creditors.sort(key=lambda x: x['amount'], reverse=True)
+        debtors.sort(key=lambda x: x['amount'], reverse=True)
         
-        # Move to next creditor or debtor
-        if creditor['amount'] == 0:
-            i += 1
-        if debtor['amount'] == 0:
-            j += 1
+        i, j = 0, 0
+        while i < len(creditors) and j < len(debtors):
+            creditor = creditors[i]
+            debtor = debtors[j]
+            
+            # Calculate settlement amount
+            settlement_amount = min(creditor['amount'], debtor['amount'])
+            
+            if settlement_amount > 0:
+                settlements.append({
+                    'from_user': debtor['user'],
+                    'to_user': creditor['user'],
+                    'amount': settlement_amount,
+                    'currency': currency
+                })
+                
+                # Update balances
+                creditor['amount'] -= settlement_amount
+                debtor['amount'] -= settlement_amount
+            
+            # Move to next creditor or debtor
+            if creditor['amount'] == 0:
+                i += 1
+            if debtor['amount'] == 0:
+                j += 1
     
     return settlements
 
@@ -300,27 +671,38 @@ def calculate_optimal_settlements(group):
 # In expenses/utils.py - Fix the get_group_expense_summary function
 
 def get_group_expense_summary(group, user=None):
-    """Get comprehensive expense summary for a group, optionally for a specific user"""
+    """
+    Get comprehensive expense summary for a group, optionally for a specific user.
+    Money is aggregated per currency; the headline totals are those sums
+    converted to the group's base currency (None when a rate is missing).
+    """
     from .models import Expense, ExpenseParticipant
+    from .services.fx_service import convert_balances
     from decimal import Decimal
     
     base_query = Expense.objects.filter(group=group, is_active=True)
+    base_currency = group.base_currency
+    
+    def converted(totals):
+        result = convert_balances(totals, base_currency)
+        return result['amount'] if result else None
+    
+    totals_by_currency = {
+        row['currency']: row['total'] or Decimal('0.00')
+        for row in base_query.values('currency').annotate(total=Sum('total_amount')).order_by()
+    }
     
     summary = {
         'total_expenses': base_query.count(),
-        'total_amount': base_query.aggregate(
-            total=Sum('total_amount')
-        )['total'] or Decimal('0.00'),
+        'currency': base_currency,
+        'total_amount': converted(totals_by_currency),
+        'totals_by_currency': totals_by_currency,
         'pending_count': base_query.filter(status='pending').count(),
         'partial_count': base_query.filter(status='partial').count(),
         'settled_count': base_query.filter(status='settled').count(),
     }
     
     if user:
-        # Get user-specific data
-        user_balance = get_user_group_balance(group, user)
-        summary['user_balance'] = user_balance
-        
         # Get expenses user participated in
         user_expenses = base_query.filter(
             participants__user=user,
@@ -329,18 +711,27 @@ def get_group_expense_summary(group, user=None):
         
         summary['user_expense_count'] = user_expenses.count()
         
-        user_participant_data = ExpenseParticipant.objects.filter(
+        owed_by_currency = {}
+        paid_by_currency = {}
+        for row in ExpenseParticipant.objects.filter(
             expense__group=group,
             user=user,
             is_active=True
-        ).aggregate(
+        ).values('expense__currency').annotate(
             total_owed=Sum('amount_owed'),
             total_paid=Sum('amount_paid')
-        )
+        ).order_by():
+            owed_by_currency[row['expense__currency']] = row['total_owed'] or Decimal('0.00')
+            paid_by_currency[row['expense__currency']] = row['total_paid'] or Decimal('0.00')
         
-        # 🔧 FIX: Handle None values from aggregate
-        summary['user_total_owed'] = user_participant_data['total_owed'] or Decimal('0.00')
-        summary['user_total_paid'] = user_participant_data['total_paid'] or Decimal('0.00')
+        balances_by_currency = {
+            currency: paid_by_currency[currency] - owed_by_currency[currency]
+            for currency in owed_by_currency
+        }
+        summary['user_balances'] = balances_by_currency
+        summary['user_balance'] = converted(balances_by_currency)
+        summary['user_total_owed'] = converted(owed_by_currency)
+        summary['user_total_paid'] = converted(paid_by_currency)
         
         # Count of expenses where user owes money
         summary['user_pending_count'] = ExpenseParticipant.objects.filter(
@@ -352,9 +743,17 @@ def get_group_expense_summary(group, user=None):
     
     return summary
 
-def settle_expense_for_user(expense, user, amount=None):
-    """Mark an expense as settled for a specific user"""
-    from .models import ExpenseParticipant
+def settle_expense_for_user(expense, user, amount=None, expected_version=None):
+    """
+    Record a payment from a participant to the expense payer.
+    amount_paid is bumped with a conditional atomic increment, so concurrent
+    payments never lose updates and never overpay. With expected_version the
+    payment only applies if the participation is still at that version.
+    """
+    from .models import Payment
+    from .services.ledger_service import BalanceLedgerService
+    from .services.version_service import VersionConflict
+    from groups.services.dashboard_service import bump_dashboard_versions
     
     try:
         participant = ExpenseParticipant.objects.get(
@@ -362,32 +761,61 @@ def settle_expense_for_user(expense, user, amount=None):
             user=user,
             is_active=True
         )
+    except ExpenseParticipant.DoesNotExist:
+        raise ValueError("User is not a participant in this expense.")
+    
+    if amount is None:
+        # Pay the full amount owed
+        amount = participant.amount_owed - participant.amount_paid
+    
+    # Validate amount
+    if amount <= 0:
+        raise ValueError("Settlement amount must be positive")
+    
+    conditions = {}
+    if expected_version is not None:
+        conditions['version'] = expected_version
+    
+    with transaction.atomic():
+        updated = ExpenseParticipant.objects.filter(
+            pk=participant.pk,
+            amount_paid__lte=F('amount_owed') - amount,
+            **conditions
+        ).update(
+            amount_paid=F('amount_paid') + amount,
+            status=Case(
+                When(amount_paid__gte=F('amount_owed') - amount, then=Value('paid')),
+                default=F('status')
+            ),
+            updated_at=timezone.now(),
+            version=F('version') + 1
+        )
         
-        if amount is None:
-            # Pay the full amount owed
-            amount = participant.amount_owed - participant.amount_paid
-        
-        # Validate amount
-        if amount <= 0:
-            raise ValueError("Settlement amount must be positive")
-        
-        max_settable = participant.amount_owed - participant.amount_paid
-        if amount > max_settable:
+        if not updated:
+            participant.refresh_from_db(fields=['amount_owed', 'amount_paid', 'version'])
+            if expected_version is not None and participant.version != expected_version:
+                raise VersionConflict(participant, expected_version)
+            max_settable = participant.amount_owed - participant.amount_paid
             raise ValueError(f"Cannot settle more than owed. Maximum: {max_settable}")
         
-        participant.amount_paid += amount
-        if participant.amount_paid >= participant.amount_owed:
-            participant.status = 'paid'
-        
-        participant.save()
-        expense.update_status()
-        
-        logger.info(f"Settled {amount} for user {user.id} on expense {expense.id}")
-        
-        return participant
-        
-    except ExpenseParticipant.DoesNotExist:
-        raise ValueError("User is not a participant in this expense.")
+        Payment.objects.create(
+            expense=expense,
+            participant=participant,
+            payer=user,
+            payee_id=expense.paid_by_id,
+            amount=amount,
+            currency=expense.currency
+        )
+        BalanceLedgerService().record_payment(expense, user.id, amount)
+    
+    participant.refresh_from_db(fields=['amount_paid', 'status', 'updated_at', 'version'])
+    expense.update_status()
+    # The UPDATE above bypasses post_save
+    bump_dashboard_versions([user.id])
+    
+    logger.info(f"Settled {amount} for user {user.id} on expense {expense.id}")
+    
+    return participant
 
 def get_user_expenses_in_group(group, user, status_filter=None):
     """Get all expenses for a user in a specific group"""
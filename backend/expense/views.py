@@ -3,24 +3,67 @@
 from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.utils.urls import replace_query_param
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import Q
+import uuid
 from groups.models import Group, GroupMembership
-from .models import Expense, ExpenseParticipant, GroupApprovalSettings, ApprovalQueue
+from groups.services.dashboard_service import bump_group_dashboards
+from api.idempotency import idempotent
+from .models import (
+    Expense, ExpenseParticipant, GroupApprovalSettings, ApprovalQueue,
+    BalanceLedger, Payment, RecurringExpense
+)
 from .serializers import (
     ExpenseSerializer, CreateExpenseSerializer, 
     GroupExpenseSummarySerializer, ExpenseParticipantSerializer,
     SmartCreateExpenseSerializer, ApprovalQueueSerializer,
     GroupApprovalSettingsSerializer, BatchApprovalSerializer,
-    RejectExpenseSerializer
+    RejectExpenseSerializer, SettleUpSerializer, PaymentSerializer,
+    ExpenseSplitUpdateSerializer, RecurringExpenseSerializer, ExpenseSearchResultSerializer
+)
+from .utils import (
+    get_group_expense_summary, settle_expense_for_user, get_user_group_balances, resplit_expense,
+    DuplicateExpense, expense_fingerprint
 )
-from .utils import get_group_expense_summary, settle_expense_for_user, get_user_group_balance
 from .services.smart_approval_service import SmartApprovalService
+from .services.status_service import ExpenseStatusConflict
+from .services.ledger_service import BalanceLedgerService
+from .services.settlement_service import SettleUpService
+from .services.version_service import VersionConflict, etag_for, parse_if_match, save_versioned
+from .services.fx_service import convert_balances
+from .services.search_service import search_group_expenses, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .services.filter_service import filter_expenses
+
+def _version_conflict_response(conflict):
+    return Response(
+        {
+            'error': 'This was changed by someone else. Reload and try again.',
+            'current_version': conflict.current_version,
+        },
+        status=status.HTTP_409_CONFLICT,
+        headers={'ETag': etag_for(conflict.instance, conflict.current_version)} if conflict.current_version else {}
+    )
+
+class PaymentPagination(LimitOffsetPagination):
+    default_limit = 50
+    max_limit = 200
+
+class ExpenseListPagination(LimitOffsetPagination):
+    """Opt-in: the expense list is only paginated when ?limit= is given"""
+    max_limit = 200
 
 @api_view(['GET', 'POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def group_expenses(request, group_id):
-    """Get expenses for a group or create a new expense with smart approval"""
+    """
+    Get expenses for a group or create a new expense with smart approval.
+    GET takes optional filters (paid_by, status, created_after, created_before,
+    min_amount, max_amount, involves_me), ?ordering= and ?limit=/?offset=.
+    """
     
     # Get group and verify user is a member
     group = get_object_or_404(Group, id=group_id, is_active=True)
@@ -40,8 +83,8 @@ def group_expenses(request, group_id):
                 group=group,
                 is_active=True
             ).select_related('paid_by').prefetch_related(
-                'participants__user'
-            ).order_by('-created_at')
+                'participants__user', 'items'
+            )
         else:
             # Members only see approved/active expenses
             expenses = Expense.objects.filter(
@@ -49,8 +92,18 @@ def group_expenses(request, group_id):
                 is_active=True,
                 status__in=['auto_approved', 'approved', 'pending', 'partial', 'settled']
             ).select_related('paid_by').prefetch_related(
-                'participants__user'
-            ).order_by('-created_at')
+                'participants__user', 'items'
+            )
+        
+        try:
+            expenses = filter_expenses(expenses.defer('search_vector'), request.GET, request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        paginator = ExpenseListPagination()
+        page = paginator.paginate_queryset(expenses, request)
+        if page is not None:
+            return paginator.get_paginated_response(ExpenseSerializer(page, many=True).data)
         
         serializer = ExpenseSerializer(expenses, many=True)
         return Response(serializer.data)
@@ -78,13 +131,34 @@ def group_expenses(request, group_id):
             has_receipt = serializer.validated_data.get('has_receipt', False)
             receipt_image = request.FILES.get('receipt_image')
             
-            expense, approval_result = approval_service.create_expense_with_smart_approval(
-                paid_by_user=request.user,
-                expense_data=expense_data,
-                participant_user_ids=serializer.validated_data.get('participant_ids'),
-                has_receipt=has_receipt,
-                receipt_image=receipt_image
-            )
+            itemization = None
+            if expense_data['split_type'] == 'itemized':
+                itemization = {
+                    'items': serializer.validated_data['items'],
+                    'tax': serializer.validated_data['tax'],
+                    'tip': serializer.validated_data['tip'],
+                }
+            
+            try:
+                expense, approval_result = approval_service.create_expense_with_smart_approval(
+                    paid_by_user=request.user,
+                    expense_data=expense_data,
+                    participant_user_ids=serializer.validated_data.get('participant_ids'),
+                    has_receipt=has_receipt,
+                    receipt_image=receipt_image,
+                    itemization=itemization,
+                    allow_duplicate=serializer.validated_data['allow_duplicate']
+                )
+            except DuplicateExpense as e:
+                return Response(
+                    {
+                        'error': str(e),
+                        'possible_duplicates': [str(expense_id) for expense_id in e.expense_ids],
+                    },
+                    status=status.HTTP_409_CONFLICT
+                )
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
             # Return the created expense with approval info
             response_serializer = ExpenseSerializer(expense)
@@ -95,10 +169,64 @@ def group_expenses(request, group_id):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def search_expenses(request, group_id):
+    """
+    Full-text search over a group's expenses, best match first.
+    ?q= is required; ?limit= and ?cursor= (from `next`) page through results.
+    """
+    group = get_object_or_404(Group, id=group_id, is_active=True)
+    membership = get_object_or_404(
+        GroupMembership,
+        group=group,
+        user=request.user,
+        is_active=True
+    )
+    
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response(
+            {'error': 'Search query (q) is required.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        limit = min(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {'error': f'limit must be between 1 and {MAX_PAGE_SIZE}.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        expenses, next_cursor = search_group_expenses(
+            group,
+            query,
+            # Same visibility as the expense list
+            include_unapproved=membership.role == 'owner',
+            cursor=request.GET.get('cursor'),
+            limit=limit
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'results': ExpenseSearchResultSerializer(expenses, many=True).data,
+        'next': replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor) if next_cursor else None,
+    })
+
 @api_view(['GET', 'PATCH', 'DELETE'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def expense_detail(request, group_id, expense_id):
-    """Get, update, or delete a specific expense"""
+    """
+    Get, update, or delete a specific expense.
+    GET returns the expense version as an ETag; PATCH and DELETE honour
+    If-Match and answer 409 when the expense changed in the meantime.
+    """
     
     # Get group and expense
     group = get_object_or_404(Group, id=group_id, is_active=True)
@@ -128,9 +256,14 @@ def expense_detail(request, group_id, expense_id):
             )
         
         serializer = ExpenseSerializer(expense)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': etag_for(expense)})
     
-    elif request.method == 'PATCH':
+    try:
+        expected_version = parse_if_match(request, Expense)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if request.method == 'PATCH':
         # Only the person who paid can edit the expense
         if expense.paid_by != request.user:
             return Response(
@@ -139,7 +272,7 @@ def expense_detail(request, group_id, expense_id):
             )
         
         # 🆕 Check if expense can be edited based on status
-        if expense.status not in ['pending_approval', 'pending']:
+        if expense.status not in ['pending_approval', 'pending', 'partial']:
             return Response(
                 {'error': 'Cannot edit expense in current status.'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -149,27 +282,61 @@ def expense_detail(request, group_id, expense_id):
         allowed_fields = ['title', 'description', 'total_amount']
         update_data = {k: v for k, v in request.data.items() if k in allowed_fields}
         
-        if not update_data:
+        split_serializer = ExpenseSplitUpdateSerializer(data=request.data)
+        if not split_serializer.is_valid():
+            return Response(split_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        split_data = split_serializer.validated_data
+        
+        if not update_data and not split_data:
             return Response(
                 {'error': 'No valid fields to update.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         serializer = ExpenseSerializer(expense, data=update_data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            
-            # 🆕 Re-run smart approval if it was pending approval
-            if expense.status == 'pending_approval':
-                approval_service = SmartApprovalService(group)
-                approval_result = approval_service._evaluate_auto_approval(expense, request.user)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        old_total = expense.total_amount
+        for field, value in serializer.validated_data.items():
+            setattr(expense, field, value)
+        
+        update_fields = list(serializer.validated_data)
+        if {'title', 'total_amount'} & set(update_fields):
+            # Keeps its original time bucket
+            expense.fingerprint = expense_fingerprint(
+                group.id, expense.total_amount, expense.currency, expense.title
+            )
+            update_fields.append('fingerprint')
+        
+        try:
+            with transaction.atomic():
+                save_versioned(expense, update_fields, expected_version)
                 
-                if approval_result['auto_approve']:
-                    approval_service._auto_approve_expense(expense, approval_result['reason'])
+                # Shares follow the new total, written as a diff
+                if expense.total_amount != old_total or split_data:
+                    resplit_expense(
+                        expense,
+                        split_amounts=split_data.get('split_amounts'),
+                        split_percentages=split_data.get('split_percentages')
+                    )
+        except VersionConflict as e:
+            return _version_conflict_response(e)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # 🆕 Re-run smart approval if it was pending approval
+        if expense.status == 'pending_approval':
+            approval_service = SmartApprovalService(group)
+            approval_result = approval_service._evaluate_auto_approval(expense, request.user)
             
-            return Response(serializer.data)
+            if approval_result['auto_approve']:
+                approval_service._auto_approve_expense(expense, approval_result['reason'])
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # The conditional UPDATE bypasses post_save
+        bump_group_dashboards(group.id)
+        
+        return Response(ExpenseSerializer(expense).data, headers={'ETag': etag_for(expense)})
     
     elif request.method == 'DELETE':
         # Only the person who paid can delete the expense
@@ -179,8 +346,18 @@ def expense_detail(request, group_id, expense_id):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        expense.is_active = False
-        expense.save()
+        try:
+            with transaction.atomic():
+                expense.is_active = False
+                save_versioned(expense, ['is_active'], expected_version)
+                
+                # Drop whatever is still owed on it from cross-group balances
+                if expense.status in BalanceLedgerService.POSTED_STATUSES:
+                    BalanceLedgerService().unpost_expense(expense)
+        except VersionConflict as e:
+            return _version_conflict_response(e)
+        
+        bump_group_dashboards(group.id)
         
         return Response({'message': 'Expense deleted successfully.'})
 
@@ -211,10 +388,15 @@ def group_expense_summary(request, group_id):
     
     return Response(serializer.data)
 
-@api_view(['POST'])
+@api_view(['GET', 'POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def settle_expense(request, group_id, expense_id):
-    """Mark an expense as settled for the current user"""
+    """
+    Mark an expense as settled for the current user.
+    GET returns the user's participation with its ETag ("p<version>");
+    POST honours it in If-Match.
+    """
     
     group = get_object_or_404(Group, id=group_id, is_active=True)
     expense = get_object_or_404(
@@ -232,6 +414,18 @@ def settle_expense(request, group_id, expense_id):
         is_active=True
     )
     
+    if request.method == 'GET':
+        participant = get_object_or_404(
+            ExpenseParticipant,
+            expense=expense,
+            user=request.user,
+            is_active=True
+        )
+        return Response(
+            ExpenseParticipantSerializer(participant).data,
+            headers={'ETag': etag_for(participant)}
+        )
+    
     # 🆕 Only allow settlement of approved expenses
     if expense.status not in ['pending', 'partial']:
         return Response(
@@ -240,25 +434,101 @@ def settle_expense(request, group_id, expense_id):
         )
     
     try:
-        participant = settle_expense_for_user(expense, request.user)
+        participant = settle_expense_for_user(
+            expense,
+            request.user,
+            expected_version=parse_if_match(request, ExpenseParticipant)
+        )
         serializer = ExpenseParticipantSerializer(participant)
         
         return Response({
             'success': True,
             'message': 'Expense marked as settled.',
             'participant': serializer.data
-        })
-        
+        }, headers={'ETag': etag_for(participant)})
+    
+    except VersionConflict as e:
+        return _version_conflict_response(e)
+    except ValueError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@idempotent
+def settle_up(request):
+    """
+    Pay someone back across many expenses at once.
+    The amount is applied to the oldest open shares first.
+    """
+    from django.contrib.auth import get_user_model
+    
+    serializer = SettleUpSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    counterparty = get_object_or_404(get_user_model(), id=data['counterparty_id'])
+    if counterparty == request.user:
+        return Response(
+            {'error': 'You cannot settle up with yourself.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    group = None
+    if data.get('group_id'):
+        group = get_object_or_404(Group, id=data['group_id'], is_active=True)
+        get_object_or_404(
+            GroupMembership,
+            group=group,
+            user=request.user,
+            is_active=True
+        )
+    
+    try:
+        settlement_id, allocations = SettleUpService(request.user, counterparty).settle(
+            data['amount'],
+            currency=data['currency'],
+            group=group
+        )
     except ValueError as e:
         return Response(
             {'error': str(e)},
             status=status.HTTP_400_BAD_REQUEST
         )
+    except ExpenseStatusConflict as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    return Response({
+        'success': True,
+        'message': f'Settled {data["amount"]} {data["currency"]} across {len(allocations)} expenses.',
+        'settlement_id': str(settlement_id),
+        'amount': data['amount'],
+        'currency': data['currency'],
+        'allocations': [
+            {
+                'expense_id': str(participant.expense_id),
+                'title': participant.expense.title,
+                'amount': applied,
+                'remaining': participant.amount_owed - participant.amount_paid,
+                'expense_status': participant.expense.status,
+            }
+            for participant, applied in allocations
+        ],
+    })
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def user_group_balance(request, group_id):
-    """Get current user's balance in a specific group"""
+    """
+    Get current user's balance in a specific group, per currency and
+    converted to the group's base currency (or ?currency=)
+    """
     
     group = get_object_or_404(Group, id=group_id, is_active=True)
     
@@ -270,15 +540,177 @@ def user_group_balance(request, group_id):
         is_active=True
     )
     
-    balance = get_user_group_balance(group, request.user)
+    balances = get_user_group_balances(group, request.user)
+    
+    # Optional ?currency= overrides the group's base currency for the total
+    target = request.GET.get('currency', group.base_currency).upper()
+    converted = convert_balances(balances, target)
+    balance = converted['amount'] if converted else None
     
     return Response({
         'user_id': str(request.user.id),
         'group_id': str(group.id),
+        'currency': target,
         'balance': balance,
-        'status': 'settled' if balance == 0 else 'owed' if balance > 0 else 'owes'
+        'fx_version': converted['fx_version'] if converted else None,
+        'balances': [
+            {'currency': currency, 'amount': amount}
+            for currency, amount in sorted(balances.items())
+        ],
+        'status': (
+            'unknown' if balance is None else
+            'settled' if balance == 0 else 'owed' if balance > 0 else 'owes'
+        )
     })
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def net_balances(request):
+    """
+    Net balance with every person across all shared groups, per currency.
+    Positive amounts mean they owe the current user. ?user_id= limits to one person.
+    """
+    from friends.models import FriendShip
+    
+    entries = BalanceLedger.objects.filter(
+        user=request.user
+    ).exclude(
+        amount=0
+    ).select_related('counterparty__profile').order_by('counterparty_id', 'currency')
+    
+    user_id = request.GET.get('user_id')
+    if user_id:
+        if not user_id.isdigit():
+            return Response(
+                {'error': 'user_id must be a number.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        entries = entries.filter(counterparty_id=int(user_id))
+    
+    people = {}
+    for entry in entries:
+        person = people.get(entry.counterparty_id)
+        if person is None:
+            counterparty = entry.counterparty
+            profile = getattr(counterparty, 'profile', None)
+            person = people[entry.counterparty_id] = {
+                'user': {
+                    'id': str(counterparty.id),
+                    'username': counterparty.username,
+                    'email': counterparty.email,
+                    'avatar': profile.avatar.url if profile and profile.avatar else None,
+                },
+                'is_friend': False,
+                'balances': [],
+            }
+        person['balances'].append({
+            'currency': entry.currency,
+            'amount': entry.amount,
+            'status': 'owed' if entry.amount > 0 else 'owes',
+        })
+    
+    if people:
+        for low_id, high_id in FriendShip.objects.filter(
+            Q(user_low=request.user, user_high_id__in=people) |
+            Q(user_high=request.user, user_low_id__in=people),
+            status='accepted'
+        ).values_list('user_low_id', 'user_high_id'):
+            people[high_id if low_id == request.user.id else low_id]['is_friend'] = True
+    
+    return Response(list(people.values()))
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def payment_history(request):
+    """
+    Payments made or received by the current user, newest first.
+    Optional ?user_id= (the other person), ?expense_id=, ?limit= and ?offset=.
+    """
+    payments = Payment.objects.filter(
+        Q(payer=request.user) | Q(payee=request.user)
+    ).select_related('payer', 'payee', 'expense')
+    
+    user_id = request.GET.get('user_id')
+    if user_id:
+        if not user_id.isdigit():
+            return Response(
+                {'error': 'user_id must be a number.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        payments = payments.filter(Q(payer_id=user_id) | Q(payee_id=user_id))
+    
+    expense_id = request.GET.get('expense_id')
+    if expense_id:
+        try:
+            payments = payments.filter(expense_id=uuid.UUID(expense_id))
+        except ValueError:
+            return Response(
+                {'error': 'expense_id must be a UUID.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    paginator = PaymentPagination()
+    page = paginator.paginate_queryset(payments.order_by('-created_at', 'id'), request)
+    serializer = PaymentSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+@idempotent
+def recurring_expenses(request, group_id):
+    """List a group's active recurring expenses or create one paid by the current user"""
+    
+    group = get_object_or_404(Group, id=group_id, is_active=True)
+    get_object_or_404(
+        GroupMembership,
+        group=group,
+        user=request.user,
+        is_active=True
+    )
+    
+    if request.method == 'GET':
+        templates = RecurringExpense.objects.filter(
+            group=group,
+            is_active=True
+        ).select_related('paid_by').order_by('next_run_date', 'id')
+        serializer = RecurringExpenseSerializer(templates, many=True)
+        return Response(serializer.data)
+    
+    serializer = RecurringExpenseSerializer(
+        data=request.data,
+        context={'group': group, 'request': request}
+    )
+    if serializer.is_valid():
+        template = serializer.save()
+        return Response(RecurringExpenseSerializer(template).data, status=status.HTTP_201_CREATED)
+    
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+@idempotent
+def recurring_expense_detail(request, group_id, template_id):
+    """Stop a recurring expense (payer or group owner); past occurrences are kept"""
+    
+    group = get_object_or_404(Group, id=group_id, is_active=True)
+    membership = get_object_or_404(
+        GroupMembership,
+        group=group,
+        user=request.user,
+        is_active=True
+    )
+    template = get_object_or_404(RecurringExpense, id=template_id, group=group, is_active=True)
+    
+    if template.paid_by_id != request.user.id and membership.role != 'owner':
+        return Response(
+            {'error': 'Only the payer or a group owner can stop a recurring expense.'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    template.is_active = False
+    template.save(update_fields=['is_active', 'updated_at'])
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
 # 🆕 NEW SMART APPROVAL ENDPOINTS
 
 @api_view(['GET'])
@@ -310,6 +742,7 @@ def pending_approvals(request, group_id):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def approve_expense(request, group_id, expense_id):
     """Approve a pending expense (owners only)"""
     
@@ -337,7 +770,13 @@ def approve_expense(request, group_id, expense_id):
     
     # Approve the expense
     approval_service = SmartApprovalService(group)
-    approval_service.manually_approve_expense(expense, request.user)
+    try:
+        approval_service.manually_approve_expense(expense, request.user)
+    except ExpenseStatusConflict:
+        return Response(
+            {'error': 'Expense was already processed by someone else.'},
+            status=status.HTTP_409_CONFLICT
+        )
     
     # Return updated expense
     serializer = ExpenseSerializer(expense)
@@ -349,6 +788,7 @@ def approve_expense(request, group_id, expense_id):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def reject_expense(request, group_id, expense_id):
     """Reject a pending expense (owners only)"""
     
@@ -381,7 +821,13 @@ def reject_expense(request, group_id, expense_id):
         
         # Reject the expense
         approval_service = SmartApprovalService(group)
-        approval_service.reject_expense(expense, request.user, reason)
+        try:
+            approval_service.reject_expense(expense, request.user, reason)
+        except ExpenseStatusConflict:
+            return Response(
+                {'error': 'Expense was already processed by someone else.'},
+                status=status.HTTP_409_CONFLICT
+            )
         
         return Response({
             'success': True,
@@ -393,6 +839,7 @@ def reject_expense(request, group_id, expense_id):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def batch_approve_expenses(request, group_id):
     """Batch approve multiple expenses (owners only)"""
     
@@ -430,6 +877,7 @@ def batch_approve_expenses(request, group_id):
 
 @api_view(['GET', 'PATCH'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def approval_settings(request, group_id):
     """Get or update group approval settings (owners only)"""
     
@@ -1,10 +1,16 @@
 # friends/admin.py
 from django.contrib import admin
-from .models import FriendShip
+from .models import FriendShip, FriendSuggestion
 
 @admin.register(FriendShip)
 class FriendshipAdmin(admin.ModelAdmin):
     list_display = ['from_user', 'to_user', 'status', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['from_user__username', 'to_user__username']
-    readonly_fields = ['created_at', 'updated_at']
\ No newline at end of file
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(FriendSuggestion)
+class FriendSuggestionAdmin(admin.ModelAdmin):
+    list_display = ['user', 'suggested_user', 'mutual_friends', 'shared_groups', 'score', 'updated_at']
+    search_fields = ['user__username', 'suggested_user__username']
+    readonly_fields = ['updated_at']
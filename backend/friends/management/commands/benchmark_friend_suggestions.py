@@ -0,0 +1,149 @@
+import random
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from friends.models import FriendShip, FriendSuggestion
+from friends.services.suggestion_service import SuggestionIndex
+from groups.models import Group, GroupMembership
+
+User = get_user_model()
+
+SEED_PREFIX = 'sugg_'
+
+class Command(BaseCommand):
+    help = "Seed a synthetic friend graph and time suggestion rebuild, incremental updates and reads (needs --allow-writes)"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--friends', type=int, default=10, help="Average friends per user")
+        parser.add_argument('--group-size', type=int, default=8)
+        parser.add_argument('--groups-per-user', type=float, default=1.5)
+        parser.add_argument('--updates', type=int, default=200, help="Incremental friendship accepts to time")
+        parser.add_argument('--reads', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--allow-writes', action='store_true',
+            help="Required: the benchmark seeds a graph and rebuilds every user's suggestions"
+        )
+        parser.add_argument('--cleanup', action='store_true', help="Delete seeded data, rebuild and exit")
+    
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            Group.objects.filter(name__startswith=SEED_PREFIX).delete()
+            deleted, _ = User.objects.filter(username__startswith=SEED_PREFIX).delete()
+            SuggestionIndex().rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} seeded rows"))
+            return
+        
+        if not options['allow_writes']:
+            raise CommandError(
+                f"This benchmark writes users, friendships and groups to database "
+                f"'{connection.settings_dict['NAME']}' and rebuilds all friend suggestions. "
+                f"Pass --allow-writes to run it."
+            )
+        
+        rng = random.Random(options['seed'])
+        user_ids = self.seed_graph(rng, options)
+        
+        start = time.perf_counter()
+        rows = SuggestionIndex().rebuild()
+        self.stdout.write(f"Full rebuild: {rows} rows in {time.perf_counter() - start:.1f} s")
+        
+        # Incremental path: accept new friendships through the ORM so signals fire
+        timings = []
+        for _ in range(options['updates']):
+            user_a, user_b = rng.sample(user_ids, 2)
+            if FriendShip.between(user_a, user_b).exists():
+                continue
+            start = time.perf_counter()
+            friendship = FriendShip.objects.create(from_user_id=user_a, to_user_id=user_b)
+            friendship.status = 'accepted'
+            friendship.save()
+            timings.append((time.perf_counter() - start) * 1000)
+        self.report("Incremental accept", timings)
+        
+        # The incremental result must equal a from-scratch rebuild
+        sample = rng.sample(user_ids, min(200, len(user_ids)))
+        before = self.snapshot(sample)
+        SuggestionIndex().rebuild()
+        after = self.snapshot(sample)
+        if before == after:
+            self.stdout.write(self.style.SUCCESS("Incremental updates match a full rebuild"))
+        else:
+            self.stdout.write(self.style.ERROR("Incremental updates diverge from a full rebuild"))
+        
+        timings = []
+        for _ in range(options['reads']):
+            user_id = rng.choice(user_ids)
+            start = time.perf_counter()
+            list(FriendSuggestion.objects.filter(user_id=user_id, score__gt=0).select_related(
+                'suggested_user__profile'
+            ).order_by('-score')[:20])
+            timings.append((time.perf_counter() - start) * 1000)
+        self.report("Suggestion read", timings)
+    
+    def seed_graph(self, rng, options):
+        existing = list(User.objects.filter(username__startswith=SEED_PREFIX).values_list('id', flat=True))
+        if existing:
+            self.stdout.write(f"Reusing {len(existing)} seeded users")
+            return existing
+        
+        count = options['users']
+        batch_size = options['batch_size']
+        password = make_password(None)
+        start = time.perf_counter()
+        
+        User.objects.bulk_create(
+            (User(username=f"{SEED_PREFIX}{index}", email=f"{SEED_PREFIX}{index}@example.com", password=password)
+             for index in range(count)),
+            batch_size=batch_size
+        )
+        user_ids = list(User.objects.filter(username__startswith=SEED_PREFIX).values_list('id', flat=True))
+        
+        # bulk_create skips save(), so fill in the canonical pair directly
+        pairs = set()
+        target = count * options['friends'] // 2
+        while len(pairs) < target:
+            user_a, user_b = rng.sample(user_ids, 2)
+            pairs.add(FriendShip.canonical_pair(user_a, user_b))
+        FriendShip.objects.bulk_create(
+            (FriendShip(from_user_id=low, to_user_id=high, user_low_id=low, user_high_id=high, status='accepted')
+             for low, high in pairs),
+            batch_size=batch_size
+        )
+        
+        group_count = int(count * options['groups_per_user'] / options['group_size'])
+        groups = Group.objects.bulk_create(
+            (Group(name=f"{SEED_PREFIX}{index}", owner_id=rng.choice(user_ids)) for index in range(group_count)),
+            batch_size=batch_size
+        )
+        GroupMembership.objects.bulk_create(
+            (GroupMembership(group=group, user_id=user_id)
+             for group in groups
+             for user_id in rng.sample(user_ids, options['group_size'])),
+            batch_size=batch_size
+        )
+        
+        self.stdout.write(
+            f"Seeded {count} users, {len(pairs)} friendships and {group_count} groups "
+            f"in {time.perf_counter() - start:.1f} s"
+        )
+        return user_ids
+    
+    def snapshot(self, user_ids):
+        return set(FriendSuggestion.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'suggested_user_id', 'mutual_friends', 'shared_groups', 'score'
+        ))
+    
+    def report(self, label, timings):
+        if not timings:
+            return
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label}: {len(timings)} ops, p50 {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms"
+        )
@@ -0,0 +1,13 @@
+import time
+from django.core.management.base import BaseCommand
+from friends.services.suggestion_service import SuggestionIndex
+
+class Command(BaseCommand):
+    help = "Recompute the friend suggestion table from friendships and group memberships"
+    
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = SuggestionIndex().rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {count} friend suggestions in {time.perf_counter() - start:.1f} s"
+        ))
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_canonical_pairs(apps, schema_editor):
+    FriendShip = apps.get_model('friends', 'FriendShip')
+    
+    # Keep one row per pair: an accepted friendship wins, then the newest request
+    status_rank = {'accepted': 0, 'pending': 1, 'rejected': 2}
+    kept = {}
+    duplicates = []
+    for friendship in FriendShip.objects.order_by('-updated_at', '-id'):
+        pair = tuple(sorted((friendship.from_user_id, friendship.to_user_id)))
+        friendship.user_low_id, friendship.user_high_id = pair
+        current = kept.get(pair)
+        if current is None:
+            kept[pair] = friendship
+        elif status_rank.get(friendship.status, 3) < status_rank.get(current.status, 3):
+            duplicates.append(current.id)
+            kept[pair] = friendship
+        else:
+            duplicates.append(friendship.id)
+    
+    FriendShip.objects.filter(id__in=duplicates).delete()
+    FriendShip.objects.bulk_update(kept.values(), ['user_low', 'user_high'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('friends', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='friendship',
+            name='user_low',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='friendship',
+            name='user_high',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_canonical_pairs, migrations.RunPython.noop),
+    ]
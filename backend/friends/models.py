@@ -1,29 +1,165 @@
 from django.db import models
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from api.tracking import UNCHANGED, TrackLoadedFields, previous_value
 
 User = get_user_model()
 
-class FriendShip(models.Model):
+class FriendShip(TrackLoadedFields, models.Model):
     from_user = models.ForeignKey(User, related_name='sent_requests', on_delete=models.CASCADE)
     to_user = models.ForeignKey(User, related_name='received_requests', on_delete=models.CASCADE)
-
+    
+    # Canonical, direction-free pair (smaller id first) so one row exists per
+    # pair of users and lookups are a single unique-index probe
+    user_low = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    user_high = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    
     STATUS_CHOICES = [
        ('pending', 'Pending'),
        ('accepted', 'Accepted'),
        ('rejected', 'Rejected'),
-    ] 
+    ]
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
-
+    tracked_fields = ('status',)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-
+    
     class Meta:
         unique_together = ('from_user', 'to_user')
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='unique_friendship_pair'),
+        ]
         indexes = [
             models.Index(fields=['from_user', 'status']),
             models.Index(fields=['to_user', 'status']),
+            models.Index(fields=['user_high', 'status']),
         ]
         def __str__(self):
             return f"{self.from_user.username} -> {self.to_user.username} ({self.status})"
+    
+    @staticmethod
+    def canonical_pair(user_a_id, user_b_id):
+        """(low, high) ordering of two user ids"""
+        return (user_a_id, user_b_id) if user_a_id < user_b_id else (user_b_id, user_a_id)
+    
+    @classmethod
+    def between(cls, user_a, user_b):
+        """Queryset for the friendship between two users, in either direction"""
+        user_a_id = getattr(user_a, 'pk', user_a)
+        user_b_id = getattr(user_b, 'pk', user_b)
+        user_low_id, user_high_id = cls.canonical_pair(user_a_id, user_b_id)
+        return cls.objects.filter(user_low_id=user_low_id, user_high_id=user_high_id)
+    
+    def other_user(self, user):
+        """The friend on the other side of this friendship"""
+        if self.from_user_id == user.pk:
+            return self.to_user
+        return self.from_user
+    
+    def relationship_for(self, user):
+        """'friend', 'pending_sent' or 'pending_received' as seen by user"""
+        if self.status == 'accepted':
+            return 'friend'
+        if self.status == 'pending':
+            return 'pending_sent' if self.from_user_id == user.pk else 'pending_received'
+        return 'none'
+    
+    def save(self, *args, **kwargs):
+        self.user_low_id, self.user_high_id = self.canonical_pair(self.from_user_id, self.to_user_id)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ({'from_user', 'to_user'} & set(update_fields)):
+            kwargs['update_fields'] = set(update_fields) | {'user_low', 'user_high'}
+        super().save(*args, **kwargs)
+
+class FriendSuggestion(models.Model):
+    """
+    Precomputed "people you may know" row for one user.
+    Maintained incrementally by the signal handlers below
+    (see services/suggestion_service.py); rebuild with
+    `manage.py rebuild_friend_suggestions`.
+    """
+    MUTUAL_FRIEND_WEIGHT = 3
+    SHARED_GROUP_WEIGHT = 2
+    
+    user = models.ForeignKey(User, related_name='friend_suggestions', on_delete=models.CASCADE)
+    suggested_user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    mutual_friends = models.IntegerField(default=0)
+    shared_groups = models.IntegerField(default=0)
+    score = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'suggested_user'], name='unique_friend_suggestion'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} -> {self.suggested_user_id} ({self.score})"
+
+
+# Keep FriendSuggestion in step with friendships and group memberships.
+# pre_save records the previous state (captured at load time, see
+# api/tracking.py) so post_save only reacts to real transitions.
+
+@receiver(pre_save, sender=FriendShip)
+def remember_friendship_status(sender, instance, update_fields=None, **kwargs):
+    instance._previous_status = previous_value(sender, instance, 'status', update_fields)
+
+@receiver(post_save, sender=FriendShip)
+def update_suggestions_for_friendship(sender, instance, **kwargs):
+    from .services.suggestion_service import SuggestionIndex
+    previous = getattr(instance, '_previous_status', None)
+    if previous is UNCHANGED:
+        return
+    was_accepted = previous == 'accepted'
+    is_accepted = instance.status == 'accepted'
+    if was_accepted != is_accepted:
+        SuggestionIndex().friendship_changed(instance.user_low_id, instance.user_high_id, 1 if is_accepted else -1)
+
+@receiver(post_delete, sender=FriendShip)
+def remove_suggestions_for_friendship(sender, instance, **kwargs):
+    from .services.suggestion_service import SuggestionIndex
+    if instance.status == 'accepted':
+        SuggestionIndex().friendship_changed(instance.user_low_id, instance.user_high_id, -1)
+
+@receiver(pre_save, sender='groups.GroupMembership')
+def remember_membership_state(sender, instance, update_fields=None, **kwargs):
+    instance._previous_is_active = previous_value(sender, instance, 'is_active', update_fields)
+
+@receiver(post_save, sender='groups.GroupMembership')
+def update_suggestions_for_membership(sender, instance, **kwargs):
+    from .services.suggestion_service import SuggestionIndex
+    previous = getattr(instance, '_previous_is_active', None)
+    if previous is UNCHANGED:
+        return
+    if bool(previous) != instance.is_active and instance.group.is_active:
+        SuggestionIndex().membership_changed(instance.group_id, instance.user_id, 1 if instance.is_active else -1)
+
+@receiver(post_delete, sender='groups.GroupMembership')
+def remove_suggestions_for_membership(sender, instance, **kwargs):
+    from groups.models import Group
+    from .services.suggestion_service import SuggestionIndex
+    if instance.is_active and Group.objects.filter(pk=instance.group_id, is_active=True).exists():
+        SuggestionIndex().membership_changed(instance.group_id, instance.user_id, -1)
+
+@receiver(pre_save, sender='groups.Group')
+def remember_group_state(sender, instance, update_fields=None, **kwargs):
+    instance._previous_is_active = previous_value(sender, instance, 'is_active', update_fields)
 
-# Create your models here.
+@receiver(post_save, sender='groups.Group')
+def update_suggestions_for_group(sender, instance, created, **kwargs):
+    from .services.suggestion_service import SuggestionIndex
+    previous = getattr(instance, '_previous_is_active', None)
+    if created or previous is UNCHANGED:
+        return
+    if bool(previous) != instance.is_active:
+        # Touches every pair of members, so it runs after the save commits
+        # instead of holding the request's transaction open
+        group_id, delta = instance.pk, 1 if instance.is_active else -1
+        transaction.on_commit(lambda: SuggestionIndex().group_changed(group_id, delta))
@@ -48,4 +48,12 @@ class CreateFriendshipSerializer(serializers.ModelSerializer):
             from_user=from_user,
             to_user=to_user,
             status='pending'
-        )
\ No newline at end of file
+        )
+
+class RelationshipQuerySerializer(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500
+    )
+    group_id = serializers.UUIDField(required=False)
@@ -0,0 +1,184 @@
+# friends/services/suggestion_service.py
+
+from itertools import islice
+import logging
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from ..models import FriendShip, FriendSuggestion
+
+logger = logging.getLogger(__name__)
+
+UPSERT_BATCH_SIZE = 1000
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def friend_ids(user_id):
+    """Ids of a user's accepted friends (one query over the canonical pair columns)"""
+    pairs = FriendShip.objects.filter(
+        Q(user_low_id=user_id) | Q(user_high_id=user_id),
+        status='accepted'
+    ).values_list('user_low_id', 'user_high_id')
+    return {high if low == user_id else low for low, high in pairs}
+
+class SuggestionIndex:
+    """
+    Incremental maintenance of the FriendSuggestion table.
+    
+    Every change is expressed as +/- deltas on directed (user, suggested_user)
+    rows and applied with INSERT ... ON CONFLICT DO UPDATE, so a friendship or
+    membership change only touches the rows it affects.
+    """
+    
+    def friendship_changed(self, user_a_id, user_b_id, delta):
+        """A friendship between two users was accepted (+1) or removed (-1)"""
+        friends_of_a = friend_ids(user_a_id) - {user_a_id, user_b_id}
+        friends_of_b = friend_ids(user_b_id) - {user_a_id, user_b_id}
+        
+        # b is now a mutual friend of a and each of b's friends, and vice versa
+        pairs = []
+        for friend_id in friends_of_b:
+            pairs.append((user_a_id, friend_id))
+            pairs.append((friend_id, user_a_id))
+        for friend_id in friends_of_a:
+            pairs.append((user_b_id, friend_id))
+            pairs.append((friend_id, user_b_id))
+        
+        self.apply(pairs, mutual_delta=delta)
+    
+    def membership_changed(self, group_id, user_id, delta):
+        """A user joined (+1) or left (-1) an active group"""
+        from groups.models import GroupMembership
+        
+        member_ids = GroupMembership.objects.filter(
+            group_id=group_id,
+            is_active=True
+        ).exclude(user_id=user_id).values_list('user_id', flat=True)
+        
+        pairs = []
+        for member_id in member_ids:
+            pairs.append((user_id, member_id))
+            pairs.append((member_id, user_id))
+        
+        self.apply(pairs, group_delta=delta)
+    
+    def group_changed(self, group_id, delta):
+        """A whole group was deactivated (-1) or reactivated (+1)"""
+        from groups.models import GroupMembership
+        
+        member_ids = list(GroupMembership.objects.filter(
+            group_id=group_id,
+            is_active=True
+        ).values_list('user_id', flat=True))
+        
+        pairs = (
+            (user_id, other_id)
+            for user_id in member_ids
+            for other_id in member_ids
+            if user_id != other_id
+        )
+        self.apply(pairs, group_delta=delta)
+    
+    def apply(self, pairs, mutual_delta=0, group_delta=0):
+        """Add deltas to (user_id, suggested_user_id) rows, creating or pruning them"""
+        table = connection.ops.quote_name(FriendSuggestion._meta.db_table)
+        score_delta = (
+            mutual_delta * FriendSuggestion.MUTUAL_FRIEND_WEIGHT +
+            group_delta * FriendSuggestion.SHARED_GROUP_WEIGHT
+        )
+        now = timezone.now()
+        touched = set()
+        
+        with transaction.atomic(), connection.cursor() as cursor:
+            for batch in _batched(pairs, UPSERT_BATCH_SIZE):
+                values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(batch))
+                params = []
+                for user_id, suggested_user_id in batch:
+                    params.extend([user_id, suggested_user_id, mutual_delta, group_delta, score_delta, now])
+                    touched.add(user_id)
+                
+                cursor.execute(
+                    f"INSERT INTO {table} "
+                    f"(user_id, suggested_user_id, mutual_friends, shared_groups, score, updated_at) "
+                    f"VALUES {values} "
+                    f"ON CONFLICT (user_id, suggested_user_id) DO UPDATE SET "
+                    f"mutual_friends = {table}.mutual_friends + EXCLUDED.mutual_friends, "
+                    f"shared_groups = {table}.shared_groups + EXCLUDED.shared_groups, "
+                    f"score = {table}.score + EXCLUDED.score, "
+                    f"updated_at = EXCLUDED.updated_at",
+                    params
+                )
+            
+            if touched and (mutual_delta < 0 or group_delta < 0):
+                for batch in _batched(touched, UPSERT_BATCH_SIZE):
+                    FriendSuggestion.objects.filter(
+                        user_id__in=batch,
+                        mutual_friends__lte=0,
+                        shared_groups__lte=0
+                    ).delete()
+    
+    def rebuild(self):
+        """Recompute the whole table from FriendShip and GroupMembership in SQL"""
+        from groups.models import Group, GroupMembership
+        
+        quote = connection.ops.quote_name
+        suggestions = quote(FriendSuggestion._meta.db_table)
+        friendships = quote(FriendShip._meta.db_table)
+        memberships = quote(GroupMembership._meta.db_table)
+        groups = quote(Group._meta.db_table)
+        
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {suggestions}")
+            cursor.execute(
+                f"""
+                WITH edges AS (
+                    SELECT user_low_id AS user_id, user_high_id AS friend_id
+                    FROM {friendships} WHERE status = %s
+                    UNION ALL
+                    SELECT user_high_id, user_low_id
+                    FROM {friendships} WHERE status = %s
+                ),
+                members AS (
+                    SELECT m.user_id, m.group_id
+                    FROM {memberships} m
+                    JOIN {groups} g ON g.id = m.group_id
+                    WHERE m.is_active = %s AND g.is_active = %s
+                ),
+                counts AS (
+                    SELECT e1.user_id, e2.friend_id AS suggested_user_id,
+                           COUNT(*) AS mutual_friends, 0 AS shared_groups
+                    FROM edges e1
+                    JOIN edges e2 ON e2.user_id = e1.friend_id
+                    WHERE e2.friend_id <> e1.user_id
+                    GROUP BY e1.user_id, e2.friend_id
+                    UNION ALL
+                    SELECT m1.user_id, m2.user_id, 0, COUNT(*)
+                    FROM members m1
+                    JOIN members m2 ON m2.group_id = m1.group_id AND m2.user_id <> m1.user_id
+                    GROUP BY m1.user_id, m2.user_id
+                )
+                INSERT INTO {suggestions}
+                    (user_id, suggested_user_id, mutual_friends, shared_groups, score, updated_at)
+                SELECT user_id, suggested_user_id,
+                       SUM(mutual_friends), SUM(shared_groups),
+                       SUM(mutual_friends) * %s + SUM(shared_groups) * %s, %s
+                FROM counts
+                GROUP BY user_id, suggested_user_id
+                """,
+                [
+                    'accepted', 'accepted', True, True,
+                    FriendSuggestion.MUTUAL_FRIEND_WEIGHT,
+                    FriendSuggestion.SHARED_GROUP_WEIGHT,
+                    timezone.now(),
+                ]
+            )
+        
+        count = FriendSuggestion.objects.count()
+        logger.info(f"Rebuilt friend suggestions: {count} rows")
+        return count
@@ -1,3 +1,265 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from groups.models import Group, GroupInvitation, GroupMembership
+from .models import FriendShip, FriendSuggestion
 
-# Create your tests here.
+User = get_user_model()
+
+class SuggestionSignalTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f"user{index}", f"user{index}@example.com") for index in range(3)]
+        self.group = Group.objects.create(name='Trip', owner=self.users[0])
+        for user in self.users:
+            GroupMembership.objects.create(group=self.group, user=user)
+    
+    def suggestion(self, user, suggested_user):
+        return FriendSuggestion.objects.filter(user=user, suggested_user=suggested_user).first()
+    
+    def assertNoRowReread(self, instance, save):
+        """save() must not SELECT the row back to find its previous state"""
+        quote = connection.ops.quote_name
+        table = quote(type(instance)._meta.db_table)
+        by_pk = f'FROM {table} WHERE {table}.{quote(type(instance)._meta.pk.column)} = '
+        with CaptureQueriesContext(connection) as captured:
+            save()
+        rereads = [
+            query['sql'] for query in captured.captured_queries
+            if query['sql'].startswith('SELECT') and by_pk in query['sql']
+        ]
+        self.assertEqual(rereads, [])
+    
+    def test_saving_loaded_rows_does_not_requery_previous_state(self):
+        group = Group.objects.get(pk=self.group.pk)
+        group.name = 'Renamed trip'
+        self.assertNoRowReread(group, group.save)
+        
+        membership = GroupMembership.objects.get(group=self.group, user=self.users[1])
+        self.assertNoRowReread(membership, lambda: membership.save(update_fields=['last_seen']))
+        
+        FriendShip.objects.create(from_user=self.users[1], to_user=self.users[2], status='accepted')
+        friendship = FriendShip.objects.create(from_user=self.users[0], to_user=self.users[1])
+        friendship = FriendShip.objects.get(pk=friendship.pk)
+        friendship.status = 'accepted'
+        self.assertNoRowReread(friendship, friendship.save)
+        # users[1] is now a mutual friend of users[0] and users[2]
+        self.assertEqual(self.suggestion(self.users[0], self.users[2]).mutual_friends, 1)
+    
+    def test_transitions_are_applied_once(self):
+        membership = GroupMembership.objects.get(group=self.group, user=self.users[2])
+        membership.is_active = False
+        membership.save()
+        membership.save()
+        
+        self.assertIsNone(self.suggestion(self.users[0], self.users[2]))
+        self.assertEqual(self.suggestion(self.users[0], self.users[1]).shared_groups, 1)
+    
+    def test_group_fan_out_runs_after_commit(self):
+        group = Group.objects.get(pk=self.group.pk)
+        group.is_active = False
+        
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            group.save()
+        self.assertEqual(self.suggestion(self.users[0], self.users[1]).shared_groups, 1)
+        
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(self.suggestion(self.users[0], self.users[1]))
+
+class RelationshipsTests(TestCase):
+    def setUp(self):
+        self.me, self.friend, self.sent, self.received, self.stranger = [
+            User.objects.create_user(f"person{index}", f"person{index}@example.com") for index in range(5)
+        ]
+        FriendShip.objects.create(from_user=self.friend, to_user=self.me, status='accepted')
+        self.sent_request = FriendShip.objects.create(from_user=self.me, to_user=self.sent)
+        self.received_request = FriendShip.objects.create(from_user=self.received, to_user=self.me)
+        
+        self.group = Group.objects.create(name='Trip', owner=self.me)
+        for user in (self.me, self.friend):
+            GroupMembership.objects.create(group=self.group, user=user)
+        GroupInvitation.objects.create(group=self.group, invited_by=self.me, invited_user=self.stranger)
+        
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+        self.url = reverse('relationships')
+    
+    def post(self, payload):
+        return self.client.post(self.url, payload, format='json')
+    
+    def test_status_per_user(self):
+        ids = [self.friend.id, self.sent.id, self.received.id, self.stranger.id, self.me.id, self.friend.id]
+        response = self.post({'user_ids': ids})
+        
+        self.assertEqual(response.status_code, 200)
+        by_user = {entry['user_id']: entry for entry in response.data}
+        self.assertEqual([entry['user_id'] for entry in response.data], ids[:5])
+        self.assertEqual(
+            {user_id: entry['status'] for user_id, entry in by_user.items()},
+            {
+                self.friend.id: 'friend',
+                self.sent.id: 'pending_sent',
+                self.received.id: 'pending_received',
+                self.stranger.id: 'none',
+                self.me.id: 'self',
+            }
+        )
+        self.assertEqual(by_user[self.sent.id]['request_id'], self.sent_request.id)
+        self.assertEqual(by_user[self.received.id]['request_id'], self.received_request.id)
+        self.assertIsNone(by_user[self.friend.id]['request_id'])
+        self.assertEqual(by_user[self.friend.id]['shared_groups'], 1)
+        self.assertEqual(by_user[self.stranger.id]['shared_groups'], 0)
+        self.assertNotIn('in_group', by_user[self.friend.id])
+    
+    def test_group_membership_and_invitations(self):
+        response = self.post({
+            'user_ids': [self.friend.id, self.stranger.id, self.sent.id],
+            'group_id': str(self.group.id),
+        })
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(entry['in_group'], entry['invited']) for entry in response.data],
+            [(True, False), (False, True), (False, False)]
+        )
+    
+    def test_query_count_does_not_grow_with_ids(self):
+        def queries_for(user_ids):
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.post({'user_ids': user_ids}).status_code, 200)
+            return len(captured.captured_queries)
+        
+        extra = [User.objects.create_user(f"extra{index}", f"extra{index}@example.com").id for index in range(20)]
+        self.assertEqual(queries_for([self.friend.id]), queries_for([self.friend.id, self.sent.id, *extra]))
+    
+    def test_invalid_input_is_rejected(self):
+        for payload in (
+            {},
+            {'user_ids': []},
+            {'user_ids': 'all'},
+            {'user_ids': ['abc']},
+            {'user_ids': [0]},
+            {'user_ids': [-3]},
+            {'user_ids': list(range(1, 502))},
+            {'user_ids': [self.friend.id], 'group_id': 'not-a-uuid'},
+        ):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.post(payload).status_code, 400)
+        
+        self.assertEqual(self.post({'user_ids': list(range(1, 501))}).status_code, 200)
+    
+    def test_group_must_be_mine(self):
+        other_group = Group.objects.create(name='Elsewhere', owner=self.stranger)
+        GroupMembership.objects.create(group=other_group, user=self.stranger)
+        
+        response = self.post({'user_ids': [self.stranger.id], 'group_id': str(other_group.id)})
+        self.assertEqual(response.status_code, 403)
+    
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertIn(self.post({'user_ids': [self.friend.id]}).status_code, (401, 403))
+
+class FriendsListTests(TestCase):
+    def setUp(self):
+        self.me = User.objects.create_user('me', 'me@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+        self.url = reverse('friends_list')
+    
+    def add_friends(self, count):
+        start = User.objects.count()
+        friends = [
+            User.objects.create_user(f"friend{index}", f"friend{index}@example.com")
+            for index in range(start, start + count)
+        ]
+        for index, friend in enumerate(friends):
+            # Both directions, so either side of the canonical pair can be me
+            if index % 2:
+                FriendShip.objects.create(from_user=self.me, to_user=friend, status='accepted')
+            else:
+                FriendShip.objects.create(from_user=friend, to_user=self.me, status='accepted')
+        return friends
+    
+    def queries_for(self, params=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(captured.captured_queries), response
+    
+    def test_lists_friends_from_either_side(self):
+        friends = self.add_friends(3)
+        stranger = User.objects.create_user('stranger', 'stranger@example.com')
+        FriendShip.objects.create(from_user=self.me, to_user=stranger)
+        
+        _, response = self.queries_for()
+        self.assertEqual({item['id'] for item in response.data}, {friend.id for friend in friends})
+    
+    def test_query_count_does_not_grow_with_friends(self):
+        self.add_friends(1)
+        few, _ = self.queries_for()
+        few_paged, _ = self.queries_for({'limit': 5})
+        self.add_friends(9)
+        many, response = self.queries_for()
+        many_paged, _ = self.queries_for({'limit': 5})
+        
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(few, 1)
+        self.assertEqual(many, 1)
+        # The page itself plus its COUNT
+        self.assertEqual(few_paged, 2)
+        self.assertEqual(many_paged, 2)
+    
+    def test_pages_cover_every_friend_once(self):
+        friends = self.add_friends(7)
+        seen = []
+        for offset in range(0, 9, 3):
+            _, response = self.queries_for({'limit': 3, 'offset': offset})
+            self.assertEqual(response.data['count'], 7)
+            seen += [item['id'] for item in response.data['results']]
+        
+        self.assertEqual(sorted(seen), sorted(friend.id for friend in friends))
+        self.assertEqual(len(seen), len(set(seen)))
+
+class FriendRequestUniquenessTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@example.com')
+        self.bob = User.objects.create_user('bob', 'bob@example.com')
+        self.client = APIClient()
+        self.url = reverse('send_friend_request')
+    
+    def send(self, from_user, to_user):
+        self.client.force_authenticate(from_user)
+        return self.client.post(self.url, {'to_user_id': to_user.id}, format='json')
+    
+    def test_pair_is_stored_in_canonical_order(self):
+        friendship = FriendShip.objects.create(from_user=self.bob, to_user=self.alice)
+        
+        low, high = sorted([self.alice.id, self.bob.id])
+        self.assertEqual((friendship.user_low_id, friendship.user_high_id), (low, high))
+        self.assertEqual(FriendShip.between(self.alice, self.bob).get(), friendship)
+        self.assertEqual(FriendShip.between(self.bob, self.alice).get(), friendship)
+    
+    def test_reverse_request_is_refused(self):
+        self.assertEqual(self.send(self.alice, self.bob).status_code, 201)
+        
+        response = self.send(self.bob, self.alice)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Friend request already sent')
+        self.assertEqual(FriendShip.objects.count(), 1)
+    
+    def test_reverse_duplicate_row_violates_constraint(self):
+        FriendShip.objects.create(from_user=self.alice, to_user=self.bob)
+        
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FriendShip.objects.create(from_user=self.bob, to_user=self.alice)
+        self.assertEqual(FriendShip.objects.count(), 1)
+    
+    def test_request_to_existing_friend_is_refused(self):
+        FriendShip.objects.create(from_user=self.bob, to_user=self.alice, status='accepted')
+        
+        response = self.send(self.alice, self.bob)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Already friends')
@@ -9,4 +9,6 @@ urlpatterns = [
     path('pending/', views.pending_requests, name='pending_requests'),
     path('list/', views.friends_list, name='friends_list'),
     path('remove/<int:user_id>/', views.remove_friend, name='remove_friend'),
+    path('relationships/', views.relationships, name='relationships'),
+    path('suggestions/', views.friend_suggestions, name='friend_suggestions'),
 ]
\ No newline at end of file
@@ -4,14 +4,25 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
-from django.db.models import Q
-from .models import FriendShip
-from .serializers import FriendShipSerializer, CreateFriendshipSerializer, UserSerializer
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Count, Exists, OuterRef, Value
+from django.db.models.functions import Greatest, Least
+from rest_framework.pagination import LimitOffsetPagination
+from api.idempotency import idempotent
+from .models import FriendShip, FriendSuggestion
+from .serializers import (
+    FriendShipSerializer, CreateFriendshipSerializer, UserSerializer, RelationshipQuerySerializer
+)
 
 User = get_user_model()
 
+class FriendsPagination(LimitOffsetPagination):
+    """Opt-in: responses are only paginated when ?limit= is given"""
+    max_limit = 200
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def send_friend_request(request):
     """Send a friend request to another user"""
     to_user_id = request.data.get('to_user_id')
@@ -33,10 +44,7 @@ def send_friend_request(request):
                       status=status.HTTP_400_BAD_REQUEST)
     
     # Check if friendship already exists
-    existing = FriendShip.objects.filter(
-        Q(from_user=from_user, to_user=to_user) | 
-        Q(from_user=to_user, to_user=from_user)
-    ).first()
+    existing = FriendShip.between(from_user, to_user).first()
     
     if existing:
         if existing.status == 'accepted':
@@ -57,21 +65,27 @@ def send_friend_request(request):
     
     # Create new friendship if none exists
     try:
-        friendship = FriendShip.objects.create(
-            from_user=from_user,
-            to_user=to_user,
-            status='pending'
-        )
+        # Savepoint, so a lost race leaves any enclosing transaction usable
+        with transaction.atomic():
+            friendship = FriendShip.objects.create(
+                from_user=from_user,
+                to_user=to_user,
+                status='pending'
+            )
         
         response_serializer = FriendShipSerializer(friendship)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-        
+    
+    except IntegrityError:
+        # The other user sent a request at the same moment
+        return Response({'error': 'Friend request already sent'}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': 'Failed to create friend request'}, 
                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def accept_friend_request(request, request_id):
     """Accept a friend request"""
     try:
@@ -86,13 +100,14 @@ def accept_friend_request(request, request_id):
         
         serializer = FriendShipSerializer(friendship)
         return Response(serializer.data)
-        
+    
     except FriendShip.DoesNotExist:
         return Response({'error': 'Friend request not found'}, 
                        status=status.HTTP_404_NOT_FOUND)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def reject_friend_request(request, request_id):
     """Reject a friend request"""
     try:
@@ -110,20 +125,19 @@ def reject_friend_request(request, request_id):
         # Option 2: Delete the request entirely (recommended)
         friendship.delete()
         return Response({'message': 'Friend request rejected'})
-        
+    
     except FriendShip.DoesNotExist:
         return Response({'error': 'Friend request not found'}, 
                        status=status.HTTP_404_NOT_FOUND)
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def remove_friend(request, user_id):
     """Remove a friend (unfriend)"""
     try:
         # Find the friendship between current user and the specified user
-        friendship = FriendShip.objects.filter(
-            Q(from_user=request.user, to_user_id=user_id) | 
-            Q(from_user_id=user_id, to_user=request.user),
+        friendship = FriendShip.between(request.user, user_id).filter(
             status='accepted'
         ).first()
         
@@ -136,7 +150,7 @@ def remove_friend(request, user_id):
         
         return Response({'message': 'Friend removed successfully'}, 
                        status=status.HTTP_200_OK)
-        
+    
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, 
                        status=status.HTTP_404_NOT_FOUND)
@@ -151,7 +165,7 @@ def pending_requests(request):
     requests = FriendShip.objects.filter(
         to_user=request.user, 
         status='pending'
-    )
+    ).select_related('from_user__profile', 'to_user__profile')
     
     serializer = FriendShipSerializer(requests, many=True)
     return Response(serializer.data)
@@ -159,19 +173,137 @@ def pending_requests(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def friends_list(request):
-    """Get all friends of the current user"""
+    """
+    Get all friends of the current user.
+    Pass ?limit=&offset= for a paginated response.
+    """
     friendships = FriendShip.objects.filter(
-        Q(from_user=request.user) | Q(to_user=request.user),
+        Q(user_low=request.user) | Q(user_high=request.user),
         status='accepted'
+    ).select_related(
+        'from_user__profile', 'to_user__profile'
+    ).order_by('id')
+    
+    paginator = FriendsPagination()
+    page = paginator.paginate_queryset(friendships, request)
+    
+    if page is not None:
+        friends = [friendship.other_user(request.user) for friendship in page]
+        serializer = UserSerializer(friends, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    friends = [friendship.other_user(request.user) for friendship in friendships]
+    serializer = UserSerializer(friends, many=True)
+    return Response(serializer.data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def relationships(request):
+    """
+    Relationship of the current user to up to 500 users at once.
+    Optional group_id also reports membership/invitation for that group.
+    Uses a fixed number of queries regardless of how many ids are sent.
+    """
+    from groups.models import GroupMembership, GroupInvitation
+    
+    serializer = RelationshipQuerySerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    me = request.user
+    user_ids = list(dict.fromkeys(serializer.validated_data['user_ids']))
+    group_id = serializer.validated_data.get('group_id')
+    
+    if group_id and not GroupMembership.objects.filter(
+        group_id=group_id, user=me, is_active=True, group__is_active=True
+    ).exists():
+        return Response({'error': 'You are not a member of this group'}, 
+                       status=status.HTTP_403_FORBIDDEN)
+    
+    # Friendships: the canonical pair puts me on either side
+    friendships = {}
+    for friendship in FriendShip.objects.filter(
+        Q(user_low=me, user_high_id__in=user_ids) | Q(user_high=me, user_low_id__in=user_ids),
+        status__in=['pending', 'accepted']
+    ).only('id', 'from_user_id', 'to_user_id', 'status'):
+        other_id = friendship.to_user_id if friendship.from_user_id == me.id else friendship.from_user_id
+        friendships[other_id] = friendship
+    
+    # Active groups each user shares with me, counted in one grouped query
+    my_groups = GroupMembership.objects.filter(
+        user=me, is_active=True, group__is_active=True
+    ).values('group_id')
+    shared_groups = dict(
+        GroupMembership.objects.filter(
+            user_id__in=user_ids, is_active=True, group_id__in=my_groups
+        ).values('user_id').annotate(count=Count('id')).values_list('user_id', 'count')
     )
     
-    # Extract the friend users
-    friends = []
-    for friendship in friendships:
-        if friendship.from_user == request.user:
-            friends.append(friendship.to_user)
+    group_members = set()
+    invited = set()
+    if group_id:
+        group_members = set(GroupMembership.objects.filter(
+            group_id=group_id, user_id__in=user_ids, is_active=True
+        ).values_list('user_id', flat=True))
+        invited = set(GroupInvitation.objects.filter(
+            group_id=group_id, invited_user_id__in=user_ids, status='pending'
+        ).values_list('invited_user_id', flat=True))
+    
+    results = []
+    for user_id in user_ids:
+        friendship = friendships.get(user_id)
+        if user_id == me.id:
+            relationship = 'self'
+        elif friendship is None:
+            relationship = 'none'
         else:
-            friends.append(friendship.from_user)
+            relationship = friendship.relationship_for(me)
+        
+        entry = {
+            'user_id': user_id,
+            'status': relationship,
+            'request_id': friendship.id if friendship and friendship.status == 'pending' else None,
+            'shared_groups': shared_groups.get(user_id, 0),
+        }
+        if group_id:
+            entry['in_group'] = user_id in group_members
+            entry['invited'] = user_id in invited
+        results.append(entry)
     
-    serializer = UserSerializer(friends, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(results)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def friend_suggestions(request):
+    """
+    People you may know, ranked by mutual friends and shared groups.
+    Read straight from the precomputed suggestion table.
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Skip anyone already a friend or with a request in flight
+    existing = FriendShip.objects.filter(
+        user_low_id=Least(Value(request.user.id), OuterRef('suggested_user_id')),
+        user_high_id=Greatest(Value(request.user.id), OuterRef('suggested_user_id')),
+        status__in=['pending', 'accepted']
+    )
+    
+    suggestions = FriendSuggestion.objects.filter(
+        user=request.user,
+        score__gt=0
+    ).exclude(
+        Exists(existing)
+    ).select_related('suggested_user__profile').order_by('-score')[:limit]
+    
+    return Response([
+        {
+            'user': UserSerializer(suggestion.suggested_user).data,
+            'mutual_friends': suggestion.mutual_friends,
+            'shared_groups': suggestion.shared_groups,
+            'score': suggestion.score,
+        }
+        for suggestion in suggestions
+    ])
@@ -1,6 +1,9 @@
 # groups/admin.py
 from django.contrib import admin
-from .models import Group, GroupMembership, GroupInvitation, LocationShare
+from .models import (
+    Group, GroupMembership, GroupInvitation, LocationShare, LatestLocation,
+    Geofence, GeofencePresence
+)
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -77,4 +80,24 @@ class LocationShareAdmin(admin.ModelAdmin):
             'fields': ('id',),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(LatestLocation)
+class LatestLocationAdmin(admin.ModelAdmin):
+    list_display = ['membership', 'group', 'latitude', 'longitude', 'timestamp', 'battery_level']
+    list_filter = ['timestamp']
+    search_fields = ['membership__user__username', 'group__name']
+    readonly_fields = ['updated_at']
+
+@admin.register(Geofence)
+class GeofenceAdmin(admin.ModelAdmin):
+    list_display = ['name', 'group', 'radius_meters', 'created_by', 'created_at', 'is_active']
+    list_filter = ['is_active', 'created_at']
+    search_fields = ['name', 'group__name']
+    readonly_fields = ['id', 'created_at']
+
+@admin.register(GeofencePresence)
+class GeofencePresenceAdmin(admin.ModelAdmin):
+    list_display = ['geofence', 'membership', 'is_inside', 'changed_at']
+    list_filter = ['is_inside']
+    search_fields = ['geofence__name', 'membership__user__username']
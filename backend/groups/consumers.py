@@ -0,0 +1,132 @@
+# groups/consumers.py
+import json
+import logging
+from urllib.parse import parse_qs
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.exceptions import TokenError
+from .models import GroupMembership
+from .serializers import LocationBatchSerializer
+from .services.location_service import LocationIngestService, location_channel_name
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+class GroupLocationConsumer(AsyncWebsocketConsumer):
+    """
+    Live location channel for one group.
+    
+    Clients send {"action": "fixes", "fixes": [...]} (batched, possibly from
+    an offline buffer) and receive other members' latest positions as
+    {"type": "location_update", ...} while their own sharing is enabled.
+    """
+    
+    async def connect(self):
+        self.group_id = self.scope['url_route']['kwargs']['group_id']
+        self.user = await self.authenticate()
+        self.membership = await self.get_membership() if self.user else None
+        
+        if self.membership is None:
+            await self.close()
+            return
+        
+        self.room_group_name = location_channel_name(self.group_id, self.user.id)
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+        
+        await self.accept()
+        logger.info(f"User {self.user.id} connected to locations for group {self.group_id}")
+    
+    async def disconnect(self, close_code):
+        if getattr(self, 'room_group_name', None):
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
+            )
+    
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+            action = data.get('action')
+            
+            if action == 'fixes':
+                result = await self.ingest(data)
+                await self.send(text_data=json.dumps(result))
+            elif action == 'ping':
+                await self.send(text_data=json.dumps({'type': 'pong'}))
+                
+        except Exception as e:
+            logger.exception(f"Error in location receive for user {self.user.id}: {str(e)}")
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Invalid request'
+            }))
+    
+    async def location_update(self, event):
+        message = {k: v for k, v in event.items() if k != 'type'}
+        message['type'] = 'location_update'
+        await self.send(text_data=json.dumps(message))
+    
+    async def geofence_event(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'geofence_event',
+            'group_id': event['group_id'],
+            'events': event['events'],
+        }))
+    
+    async def authenticate(self):
+        """Use the session user, or a JWT passed as ?token=<access token>"""
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            return user
+        
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        token = query.get('token', [None])[0]
+        if not token:
+            return None
+        
+        try:
+            user_id = AccessToken(token)['user_id']
+        except (TokenError, KeyError):
+            return None
+        
+        return await self.get_user(user_id)
+    
+    @database_sync_to_async
+    def get_user(self, user_id):
+        return User.objects.filter(id=user_id, is_active=True).first()
+    
+    @database_sync_to_async
+    def get_membership(self):
+        return GroupMembership.objects.filter(
+            group_id=self.group_id,
+            group__is_active=True,
+            user=self.user,
+            is_active=True
+        ).first()
+    
+    @database_sync_to_async
+    def ingest(self, data):
+        serializer = LocationBatchSerializer(data={'fixes': data.get('fixes', [])})
+        if not serializer.is_valid():
+            return {'type': 'error', 'errors': serializer.errors}
+        
+        # Re-read so visibility changes made over HTTP are respected
+        self.membership.refresh_from_db(fields=['is_location_visible', 'is_active'])
+        if not self.membership.is_active:
+            return {'type': 'error', 'message': 'No longer a member of this group'}
+        
+        result = LocationIngestService(self.membership).ingest(serializer.validated_data['fixes'])
+        latest = result['latest']
+        
+        return {
+            'type': 'ack',
+            'accepted': result['accepted'],
+            'dropped': result['dropped'],
+            'latest_timestamp': latest.timestamp.isoformat() if latest else None,
+            'geofence_events': result['geofence_events'],
+        }
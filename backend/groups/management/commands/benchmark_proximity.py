@@ -0,0 +1,88 @@
+import math
+import random
+import time
+from types import SimpleNamespace
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from groups.services.location_service import haversine_meters
+from groups.services.proximity_service import LiveGrid, geofence_contains
+
+class Command(BaseCommand):
+    help = "Benchmark grid kNN and geofence checks against brute force on synthetic positions"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=10000, help="Number of live positions")
+        parser.add_argument('--queries', type=int, default=200, help="Number of kNN queries")
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--geofences', type=int, default=50)
+        parser.add_argument('--spread', type=float, default=0.5, help="Spread of positions in degrees")
+        parser.add_argument('--seed', type=int, default=42)
+    
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        spread = options['spread']
+        k = options['k']
+        center = (10.7769, 106.7009)
+        
+        def random_point():
+            return (
+                center[0] + rng.uniform(-spread, spread),
+                center[1] + rng.uniform(-spread, spread),
+            )
+        
+        positions = {index: random_point() for index in range(options['points'])}
+        
+        grid = LiveGrid()
+        start = time.perf_counter()
+        for key, (lat, lon) in positions.items():
+            grid.update(key, lat, lon)
+        load_ms = (time.perf_counter() - start) * 1000
+        
+        queries = [random_point() for _ in range(options['queries'])]
+        
+        start = time.perf_counter()
+        grid_results = [grid.nearest(lat, lon, k) for lat, lon in queries]
+        grid_ms = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        brute_results = [
+            sorted(
+                (haversine_meters(lat, lon, plat, plon), key)
+                for key, (plat, plon) in positions.items()
+            )[:k]
+            for lat, lon in queries
+        ]
+        brute_ms = (time.perf_counter() - start) * 1000
+        
+        mismatches = sum(
+            1 for fast, slow in zip(grid_results, brute_results)
+            if any(not math.isclose(a[0], b[0]) for a, b in zip(fast, slow)) or len(fast) != len(slow)
+        )
+        
+        geofences = [
+            SimpleNamespace(latitude=lat, longitude=lon, radius_meters=rng.uniform(100, 2000))
+            for lat, lon in (random_point() for _ in range(options['geofences']))
+        ]
+        fixes = [
+            SimpleNamespace(latitude=lat, longitude=lon, timestamp=timezone.now())
+            for lat, lon in (random_point() for _ in range(options['queries']))
+        ]
+        
+        start = time.perf_counter()
+        inside = sum(
+            1 for fix in fixes for geofence in geofences
+            if geofence_contains(geofence, fix.latitude, fix.longitude)
+        )
+        geofence_ms = (time.perf_counter() - start) * 1000
+        
+        queries_count = len(queries)
+        checks = len(fixes) * len(geofences)
+        self.stdout.write(f"Loaded {len(positions)} positions into grid in {load_ms:.1f} ms")
+        self.stdout.write(f"Grid kNN (k={k}):   {grid_ms / queries_count:.3f} ms/query")
+        self.stdout.write(f"Brute force kNN:   {brute_ms / queries_count:.3f} ms/query")
+        self.stdout.write(f"Geofence checks:   {checks} in {geofence_ms:.1f} ms ({inside} inside)")
+        
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"{mismatches} kNN results differ from brute force"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Grid kNN matches brute force on all queries"))
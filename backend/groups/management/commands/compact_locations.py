@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from groups.services.location_retention import LocationCompactor
+from .location_storage_report import write_storage_report
+
+class Command(BaseCommand):
+    help = "Downsample old location history and delete fixes past the retention horizon"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--full-resolution-days', type=int, help="Keep every fix newer than this")
+        parser.add_argument('--retention-days', type=int, help="Delete fixes older than this")
+        parser.add_argument('--tolerance', type=float, help="Douglas-Peucker tolerance in meters")
+        parser.add_argument('--batch-size', type=int, help="Rows per delete statement")
+        parser.add_argument('--no-report', action='store_true', help="Skip the before/after storage report")
+    
+    def handle(self, *args, **options):
+        compactor = LocationCompactor(
+            full_resolution_days=options['full_resolution_days'],
+            retention_days=options['retention_days'],
+            tolerance_meters=options['tolerance'],
+            batch_size=options['batch_size'],
+        )
+        
+        if not options['no_report']:
+            write_storage_report(self.stdout, "Before compaction")
+        
+        result = compactor.run()
+        
+        if not options['no_report']:
+            write_storage_report(self.stdout, "After compaction")
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {result['downsampled']} redundant and {result['purged']} expired location fixes"
+        ))
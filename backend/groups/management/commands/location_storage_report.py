@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from groups.services.location_retention import location_storage_report
+
+def write_storage_report(stdout, title):
+    """Print a per-group rows/bytes table for location history"""
+    report = location_storage_report()
+    stdout.write(title)
+    stdout.write(f"{'Group':<40} {'Rows':>12} {'Bytes':>14}")
+    
+    total_rows = total_bytes = 0
+    for row in report:
+        name = f"{row['group_name']} ({row['group_id'][:8]})"
+        stdout.write(f"{name:<40} {row['rows']:>12} {row['bytes']:>14}")
+        total_rows += row['rows']
+        total_bytes += row['bytes']
+    
+    stdout.write(f"{'Total':<40} {total_rows:>12} {total_bytes:>14}")
+    return report
+
+class Command(BaseCommand):
+    help = "Show location history rows and bytes per group"
+    
+    def handle(self, *args, **options):
+        write_storage_report(self.stdout, "Location history storage")
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_latest_locations(apps, schema_editor):
+    LocationShare = apps.get_model('groups', 'LocationShare')
+    LatestLocation = apps.get_model('groups', 'LatestLocation')
+    
+    latest = {}
+    for share in LocationShare.objects.select_related('membership').order_by('membership_id', 'timestamp').iterator():
+        latest[share.membership_id] = share
+    
+    LatestLocation.objects.bulk_create([
+        LatestLocation(
+            membership_id=share.membership_id,
+            group_id=share.membership.group_id,
+            latitude=share.latitude,
+            longitude=share.longitude,
+            accuracy=share.accuracy,
+            battery_level=share.battery_level,
+            timestamp=share.timestamp,
+        )
+        for share in latest.values()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0002_locationshare_device_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestLocation',
+            fields=[
+                ('membership', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_location', serialize=False, to='groups.groupmembership')),
+                ('latitude', models.DecimalField(decimal_places=8, max_digits=10)),
+                ('longitude', models.DecimalField(decimal_places=8, max_digits=11)),
+                ('accuracy', models.FloatField(blank=True, null=True)),
+                ('battery_level', models.IntegerField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='locationshare',
+            index=models.Index(fields=['membership', '-timestamp'], name='groups_loca_members_4149e5_idx'),
+        ),
+        migrations.AddField(
+            model_name='latestlocation',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='latest_locations', to='groups.group'),
+        ),
+        migrations.AddIndex(
+            model_name='latestlocation',
+            index=models.Index(fields=['group', '-timestamp'], name='groups_late_group_i_89ee24_idx'),
+        ),
+        migrations.RunPython(backfill_latest_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0003_latestlocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationCompactionState',
+            fields=[
+                ('membership', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='location_compaction', serialize=False, to='groups.groupmembership')),
+                ('compacted_until', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='locationshare',
+            index=models.Index(fields=['timestamp'], name='groups_loca_timesta_e0c15d_idx'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:22
+
+import django.db.models.deletion
+import math
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_grid_cells(apps, schema_editor):
+    LatestLocation = apps.get_model('groups', 'LatestLocation')
+    
+    # Must match proximity_service.GRID_CELL_DEGREES
+    cell_degrees = 0.01
+    locations = list(LatestLocation.objects.all())
+    for location in locations:
+        location.cell_x = math.floor(float(location.longitude) / cell_degrees)
+        location.cell_y = math.floor(float(location.latitude) / cell_degrees)
+    
+    LatestLocation.objects.bulk_update(locations, ['cell_x', 'cell_y'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0004_location_retention'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Geofence',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('latitude', models.DecimalField(decimal_places=8, max_digits=10)),
+                ('longitude', models.DecimalField(decimal_places=8, max_digits=11)),
+                ('radius_meters', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GeofencePresence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_inside', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='latestlocation',
+            name='cell_x',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='latestlocation',
+            name='cell_y',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='latestlocation',
+            index=models.Index(fields=['group', 'cell_y', 'cell_x'], name='groups_late_group_i_4a811d_idx'),
+        ),
+        migrations.AddField(
+            model_name='geofence',
+            name='created_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_geofences', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='geofence',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geofences', to='groups.group'),
+        ),
+        migrations.AddField(
+            model_name='geofencepresence',
+            name='geofence',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presences', to='groups.geofence'),
+        ),
+        migrations.AddField(
+            model_name='geofencepresence',
+            name='membership',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geofence_presences', to='groups.groupmembership'),
+        ),
+        migrations.AddIndex(
+            model_name='geofence',
+            index=models.Index(fields=['group', 'is_active'], name='groups_geof_group_i_42e396_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geofencepresence',
+            index=models.Index(fields=['geofence', 'is_inside'], name='groups_geof_geofenc_73d97e_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='geofencepresence',
+            unique_together={('geofence', 'membership')},
+        ),
+        migrations.RunPython(backfill_grid_cells, migrations.RunPython.noop),
+    ]
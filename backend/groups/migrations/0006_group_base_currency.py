@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0005_proximity_geofences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='base_currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+    ]
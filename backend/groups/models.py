@@ -1,23 +1,29 @@
 # groups/models.py
 from django.db import models
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from api.tracking import TrackLoadedFields, UNCHANGED, previous_value
 import uuid
 
 User = get_user_model()
 
-class Group(models.Model):
+class Group(TrackLoadedFields, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_groups')
+    # Balances across currencies are converted to this (see expense/services/fx_service.py)
+    base_currency = models.CharField(max_length=3, default='USD')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    tracked_fields = ('is_active',)  # For friend suggestion upkeep (friends/models.py)
     
     class Meta:
         ordering = ['-created_at']
-        
+    
     def __str__(self):
         return f"{self.name} (Owner: {self.owner.username})"
     
@@ -33,7 +39,7 @@ class Group(models.Model):
             return latest_membership.joined_at
         return self.created_at
 
-class GroupMembership(models.Model):
+class GroupMembership(TrackLoadedFields, models.Model):
     ROLE_CHOICES = [
         ('owner', 'Owner'),
         ('member', 'Member'),
@@ -47,6 +53,8 @@ class GroupMembership(models.Model):
     is_active = models.BooleanField(default=True)
     is_location_visible = models.BooleanField(default=True)
     last_seen = models.DateTimeField(null=True, blank=True)
+    # For friend suggestion upkeep (friends/models.py) and the live proximity grid
+    tracked_fields = ('is_active', 'is_location_visible')
     
     class Meta:
         unique_together = ['group', 'user']
@@ -101,11 +109,146 @@ class LocationShare(models.Model):
     latitude = models.DecimalField(max_digits=10, decimal_places=8)
     longitude = models.DecimalField(max_digits=11, decimal_places=8)
     accuracy = models.FloatField(null=True, blank=True)  # GPS accuracy in meters
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)  # Device fix time (batches arrive late)
     battery_level = models.IntegerField(null=True, blank=True)  # 0-100
     
     class Meta:
         ordering = ['-timestamp']
-        
+        indexes = [
+            models.Index(fields=['membership', '-timestamp']),
+            models.Index(fields=['timestamp']),  # Retention deletes
+        ]
+    
     def __str__(self):
-        return f"Location for {self.membership.user.username} in {self.membership.group.name}"
\ No newline at end of file
+        return f"Location for {self.membership.user.username} in {self.membership.group.name}"
+
+class LatestLocation(models.Model):
+    """Most recent accepted fix per membership, maintained on ingest"""
+    membership = models.OneToOneField(
+        GroupMembership,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='latest_location'
+    )
+    # Denormalized so a group map is a single indexed lookup
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='latest_locations')
+    latitude = models.DecimalField(max_digits=10, decimal_places=8)
+    longitude = models.DecimalField(max_digits=11, decimal_places=8)
+    accuracy = models.FloatField(null=True, blank=True)
+    battery_level = models.IntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField()
+    # Fixed-size grid cell (see groups.services.proximity_service.GRID_CELL_DEGREES)
+    cell_x = models.IntegerField(default=0)
+    cell_y = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', '-timestamp']),
+            models.Index(fields=['group', 'cell_y', 'cell_x']),  # Proximity queries
+        ]
+    
+    def __str__(self):
+        return f"Latest location for membership {self.membership_id}"
+
+class LocationCompactionState(models.Model):
+    """How far a membership's location history has been downsampled"""
+    membership = models.OneToOneField(
+        GroupMembership,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='location_compaction'
+    )
+    compacted_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Compacted membership {self.membership_id} until {self.compacted_until}"
+
+
+class Geofence(models.Model):
+    """A circular area members can arrive at or leave (e.g. the hotel)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='geofences')
+    name = models.CharField(max_length=100)
+    latitude = models.DecimalField(max_digits=10, decimal_places=8)
+    longitude = models.DecimalField(max_digits=11, decimal_places=8)
+    radius_meters = models.FloatField()
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_geofences')
+    created_at = models.DateTimeField(auto_now_add=True)
+    is_active = models.BooleanField(default=True)
+    
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['group', 'is_active']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.radius_meters:.0f} m) in {self.group.name}"
+
+class GeofencePresence(models.Model):
+    """Whether a member is currently inside a geofence"""
+    geofence = models.ForeignKey(Geofence, on_delete=models.CASCADE, related_name='presences')
+    membership = models.ForeignKey(GroupMembership, on_delete=models.CASCADE, related_name='geofence_presences')
+    is_inside = models.BooleanField(default=False)
+    changed_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['geofence', 'membership']
+        indexes = [
+            models.Index(fields=['geofence', 'is_inside']),
+        ]
+    
+    def __str__(self):
+        state = 'inside' if self.is_inside else 'outside'
+        return f"Membership {self.membership_id} {state} {self.geofence.name}"
+
+
+# Invalidate cached dashboards (services/dashboard_service.py) when a group,
+# its memberships or its expenses change
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_dashboards_for_group(sender, instance, **kwargs):
+    from .services.dashboard_service import bump_group_dashboards
+    bump_group_dashboards(instance.pk)
+
+@receiver([post_save, post_delete], sender=GroupMembership)
+def invalidate_dashboards_for_membership(sender, instance, **kwargs):
+    from .services.dashboard_service import bump_group_dashboards
+    bump_group_dashboards(instance.group_id, extra_user_ids=[instance.user_id])
+
+@receiver([post_save, post_delete], sender='expense.Expense')
+def invalidate_dashboards_for_expense(sender, instance, **kwargs):
+    from .services.dashboard_service import bump_group_dashboards
+    bump_group_dashboards(instance.group_id)
+
+@receiver([post_save, post_delete], sender='expense.ExpenseParticipant')
+def invalidate_dashboards_for_participant(sender, instance, **kwargs):
+    from .services.dashboard_service import bump_dashboard_versions
+    bump_dashboard_versions([instance.user_id])
+
+# Members who stop sharing, leave or are removed must drop out of the cached
+# proximity grid (services/proximity_service.py) right away, not after its TTL
+
+@receiver(pre_save, sender=GroupMembership)
+def remember_location_visibility(sender, instance, update_fields=None, **kwargs):
+    instance._previous_visibility = (
+        previous_value(sender, instance, 'is_active', update_fields),
+        previous_value(sender, instance, 'is_location_visible', update_fields),
+    )
+
+@receiver(post_save, sender=GroupMembership)
+def refresh_live_grid_for_membership(sender, instance, created, **kwargs):
+    from .services.proximity_service import forget_live_grid
+    previous = getattr(instance, '_previous_visibility', (UNCHANGED, UNCHANGED))
+    current = (instance.is_active, instance.is_location_visible)
+    if not created and any(
+        before is not UNCHANGED and before != after for before, after in zip(previous, current)
+    ):
+        forget_live_grid(instance.group_id)
+
+@receiver(post_delete, sender=GroupMembership)
+def refresh_live_grid_for_deleted_membership(sender, instance, **kwargs):
+    from .services.proximity_service import forget_live_grid
+    forget_live_grid(instance.group_id)
@@ -0,0 +1,7 @@
+from django.urls import re_path
+from . import consumers
+
+# Define WebSocket URL patterns
+websocket_urlpatterns = [
+    re_path(r'ws/groups/(?P<group_id>[0-9a-f-]+)/locations/$', consumers.GroupLocationConsumer.as_asgi()),
+]
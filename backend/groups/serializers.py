@@ -2,10 +2,19 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from .models import Group, GroupMembership, GroupInvitation, LocationShare
+from django.conf import settings
+from .models import (
+    Group, GroupMembership, GroupInvitation, LocationShare, LatestLocation, Geofence
+)
 
 User = get_user_model()
 
+def validate_currency_code(value):
+    value = value.upper()
+    if len(value) != 3 or not value.isalpha():
+        raise serializers.ValidationError("Currency must be a 3-letter code (e.g., USD)")
+    return value
+
 class UserSerializer(serializers.ModelSerializer):
     avatar = serializers.SerializerMethodField()
     
@@ -37,42 +46,56 @@ class GroupMemberSerializer(serializers.ModelSerializer):
 
 class GroupSerializer(serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
-    member_count = serializers.ReadOnlyField()
-    last_activity = serializers.ReadOnlyField()
+    member_count = serializers.SerializerMethodField()
+    last_activity = serializers.SerializerMethodField()
     is_owner = serializers.SerializerMethodField()
     members = serializers.SerializerMethodField()
     
     class Meta:
         model = Group
         fields = [
-            'id', 'name', 'description', 'owner', 'created_at', 
+            'id', 'name', 'description', 'base_currency', 'owner', 'created_at', 
             'updated_at', 'member_count', 'last_activity', 'is_owner', 'members'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'owner']
     
+    def get_member_count(self, obj):
+        # Annotated by utils.with_group_stats; fall back to the model property
+        if hasattr(obj, 'annotated_member_count'):
+            return obj.annotated_member_count
+        return obj.member_count
+    
+    def get_last_activity(self, obj):
+        if hasattr(obj, 'annotated_last_activity'):
+            return obj.annotated_last_activity
+        return obj.last_activity
+    
     def get_is_owner(self, obj):
         request = self.context.get('request')
         if request and request.user:
-            return obj.owner == request.user
+            return obj.owner_id == request.user.id
         return False
     
     def get_members(self, obj):
         # Only include members in detailed view
         if self.context.get('include_members', False):
-            memberships = obj.memberships.filter(is_active=True).select_related('user')
+            memberships = obj.memberships.filter(is_active=True).select_related('user__profile')
             return GroupMemberSerializer(memberships, many=True).data
         return None
 
 class CreateGroupSerializer(serializers.ModelSerializer):
     class Meta:
         model = Group
-        fields = ['name', 'description']
+        fields = ['name', 'description', 'base_currency']
     
     def validate_name(self, value):
         if len(value.strip()) < 2:
             raise serializers.ValidationError("Group name must be at least 2 characters long.")
         return value.strip()
     
+    def validate_base_currency(self, value):
+        return validate_currency_code(value)
+    
     def create(self, validated_data):
         request = self.context['request']
         group = Group.objects.create(
@@ -159,10 +182,52 @@ class LocationShareSerializer(serializers.ModelSerializer):
     def get_user(self, obj):
         return UserSerializer(obj.membership.user).data
 
+class LatestLocationSerializer(serializers.ModelSerializer):
+    user = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = LatestLocation
+        fields = [
+            'user', 'latitude', 'longitude', 'accuracy',
+            'battery_level', 'timestamp'
+        ]
+    
+    def get_user(self, obj):
+        return UserSerializer(obj.membership.user).data
+
 class UpdateLocationSharingSerializer(serializers.Serializer):
     is_location_visible = serializers.BooleanField()
     
     def update_membership(self, membership):
         membership.is_location_visible = self.validated_data['is_location_visible']
         membership.save()
-        return membership
\ No newline at end of file
+        return membership
+
+class LocationFixSerializer(serializers.Serializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    accuracy = serializers.FloatField(required=False, allow_null=True, min_value=0)
+    battery_level = serializers.IntegerField(required=False, allow_null=True, min_value=0, max_value=100)
+    timestamp = serializers.DateTimeField(required=False)
+
+class LocationBatchSerializer(serializers.Serializer):
+    fixes = LocationFixSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=settings.LOCATION_MAX_BATCH_SIZE,
+        help_text="GPS fixes, possibly buffered while offline"
+    )
+
+class GeofenceSerializer(serializers.ModelSerializer):
+    latitude = serializers.DecimalField(max_digits=10, decimal_places=8, min_value=-90, max_value=90, coerce_to_string=False)
+    longitude = serializers.DecimalField(max_digits=11, decimal_places=8, min_value=-180, max_value=180, coerce_to_string=False)
+    radius_meters = serializers.FloatField(min_value=10, max_value=50000)
+    created_by = UserSerializer(read_only=True)
+    
+    class Meta:
+        model = Geofence
+        fields = [
+            'id', 'name', 'latitude', 'longitude', 'radius_meters',
+            'created_by', 'created_at'
+        ]
+        read_only_fields = ['id', 'created_by', 'created_at']
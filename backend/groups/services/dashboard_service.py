@@ -0,0 +1,154 @@
+# groups/services/dashboard_service.py
+
+from decimal import Decimal
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q, Sum
+from ..models import GroupMembership
+
+logger = logging.getLogger(__name__)
+
+def _version_key(user_id):
+    return f'dashboard_version:{user_id}'
+
+def get_dashboard_version(user_id):
+    """Current cache version for a user's dashboard"""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+def bump_dashboard_versions(user_ids):
+    """Invalidate cached dashboards by moving each user to a new version"""
+    for user_id in set(user_ids):
+        key = _version_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, None)
+
+def bump_group_dashboards(group_id, extra_user_ids=()):
+    """Invalidate the dashboards of every active member of a group"""
+    member_ids = list(GroupMembership.objects.filter(
+        group_id=group_id,
+        is_active=True
+    ).values_list('user_id', flat=True))
+    bump_dashboard_versions(member_ids + list(extra_user_ids))
+
+def build_dashboard(user):
+    """
+    Every active group of a user with role, member count, balance, pending
+    approvals and last activity, from four grouped queries in total.
+    """
+    from expense.models import Expense, ExpenseParticipant
+    from expense.services.fx_service import convert_balances
+    
+    memberships = list(
+        GroupMembership.objects.filter(
+            user=user,
+            is_active=True,
+            group__is_active=True
+        ).select_related('group').order_by('-group__created_at')
+    )
+    group_ids = [membership.group_id for membership in memberships]
+    
+    if not group_ids:
+        return {'total_groups': 0, 'owned_groups': 0, 'member_groups': 0, 'groups': []}
+    
+    members = {
+        row['group_id']: row
+        for row in GroupMembership.objects.filter(
+            group_id__in=group_ids,
+            is_active=True
+        ).values('group_id').annotate(
+            member_count=Count('id'),
+            last_joined=Max('joined_at')
+        ).order_by()
+    }
+    
+    expenses = {
+        row['group_id']: row
+        for row in Expense.objects.filter(
+            group_id__in=group_ids,
+            is_active=True
+        ).values('group_id').annotate(
+            total_expenses=Count('id'),
+            pending_approvals=Count('id', filter=Q(status='pending_approval')),
+            last_expense=Max('created_at')
+        ).order_by()
+    }
+    
+    # Same definition as expense.utils.get_user_group_balance, for all groups at
+    # once: per (group, currency) sums, converted to each group's base currency below
+    participations = {}
+    for row in ExpenseParticipant.objects.filter(
+        expense__group_id__in=group_ids,
+        user=user,
+        is_active=True
+    ).values('expense__group_id', 'expense__currency').annotate(
+        total_owed=Sum('amount_owed'),
+        total_paid=Sum('amount_paid'),
+        pending_count=Count('id', filter=Q(status='pending'))
+    ).order_by():
+        participation = participations.setdefault(row['expense__group_id'], {'balances': {}, 'pending_count': 0})
+        participation['balances'][row['expense__currency']] = (
+            (row['total_paid'] or Decimal('0.00')) - (row['total_owed'] or Decimal('0.00'))
+        )
+        participation['pending_count'] += row['pending_count']
+    
+    groups = []
+    for membership in memberships:
+        group = membership.group
+        member_stats = members.get(group.id, {})
+        expense_stats = expenses.get(group.id, {})
+        participation = participations.get(group.id, {})
+        is_owner = group.owner_id == user.id
+        
+        balances = participation.get('balances', {})
+        converted = convert_balances(balances, group.base_currency)
+        last_activity = max(
+            value for value in (
+                group.created_at,
+                member_stats.get('last_joined'),
+                expense_stats.get('last_expense'),
+            ) if value is not None
+        )
+        
+        groups.append({
+            'id': str(group.id),
+            'name': group.name,
+            'description': group.description,
+            'role': membership.role,
+            'is_owner': is_owner,
+            'member_count': member_stats.get('member_count', 0),
+            'location_sharing': membership.is_location_visible,
+            'joined_at': membership.joined_at,
+            'last_activity': last_activity,
+            'total_expenses': expense_stats.get('total_expenses', 0),
+            'currency': group.base_currency,
+            'user_balance': converted['amount'] if converted else None,
+            'user_balances': balances,
+            'user_pending_count': participation.get('pending_count', 0),
+            # Only owners can act on approvals
+            'pending_approvals': expense_stats.get('pending_approvals', 0) if membership.role == 'owner' else None,
+        })
+    
+    owned = sum(1 for group in groups if group['is_owner'])
+    return {
+        'total_groups': len(groups),
+        'owned_groups': owned,
+        'member_groups': len(groups) - owned,
+        'groups': groups,
+    }
+
+def get_dashboard(user):
+    """Dashboard for a user, cached until something in one of their groups changes"""
+    key = f'dashboard:{user.id}:{get_dashboard_version(user.id)}'
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = build_dashboard(user)
+        cache.set(key, dashboard, settings.DASHBOARD_CACHE_SECONDS)
+    return dashboard
@@ -0,0 +1,210 @@
+# groups/services/location_retention.py
+
+from datetime import timedelta
+import math
+import logging
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef, Sum
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from ..models import LocationShare, LatestLocation, LocationCompactionState
+from .location_service import EARTH_RADIUS_METERS
+
+logger = logging.getLogger(__name__)
+
+# Used when the database cannot report real tuple sizes (non-PostgreSQL)
+ESTIMATED_ROW_BYTES = 96
+
+def douglas_peucker(points, tolerance_meters):
+    """
+    Simplify a track with the Douglas-Peucker algorithm.
+    
+    points: list of (latitude, longitude) in degrees, in time order.
+    Returns the sorted indices of the points to keep; the first and last
+    points are always kept.
+    """
+    count = len(points)
+    if count <= 2:
+        return list(range(count))
+    
+    # Project onto a local plane in meters; fine for the extent of a track
+    lat0 = math.radians(float(points[0][0]))
+    scale = math.radians(1) * EARTH_RADIUS_METERS
+    xy = [
+        (float(lon) * scale * math.cos(lat0), float(lat) * scale)
+        for lat, lon in points
+    ]
+    
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        
+        x1, y1 = xy[start]
+        x2, y2 = xy[end]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        
+        max_distance = -1.0
+        max_index = start
+        for i in range(start + 1, end):
+            px, py = xy[i]
+            if length == 0:
+                distance = math.hypot(px - x1, py - y1)
+            else:
+                distance = abs(dy * px - dx * py + x2 * y1 - y2 * x1) / length
+            if distance > max_distance:
+                max_distance = distance
+                max_index = i
+        
+        if max_distance > tolerance_meters:
+            keep[max_index] = True
+            stack.append((start, max_index))
+            stack.append((max_index, end))
+    
+    return [i for i, kept in enumerate(keep) if kept]
+
+def location_storage_report():
+    """
+    Rows and bytes of location history per group.
+    Returns a list of dicts with group_id, group_name, rows and bytes.
+    """
+    queryset = LocationShare.objects.values(
+        'membership__group_id', 'membership__group__name'
+    )
+    
+    if connection.vendor == 'postgresql':
+        table = LocationShare._meta.db_table
+        queryset = queryset.annotate(
+            rows=Count('id'),
+            bytes=Sum(RawSQL(f'pg_column_size("{table}".*)', []))
+        )
+    else:
+        queryset = queryset.annotate(rows=Count('id'))
+    
+    report = []
+    for row in queryset.order_by('membership__group__name'):
+        report.append({
+            'group_id': str(row['membership__group_id']),
+            'group_name': row['membership__group__name'],
+            'rows': row['rows'],
+            'bytes': row.get('bytes') or row['rows'] * ESTIMATED_ROW_BYTES,
+        })
+    
+    return report
+
+class LocationCompactor:
+    """
+    Retention job for LocationShare.
+    
+    - Points newer than the full-resolution window are left alone.
+    - Points between the retention horizon and that window are simplified
+      per membership with Douglas-Peucker, one day at a time, resuming from
+      LocationCompactionState so each point is only examined once.
+    - Points older than the retention horizon are deleted, apart from each
+      member's latest fix.
+    
+    Every delete is a short primary-key batch in its own transaction, driven
+    by the (membership, timestamp) and (timestamp) indexes, so no statement
+    holds locks for long.
+    """
+    
+    def __init__(self, full_resolution_days=None, retention_days=None,
+                 tolerance_meters=None, batch_size=None, now=None):
+        now = now or timezone.now()
+        full_resolution_days = full_resolution_days or settings.LOCATION_FULL_RESOLUTION_DAYS
+        retention_days = retention_days or settings.LOCATION_RETENTION_DAYS
+        
+        if retention_days < full_resolution_days:
+            raise ValueError("Retention must be at least as long as the full-resolution window")
+        
+        self.full_resolution_cutoff = now - timedelta(days=full_resolution_days)
+        self.horizon = now - timedelta(days=retention_days)
+        self.tolerance = tolerance_meters or settings.LOCATION_DOWNSAMPLE_TOLERANCE_METERS
+        self.batch_size = batch_size or settings.LOCATION_COMPACTION_BATCH_SIZE
+    
+    def run(self):
+        """Run downsampling and purging. Returns counts of deleted rows."""
+        downsampled = self.downsample()
+        purged = self.purge_expired()
+        return {'downsampled': downsampled, 'purged': purged}
+    
+    def purge_expired(self):
+        """
+        Delete everything older than the retention horizon in batches, except
+        the fix LatestLocation still points at for a member who went quiet.
+        """
+        latest = LatestLocation.objects.filter(
+            membership_id=OuterRef('membership_id'),
+            timestamp=OuterRef('timestamp')
+        )
+        total = 0
+        while True:
+            ids = list(
+                LocationShare.objects.filter(
+                    timestamp__lt=self.horizon
+                ).exclude(
+                    Exists(latest)
+                ).order_by('timestamp').values_list('id', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                break
+            total += self._delete_ids(ids)
+        
+        logger.info(f"Purged {total} location fixes older than {self.horizon}")
+        return total
+    
+    def downsample(self):
+        """Simplify tracks between the horizon and the full-resolution window"""
+        total = 0
+        cursors = dict(
+            LocationCompactionState.objects.values_list('membership_id', 'compacted_until')
+        )
+        
+        membership_ids = LatestLocation.objects.values_list('membership_id', flat=True)
+        for membership_id in membership_ids.iterator():
+            start = max(cursors.get(membership_id) or self.horizon, self.horizon)
+            if start >= self.full_resolution_cutoff:
+                continue
+            
+            while start < self.full_resolution_cutoff:
+                end = min(start + timedelta(days=1), self.full_resolution_cutoff)
+                total += self._downsample_window(membership_id, start, end)
+                start = end
+            
+            LocationCompactionState.objects.update_or_create(
+                membership_id=membership_id,
+                defaults={'compacted_until': self.full_resolution_cutoff}
+            )
+        
+        logger.info(f"Downsampling removed {total} location fixes")
+        return total
+    
+    def _downsample_window(self, membership_id, start, end):
+        points = list(
+            LocationShare.objects.filter(
+                membership_id=membership_id,
+                timestamp__gte=start,
+                timestamp__lt=end
+            ).order_by('timestamp').values_list('id', 'latitude', 'longitude')
+        )
+        if len(points) <= 2:
+            return 0
+        
+        kept = set(douglas_peucker([(lat, lon) for _, lat, lon in points], self.tolerance))
+        redundant = [point[0] for i, point in enumerate(points) if i not in kept]
+        
+        deleted = 0
+        for i in range(0, len(redundant), self.batch_size):
+            deleted += self._delete_ids(redundant[i:i + self.batch_size])
+        return deleted
+    
+    def _delete_ids(self, ids):
+        with transaction.atomic():
+            deleted, _ = LocationShare.objects.filter(id__in=ids).delete()
+        return deleted
@@ -0,0 +1,244 @@
+# groups/services/location_service.py
+
+from decimal import Decimal
+from datetime import timedelta
+import math
+import logging
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+from ..models import GroupMembership, LocationShare, LatestLocation
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_METERS = 6371000
+COORDINATE_PLACES = Decimal('0.00000001')
+
+def haversine_meters(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in meters"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (float(lat1), float(lon1), float(lat2), float(lon2)))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+def location_channel_name(group_id, user_id):
+    """Channel layer group a member's location socket listens on"""
+    return f'locations_{group_id}_{user_id}'
+
+class LocationIngestService:
+    """
+    Accepts batches of GPS fixes for one membership.
+    
+    Fixes are sorted and filtered against movement/time thresholds relative
+    to the point before them in the stored timeline (so retries collapse and
+    an offline buffer uploaded late still fills in history), then written
+    with a single bulk insert. A fix newer than the latest one becomes the
+    live position and is fanned out to members who share their own location.
+    """
+    
+    def __init__(self, membership):
+        self.membership = membership
+        self.min_distance = settings.LOCATION_MIN_DISTANCE_METERS
+        self.min_interval = timedelta(seconds=settings.LOCATION_MIN_INTERVAL_SECONDS)
+        self.heartbeat = timedelta(seconds=settings.LOCATION_HEARTBEAT_SECONDS)
+        self.max_accuracy = settings.LOCATION_MAX_ACCURACY_METERS
+    
+    def ingest(self, fixes):
+        """
+        Ingest validated fixes (dicts with latitude, longitude and optional
+        accuracy, battery_level, timestamp).
+        Returns {'accepted': int, 'dropped': int, 'latest': LocationShare or None,
+                 'geofence_events': list}
+        """
+        from .proximity_service import ProximityService
+        
+        now = timezone.now()
+        max_future = now + timedelta(minutes=5)
+        
+        fixes = sorted(fixes, key=lambda fix: fix.get('timestamp') or now)
+        points = [
+            LocationShare(
+                membership=self.membership,
+                latitude=Decimal(str(fix['latitude'])).quantize(COORDINATE_PLACES),
+                longitude=Decimal(str(fix['longitude'])).quantize(COORDINATE_PLACES),
+                accuracy=fix.get('accuracy'),
+                battery_level=fix.get('battery_level'),
+                timestamp=fix.get('timestamp') or now,
+            )
+            for fix in fixes
+        ]
+        points = [point for point in points if self._is_usable(point, max_future)]
+        
+        latest = LatestLocation.objects.filter(membership=self.membership).first()
+        timeline = self._stored_timeline(points, latest)
+        stored_times = {stored.timestamp for stored in timeline}
+        accepted = []
+        previous = None
+        position = 0
+        
+        # Walk the batch and the stored timeline together, so each fix is
+        # compared with the point just before it in time, stored or new
+        for point in points:
+            while position < len(timeline) and timeline[position].timestamp < point.timestamp:
+                if previous is None or timeline[position].timestamp > previous.timestamp:
+                    previous = timeline[position]
+                position += 1
+            
+            if point.timestamp in stored_times:
+                # Retry of a fix we already have
+                continue
+            
+            if self._should_keep(point, previous):
+                accepted.append(point)
+                previous = point
+        
+        geofence_events = []
+        if accepted:
+            LocationShare.objects.bulk_create(accepted)
+            GroupMembership.objects.filter(pk=self.membership.pk).update(last_seen=now)
+            
+            # Backfilled history only goes to storage; the live position,
+            # broadcast and geofences move only for fixes newer than it
+            live = [point for point in accepted if latest is None or point.timestamp > latest.timestamp]
+            if live and self._update_latest(live[-1]):
+                self.broadcast_latest(live[-1])
+                geofence_events = ProximityService(self.membership.group_id).record_fixes(
+                    self.membership, live
+                )
+        
+        dropped = len(fixes) - len(accepted)
+        logger.info(
+            f"Ingested {len(accepted)} location fixes for membership {self.membership.pk} "
+            f"({dropped} dropped)"
+        )
+        
+        return {
+            'accepted': len(accepted),
+            'dropped': dropped,
+            'latest': accepted[-1] if accepted else None,
+            'geofence_events': geofence_events,
+        }
+    
+    def _stored_timeline(self, points, latest):
+        """
+        Stored fixes the batch has to be compared with, oldest first: the one
+        before the batch starts and any inside its time range. A batch newer
+        than the latest fix (the live case) needs only the LatestLocation row.
+        """
+        if not points:
+            return []
+        if latest is None or points[0].timestamp > latest.timestamp:
+            return [latest] if latest else []
+        
+        history = LocationShare.objects.filter(membership=self.membership).only(
+            'latitude', 'longitude', 'timestamp'
+        )
+        before = history.filter(timestamp__lt=points[0].timestamp).order_by('-timestamp').first()
+        within = list(history.filter(
+            timestamp__gte=points[0].timestamp,
+            timestamp__lte=points[-1].timestamp
+        ).order_by('timestamp'))
+        return ([before] if before else []) + within
+    
+    def _update_latest(self, location):
+        """
+        Upsert the membership's LatestLocation row in one statement, unless a
+        newer fix is already stored (a concurrent batch). Returns whether the
+        row now holds `location`.
+        """
+        from .proximity_service import grid_cell
+        cell_x, cell_y = grid_cell(location.latitude, location.longitude)
+        
+        values = {
+            'membership': self.membership.pk,
+            'group': self.membership.group_id,
+            'latitude': location.latitude,
+            'longitude': location.longitude,
+            'accuracy': location.accuracy,
+            'battery_level': location.battery_level,
+            'timestamp': location.timestamp,
+            'cell_x': cell_x,
+            'cell_y': cell_y,
+            'updated_at': timezone.now(),
+        }
+        quote = connection.ops.quote_name
+        table = quote(LatestLocation._meta.db_table)
+        fields = [LatestLocation._meta.get_field(name) for name in values]
+        columns = [quote(field.column) for field in fields]
+        params = [field.get_db_prep_save(value, connection) for field, value in zip(fields, values.values())]
+        timestamp = quote('timestamp')
+        
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON CONFLICT ({columns[0]}) DO UPDATE SET "
+                f"{', '.join(f'{column} = EXCLUDED.{column}' for column in columns[1:])} "
+                f"WHERE {table}.{timestamp} < EXCLUDED.{timestamp}",
+                params
+            )
+            return cursor.rowcount > 0
+    
+    def _is_usable(self, point, max_future):
+        """Accuracy and clock checks that need no history"""
+        if point.accuracy is not None and point.accuracy > self.max_accuracy:
+            return False
+        return point.timestamp <= max_future
+    
+    def _should_keep(self, point, previous):
+        """Apply ordering and movement/time thresholds against the previous point in time"""
+        if previous is None:
+            return True
+        
+        elapsed = point.timestamp - previous.timestamp
+        
+        # Same instant as the previous point: a duplicate within the batch
+        if elapsed <= timedelta(0):
+            return False
+        
+        if elapsed < self.min_interval:
+            return False
+        
+        if elapsed >= self.heartbeat:
+            return True
+        
+        distance = haversine_meters(previous.latitude, previous.longitude, point.latitude, point.longitude)
+        return distance >= self.min_distance
+    
+    def broadcast_latest(self, location):
+        """Send the latest position to members who have location sharing on"""
+        if not self.membership.is_location_visible:
+            return
+        
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        
+        recipient_ids = GroupMembership.objects.filter(
+            group_id=self.membership.group_id,
+            is_active=True,
+            is_location_visible=True
+        ).exclude(pk=self.membership.pk).values_list('user_id', flat=True)
+        
+        message = {
+            'type': 'location_update',
+            'user_id': str(self.membership.user_id),
+            'group_id': str(self.membership.group_id),
+            'latitude': str(location.latitude),
+            'longitude': str(location.longitude),
+            'accuracy': location.accuracy,
+            'battery_level': location.battery_level,
+            'timestamp': location.timestamp.isoformat(),
+        }
+        
+        for user_id in recipient_ids:
+            try:
+                async_to_sync(channel_layer.group_send)(
+                    location_channel_name(self.membership.group_id, user_id),
+                    message
+                )
+            except Exception as e:
+                logger.error(f"Error sending location update to user {user_id}: {str(e)}")
@@ -0,0 +1,304 @@
+# groups/services/proximity_service.py
+
+from collections import defaultdict
+import heapq
+import math
+import time
+import logging
+from django.db.models import Q
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+from ..models import GroupMembership, LatestLocation, Geofence, GeofencePresence
+from .location_service import haversine_meters, location_channel_name
+
+logger = logging.getLogger(__name__)
+
+# ~1.1 km of latitude per cell; the same grid backs the indexed
+# LatestLocation.cell_x/cell_y columns and the in-process LiveGrid
+GRID_CELL_DEGREES = 0.01
+METERS_PER_DEGREE = 111320
+LIVE_GRID_TTL_SECONDS = 30
+
+def grid_cell(latitude, longitude, cell_degrees=GRID_CELL_DEGREES):
+    """(cell_x, cell_y) containing a coordinate"""
+    return (
+        math.floor(float(longitude) / cell_degrees),
+        math.floor(float(latitude) / cell_degrees),
+    )
+
+class LiveGrid:
+    """
+    In-process uniform grid over the live set of member positions.
+    
+    Updates are O(1); k-nearest searches expand ring by ring around the
+    query cell and stop as soon as no unvisited cell can hold a closer
+    point, so they only touch the neighbourhood of the query.
+    """
+    
+    def __init__(self, cell_degrees=GRID_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.cells = defaultdict(set)
+        self.positions = {}  # key -> (latitude, longitude, cell)
+    
+    def __len__(self):
+        return len(self.positions)
+    
+    def update(self, key, latitude, longitude):
+        latitude, longitude = float(latitude), float(longitude)
+        cell = grid_cell(latitude, longitude, self.cell_degrees)
+        
+        previous = self.positions.get(key)
+        if previous and previous[2] != cell:
+            self._discard_from_cell(key, previous[2])
+        
+        self.cells[cell].add(key)
+        self.positions[key] = (latitude, longitude, cell)
+    
+    def remove(self, key):
+        previous = self.positions.pop(key, None)
+        if previous:
+            self._discard_from_cell(key, previous[2])
+    
+    def _discard_from_cell(self, key, cell):
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self.cells[cell]
+    
+    def nearest(self, latitude, longitude, k, exclude=None):
+        """Return up to k (distance_meters, key) pairs, closest first"""
+        latitude, longitude = float(latitude), float(longitude)
+        target = len(self.positions) - (1 if exclude in self.positions else 0)
+        if k <= 0 or target <= 0:
+            return []
+        
+        cx, cy = grid_cell(latitude, longitude, self.cell_degrees)
+        # Smallest cell side near the query; longitude cells shrink with latitude
+        cell_meters = self.cell_degrees * METERS_PER_DEGREE * max(
+            math.cos(math.radians(min(abs(latitude) + self.cell_degrees, 90))), 0.01
+        )
+        
+        best = []  # max-heap of (-distance, key)
+        seen = 0
+        ring = 0
+        while seen < target:
+            if 8 * ring > len(self.cells):
+                # Sparse grid: cheaper to sweep the remaining occupied cells
+                cells = [
+                    cell for cell in self.cells
+                    if max(abs(cell[0] - cx), abs(cell[1] - cy)) >= ring
+                ]
+                seen += self._scan(cells, latitude, longitude, k, exclude, best)
+                break
+            
+            seen += self._scan(self._ring_cells(cx, cy, ring), latitude, longitude, k, exclude, best)
+            
+            # Anything in ring + 1 or further is at least ring * cell_meters away
+            if len(best) == k and -best[0][0] <= ring * cell_meters:
+                break
+            ring += 1
+        
+        return sorted((-distance, key) for distance, key in best)
+    
+    def _ring_cells(self, cx, cy, ring):
+        if ring == 0:
+            return [(cx, cy)]
+        cells = []
+        for x in range(cx - ring, cx + ring + 1):
+            cells.append((x, cy - ring))
+            cells.append((x, cy + ring))
+        for y in range(cy - ring + 1, cy + ring):
+            cells.append((cx - ring, y))
+            cells.append((cx + ring, y))
+        return cells
+    
+    def _scan(self, cells, latitude, longitude, k, exclude, best):
+        scanned = 0
+        for cell in cells:
+            for key in self.cells.get(cell, ()):
+                if key == exclude:
+                    continue
+                scanned += 1
+                lat, lon, _ = self.positions[key]
+                distance = haversine_meters(latitude, longitude, lat, lon)
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, key))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, key))
+        return scanned
+
+# group_id -> (LiveGrid, loaded_at); one per process
+_live_grids = {}
+
+def get_live_grid(group_id):
+    """Live grid for a group, reloaded from LatestLocation when stale"""
+    entry = _live_grids.get(group_id)
+    if entry and time.monotonic() - entry[1] < LIVE_GRID_TTL_SECONDS:
+        return entry[0]
+    
+    grid = LiveGrid()
+    locations = LatestLocation.objects.filter(
+        group_id=group_id,
+        membership__is_active=True,
+        membership__is_location_visible=True
+    ).values_list('membership_id', 'latitude', 'longitude')
+    for membership_id, latitude, longitude in locations:
+        grid.update(membership_id, latitude, longitude)
+    
+    _live_grids[group_id] = (grid, time.monotonic())
+    return grid
+
+def forget_live_grid(group_id):
+    """Drop a group's cached grid so the next query reloads visible members"""
+    _live_grids.pop(group_id, None)
+
+def geofence_contains(geofence, latitude, longitude):
+    """Whether a coordinate lies inside a circular geofence"""
+    # Cheap bounding-box rejection before the great-circle distance
+    lat_margin = geofence.radius_meters / METERS_PER_DEGREE
+    if abs(float(latitude) - float(geofence.latitude)) > lat_margin:
+        return False
+    return haversine_meters(
+        geofence.latitude, geofence.longitude, latitude, longitude
+    ) <= geofence.radius_meters
+
+class ProximityService:
+    """Proximity queries and incremental geofence detection for one group"""
+    
+    def __init__(self, group_id):
+        self.group_id = group_id
+    
+    def nearest_members(self, membership, latitude, longitude, k=5):
+        """k nearest visible members to a point, from the live grid"""
+        grid = get_live_grid(self.group_id)
+        return grid.nearest(latitude, longitude, k, exclude=membership.pk)
+    
+    def members_within(self, latitude, longitude, radius_meters, exclude=None):
+        """
+        Visible members within a radius, using the indexed grid-cell columns
+        to narrow candidates before the exact distance check.
+        Returns (distance_meters, LatestLocation) pairs, closest first.
+        """
+        cx, cy = grid_cell(latitude, longitude)
+        lat_cells = math.ceil(radius_meters / (GRID_CELL_DEGREES * METERS_PER_DEGREE))
+        lon_scale = max(math.cos(math.radians(min(abs(float(latitude)) + lat_cells * GRID_CELL_DEGREES, 89.9))), 0.01)
+        lon_cells = math.ceil(lat_cells / lon_scale)
+        
+        candidates = LatestLocation.objects.filter(
+            group_id=self.group_id,
+            cell_y__range=(cy - lat_cells, cy + lat_cells),
+            cell_x__range=(cx - lon_cells, cx + lon_cells),
+            membership__is_active=True,
+            membership__is_location_visible=True
+        ).select_related('membership__user__profile')
+        
+        if exclude is not None:
+            candidates = candidates.exclude(membership=exclude)
+        
+        results = []
+        for location in candidates:
+            distance = haversine_meters(latitude, longitude, location.latitude, location.longitude)
+            if distance <= radius_meters:
+                results.append((distance, location))
+        
+        return sorted(results, key=lambda item: item[0])
+    
+    def record_fixes(self, membership, points):
+        """
+        Feed newly accepted fixes (in time order) for a membership.
+        Updates the live grid and returns geofence enter/exit events.
+        """
+        if not points:
+            return []
+        
+        latest = points[-1]
+        entry = _live_grids.get(self.group_id)
+        if entry:
+            if membership.is_location_visible:
+                entry[0].update(membership.pk, latest.latitude, latest.longitude)
+            else:
+                entry[0].remove(membership.pk)
+        
+        events = self.evaluate_geofences(membership, points)
+        if events and membership.is_location_visible:
+            self.broadcast_events(membership, events)
+        return events
+    
+    def evaluate_geofences(self, membership, points):
+        """Compare each fix against the group's geofences and persist transitions"""
+        geofences = list(Geofence.objects.filter(group_id=self.group_id, is_active=True))
+        if not geofences:
+            return []
+        
+        presences = {
+            presence.geofence_id: presence
+            for presence in GeofencePresence.objects.filter(
+                membership=membership,
+                geofence__in=geofences
+            )
+        }
+        
+        events = []
+        created = {}
+        changed = {}
+        
+        for point in points:
+            for geofence in geofences:
+                inside = geofence_contains(geofence, point.latitude, point.longitude)
+                presence = presences.get(geofence.id)
+                was_inside = presence.is_inside if presence else False
+                
+                if inside == was_inside:
+                    continue
+                
+                if presence is None:
+                    presence = GeofencePresence(
+                        geofence=geofence,
+                        membership=membership,
+                        is_inside=inside,
+                        changed_at=point.timestamp
+                    )
+                    presences[geofence.id] = presence
+                    created[geofence.id] = presence
+                else:
+                    presence.is_inside = inside
+                    presence.changed_at = point.timestamp
+                    if geofence.id not in created:
+                        changed[geofence.id] = presence
+                
+                events.append({
+                    'event': 'enter' if inside else 'exit',
+                    'geofence_id': str(geofence.id),
+                    'geofence_name': geofence.name,
+                    'user_id': str(membership.user_id),
+                    'timestamp': point.timestamp.isoformat(),
+                })
+        
+        if created:
+            GeofencePresence.objects.bulk_create(created.values())
+        if changed:
+            GeofencePresence.objects.bulk_update(changed.values(), ['is_inside', 'changed_at'])
+        
+        return events
+    
+    def broadcast_events(self, membership, events):
+        """Send geofence events to members who share their location"""
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        
+        recipient_ids = GroupMembership.objects.filter(
+            Q(is_location_visible=True) | Q(pk=membership.pk),
+            group_id=self.group_id,
+            is_active=True
+        ).values_list('user_id', flat=True)
+        
+        for user_id in recipient_ids:
+            try:
+                async_to_sync(channel_layer.group_send)(
+                    location_channel_name(self.group_id, user_id),
+                    {'type': 'geofence_event', 'group_id': str(self.group_id), 'events': events}
+                )
+            except Exception as e:
+                logger.error(f"Error sending geofence events to user {user_id}: {str(e)}")
@@ -1,3 +1,485 @@
-from django.test import TestCase
+import random
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .models import (
+    Geofence, GeofencePresence, Group, GroupMembership, LatestLocation, LocationCompactionState, LocationShare
+)
+from expense.models import ExpenseParticipant
+from expense.services.status_service import ExpenseStatusService
+from expense.utils import create_group_expense
+from .services.dashboard_service import get_dashboard
+from .services.location_retention import LocationCompactor, douglas_peucker
+from .services.location_service import LocationIngestService, haversine_meters
+from .services.proximity_service import LiveGrid, ProximityService, _live_grids, get_live_grid
 
-# Create your tests here.
+User = get_user_model()
+
+class LocationIngestTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('walker', 'walker@example.com')
+        group = Group.objects.create(name='Trip', owner=owner)
+        self.membership = GroupMembership.objects.create(group=group, user=owner)
+        self.start = timezone.now() - timedelta(hours=1)
+    
+    def fix(self, minutes, latitude=10.7769, longitude=106.7009):
+        return {
+            'latitude': latitude,
+            'longitude': longitude,
+            'accuracy': 5.0,
+            'timestamp': self.start + timedelta(minutes=minutes),
+        }
+    
+    def ingest(self, fixes):
+        return LocationIngestService(self.membership).ingest(fixes)
+    
+    def test_offline_buffer_uploaded_after_live_fix_is_kept(self):
+        self.ingest([self.fix(50)])
+        
+        # Buffered while offline, walking ~110 m between fixes
+        result = self.ingest([self.fix(minutes, latitude=10.7769 + minutes * 0.001) for minutes in (10, 11, 12)])
+        
+        self.assertEqual(result['accepted'], 3)
+        self.assertEqual(LocationShare.objects.filter(membership=self.membership).count(), 4)
+        # The live position does not move back in time
+        latest = LatestLocation.objects.get(membership=self.membership)
+        self.assertEqual(latest.timestamp, self.start + timedelta(minutes=50))
+    
+    def test_thresholds_apply_against_previous_point_in_time(self):
+        self.ingest([self.fix(0), self.fix(30)])
+        
+        result = self.ingest([
+            self.fix(0),                        # retry of a stored fix
+            self.fix(1),                        # same place, one minute after a stored fix
+            self.fix(2, latitude=10.7869),      # moved ~1 km
+        ])
+        
+        self.assertEqual(result['accepted'], 1)
+        self.assertEqual(result['dropped'], 2)
+    
+    def test_newer_fix_moves_latest_location(self):
+        self.ingest([self.fix(10)])
+        self.ingest([self.fix(20, latitude=10.8)])
+        
+        latest = LatestLocation.objects.get(membership=self.membership)
+        self.assertEqual(latest.timestamp, self.start + timedelta(minutes=20))
+        self.assertEqual(float(latest.latitude), 10.8)
+    
+    def test_older_fix_never_overwrites_latest_location(self):
+        self.ingest([self.fix(20)])
+        
+        stale = LocationShare(membership=self.membership, latitude=1, longitude=1,
+                              timestamp=self.start + timedelta(minutes=5))
+        updated = LocationIngestService(self.membership)._update_latest(stale)
+        
+        self.assertFalse(updated)
+        latest = LatestLocation.objects.get(membership=self.membership)
+        self.assertEqual(latest.timestamp, self.start + timedelta(minutes=20))
+
+class GroupLocationsETagTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('mapper', 'mapper@example.com')
+        group = Group.objects.create(name='Map', owner=owner)
+        self.membership = GroupMembership.objects.create(group=group, user=owner)
+        LocationIngestService(self.membership).ingest([{
+            'latitude': 10.7769, 'longitude': 106.7009, 'accuracy': 5.0,
+            'battery_level': 80, 'timestamp': timezone.now(),
+        }])
+        self.client = APIClient()
+        self.client.force_authenticate(owner)
+        self.url = reverse('group_locations', args=[group.id])
+    
+    def test_unchanged_payload_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, 304)
+    
+    def test_any_serialized_field_change_busts_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        
+        # Same member and timestamp, only the battery level differs
+        LatestLocation.objects.filter(membership=self.membership).update(battery_level=40)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data[0]['battery_level'], 40)
+
+class LiveGridTests(SimpleTestCase):
+    def setUp(self):
+        self.rng = random.Random(7)
+    
+    def test_nearest_matches_brute_force(self):
+        for _ in range(50):
+            grid = LiveGrid()
+            points = {}
+            for key in range(self.rng.randint(1, 60)):
+                points[key] = (10.7 + self.rng.uniform(-0.2, 0.2), 106.7 + self.rng.uniform(-0.2, 0.2))
+                grid.update(key, *points[key])
+            latitude, longitude = 10.7 + self.rng.uniform(-0.3, 0.3), 106.7 + self.rng.uniform(-0.3, 0.3)
+            k = self.rng.randint(1, 8)
+            exclude = self.rng.choice(list(points))
+            
+            expected = sorted(
+                (haversine_meters(latitude, longitude, lat, lon), key)
+                for key, (lat, lon) in points.items() if key != exclude
+            )[:k]
+            
+            self.assertEqual(grid.nearest(latitude, longitude, k, exclude=exclude), expected)
+    
+    def test_moved_and_removed_keys_leave_their_old_cells(self):
+        grid = LiveGrid()
+        grid.update('a', 10.0, 106.0)
+        grid.update('b', 10.001, 106.001)
+        grid.update('a', 11.0, 107.0)
+        grid.remove('b')
+        
+        self.assertEqual(len(grid), 1)
+        self.assertEqual(len(grid.cells), 1)
+        self.assertEqual([key for _, key in grid.nearest(10.0, 106.0, 5)], ['a'])
+
+class ProximityTests(TestCase):
+    # Offsets north of the origin, in degrees of latitude (~111 m per 0.001)
+    OFFSETS = {'origin': 0, 'near': 0.001, 'middle': 0.005, 'far': 0.05}
+    
+    def setUp(self):
+        _live_grids.clear()
+        self.users = {name: User.objects.create_user(name, f'{name}@example.com') for name in self.OFFSETS}
+        self.group = Group.objects.create(name='Trip', owner=self.users['origin'])
+        self.memberships = {
+            name: GroupMembership.objects.create(group=self.group, user=user)
+            for name, user in self.users.items()
+        }
+        now = timezone.now()
+        for name, offset in self.OFFSETS.items():
+            LocationIngestService(self.memberships[name]).ingest([
+                {'latitude': 10.7769 + offset, 'longitude': 106.7009, 'accuracy': 5.0, 'timestamp': now}
+            ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.users['origin'])
+        self.url = reverse('nearby_members', args=[self.group.id])
+    
+    def nearby(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [item['user']['username'] for item in response.data]
+    
+    def test_members_within_radius_closest_first(self):
+        origin = LatestLocation.objects.get(membership=self.memberships['origin'])
+        
+        results = ProximityService(self.group.id).members_within(
+            origin.latitude, origin.longitude, 1000, exclude=self.memberships['origin']
+        )
+        
+        self.assertEqual([location.membership.user.username for _, location in results], ['near', 'middle'])
+        self.assertLess(results[0][0], results[1][0])
+    
+    def test_nearby_endpoint_paths(self):
+        self.assertEqual(self.nearby(k=2), ['near', 'middle'])
+        self.assertEqual(self.nearby(radius=200), ['near'])
+        self.assertEqual(self.client.get(self.url, {'k': 'x'}).status_code, 400)
+    
+    def test_hidden_member_is_excluded_from_both_paths(self):
+        # Warm the cached grid while everyone is visible
+        self.assertEqual(self.nearby(k=3), ['near', 'middle', 'far'])
+        
+        hidden = self.memberships['near']
+        hidden.is_location_visible = False
+        hidden.save()
+        
+        self.assertEqual(self.nearby(k=3), ['middle', 'far'])
+        self.assertEqual(self.nearby(radius=1000), ['middle'])
+    
+    def test_stale_grid_entry_is_rechecked_against_rows(self):
+        self.nearby(k=3)
+        # Another process flipped the flag; this process's grid still has the member
+        GroupMembership.objects.filter(pk=self.memberships['near'].pk).update(is_active=False)
+        self.assertIn(self.memberships['near'].pk, get_live_grid(self.group.id).positions)
+        
+        self.assertEqual(self.nearby(k=3), ['middle', 'far'])
+    
+    def test_leaving_the_group_evicts_the_grid(self):
+        self.nearby(k=3)
+        
+        membership = self.memberships['middle']
+        membership.is_active = False
+        membership.save()
+        
+        self.assertNotIn(membership.pk, get_live_grid(self.group.id).positions)
+    
+    def test_hidden_requester_is_refused(self):
+        self.memberships['origin'].is_location_visible = False
+        self.memberships['origin'].save()
+        
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+class GeofenceTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('host', 'host@example.com')
+        self.guest = User.objects.create_user('guest', 'guest@example.com')
+        self.group = Group.objects.create(name='Trip', owner=self.owner)
+        GroupMembership.objects.create(group=self.group, user=self.owner)
+        self.membership = GroupMembership.objects.create(group=self.group, user=self.guest)
+        self.hotel = Geofence.objects.create(
+            group=self.group, name='Hotel', latitude=10.7769, longitude=106.7009,
+            radius_meters=100, created_by=self.owner
+        )
+        self.start = timezone.now() - timedelta(hours=1)
+        self.client = APIClient()
+    
+    def fix(self, minutes, latitude):
+        return {'latitude': latitude, 'longitude': 106.7009, 'accuracy': 5.0,
+                'timestamp': self.start + timedelta(minutes=minutes)}
+    
+    def test_enter_and_exit_events_are_recorded_once(self):
+        result = LocationIngestService(self.membership).ingest([
+            self.fix(0, 10.7869),   # ~1.1 km away
+            self.fix(5, 10.7770),   # inside
+            self.fix(10, 10.7870),  # left again
+        ])
+        
+        self.assertEqual([event['event'] for event in result['geofence_events']], ['enter', 'exit'])
+        presence = GeofencePresence.objects.get(geofence=self.hotel, membership=self.membership)
+        self.assertFalse(presence.is_inside)
+        self.assertEqual(presence.changed_at, self.start + timedelta(minutes=10))
+        
+        # Staying outside raises nothing new
+        result = LocationIngestService(self.membership).ingest([self.fix(20, 10.7970)])
+        self.assertEqual(result['geofence_events'], [])
+    
+    def test_geofence_endpoints(self):
+        url = reverse('group_geofences', args=[self.group.id])
+        self.client.force_authenticate(self.guest)
+        
+        created = self.client.post(url, {'name': 'Beach', 'latitude': 10.8, 'longitude': 106.8,
+                                         'radius_meters': 250}, format='json')
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(self.client.post(url, {'name': 'Tiny', 'latitude': 10.8, 'longitude': 106.8,
+                                                'radius_meters': 1}, format='json').status_code, 400)
+        self.assertEqual([geofence['name'] for geofence in self.client.get(url).data], ['Beach', 'Hotel'])
+        
+        # Only the creator or the group owner may delete
+        hotel_url = reverse('delete_geofence', args=[self.group.id, self.hotel.id])
+        self.assertEqual(self.client.delete(hotel_url).status_code, 403)
+        beach_url = reverse('delete_geofence', args=[self.group.id, created.data['id']])
+        self.assertEqual(self.client.delete(beach_url).status_code, 200)
+        self.assertEqual([geofence['name'] for geofence in self.client.get(url).data], ['Hotel'])
+
+class GroupListQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('joiner', 'joiner@example.com')
+        self.others = [User.objects.create_user(f'other{index}', f'other{index}@example.com') for index in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def add_group(self, index, member_count):
+        group = Group.objects.create(name=f'Group {index}', owner=self.others[index % 3])
+        for user in [self.user] + self.others[:member_count - 1]:
+            GroupMembership.objects.create(group=group, user=user)
+        return group
+    
+    def list_groups(self):
+        response = self.client.get(reverse('list_groups'))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+    
+    def test_query_count_does_not_grow_with_groups(self):
+        self.add_group(0, 2)
+        with CaptureQueriesContext(connection) as one_group:
+            self.assertEqual(len(self.list_groups()), 1)
+        
+        for index in range(1, 8):
+            self.add_group(index, index % 4 + 1)
+        with self.assertNumQueries(len(one_group)):
+            groups = self.list_groups()
+        
+        self.assertEqual(len(groups), 8)
+        self.assertEqual(
+            sorted(group['member_count'] for group in groups),
+            sorted([2] + [index % 4 + 1 for index in range(1, 8)])
+        )
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('host', 'host@example.com')
+        self.member = User.objects.create_user('guest', 'guest@example.com')
+        self.groups = []
+        for index in range(3):
+            group = Group.objects.create(name=f'Trip {index}', owner=self.owner)
+            GroupMembership.objects.create(group=group, user=self.owner)
+            GroupMembership.objects.create(group=group, user=self.member)
+            self.groups.append(group)
+        self.expense = self.add_expense('Dinner')
+    
+    def add_expense(self, title):
+        return create_group_expense(self.groups[0], self.owner, {
+            'title': title,
+            'total_amount': Decimal('30.00'),
+            'status': 'pending_approval',
+        }, on_duplicate='ignore')
+    
+    def group_entry(self, user):
+        return next(group for group in get_dashboard(user)['groups'] if group['id'] == str(self.groups[0].id))
+    
+    def test_cold_cache_takes_four_queries_for_any_number_of_groups(self):
+        with self.assertNumQueries(4):
+            dashboard = get_dashboard(self.member)
+        
+        self.assertEqual(dashboard['total_groups'], 3)
+        self.assertEqual(dashboard['member_groups'], 3)
+    
+    def test_warm_cache_takes_no_queries(self):
+        get_dashboard(self.owner)
+        
+        with self.assertNumQueries(0):
+            dashboard = get_dashboard(self.owner)
+        self.assertEqual(dashboard['owned_groups'], 3)
+        
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        self.assertEqual(client.get(reverse('dashboard')).data, dashboard)
+    
+    def test_expense_save_invalidates_every_member(self):
+        self.assertEqual(self.group_entry(self.member)['total_expenses'], 1)
+        self.assertEqual(self.group_entry(self.owner)['pending_approvals'], 1)
+        
+        self.add_expense('Lunch')
+        
+        self.assertEqual(self.group_entry(self.member)['total_expenses'], 2)
+        self.assertEqual(self.group_entry(self.owner)['pending_approvals'], 2)
+    
+    def test_participant_save_invalidates_that_user(self):
+        self.assertEqual(self.group_entry(self.member)['user_balance'], Decimal('-15.00'))
+        
+        participant = ExpenseParticipant.objects.get(expense=self.expense, user=self.member)
+        participant.amount_paid = Decimal('15.00')
+        participant.save()
+        
+        self.assertEqual(self.group_entry(self.member)['user_balance'], Decimal('0.00'))
+    
+    def test_status_transition_invalidates_dashboards(self):
+        self.assertEqual(self.group_entry(self.owner)['pending_approvals'], 1)
+        
+        # transition() writes with a queryset UPDATE, so no post_save fires
+        ExpenseStatusService(self.expense).approve('manual', approver=self.owner)
+        
+        self.assertEqual(self.group_entry(self.owner)['pending_approvals'], 0)
+
+class DouglasPeuckerTests(SimpleTestCase):
+    # ~11 m per 0.0001 degrees of latitude
+    def line(self, count, bump_at=None, bump=0.0):
+        return [
+            (10.0 + index * 0.001, 106.0 + (bump if index == bump_at else 0.0))
+            for index in range(count)
+        ]
+    
+    def test_short_tracks_are_kept_whole(self):
+        self.assertEqual(douglas_peucker([], 25), [])
+        self.assertEqual(douglas_peucker(self.line(2), 25), [0, 1])
+    
+    def test_straight_track_keeps_only_its_endpoints(self):
+        self.assertEqual(douglas_peucker(self.line(20), 25), [0, 19])
+    
+    def test_detours_are_kept_only_beyond_the_tolerance(self):
+        # ~55 m sideways at this latitude
+        detour = self.line(20, bump_at=7, bump=0.0005)
+        
+        kept = douglas_peucker(detour, 25)
+        self.assertIn(7, kept)
+        self.assertEqual((kept[0], kept[-1]), (0, 19))
+        # Far from the detour the track is straight again
+        self.assertFalse(set(kept) & (set(range(1, 5)) | set(range(11, 19))))
+        self.assertEqual(douglas_peucker(detour, 100), [0, 19])
+    
+    def test_closed_loop_keeps_its_endpoints(self):
+        loop = [(10.0, 106.0), (10.001, 106.0), (10.001, 106.001), (10.0, 106.0)]
+        
+        kept = douglas_peucker(loop, 25)
+        
+        self.assertEqual(kept[0], 0)
+        self.assertEqual(kept[-1], 3)
+        self.assertIn(1, kept)
+
+class LocationCompactorTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('walker', 'walker@example.com')
+        group = Group.objects.create(name='Trip', owner=owner)
+        self.membership = GroupMembership.objects.create(group=group, user=owner)
+        self.now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    
+    def compactor(self, days_later=0):
+        return LocationCompactor(full_resolution_days=7, retention_days=30, tolerance_meters=25,
+                                 batch_size=2, now=self.now + timedelta(days=days_later))
+    
+    def walk(self, days_ago, count=6):
+        """A straight walk north, one fix per 10 minutes"""
+        start = self.now - timedelta(days=days_ago)
+        shares = LocationShare.objects.bulk_create([
+            LocationShare(membership=self.membership, latitude=10.0 + index * 0.001, longitude=106.0,
+                          timestamp=start + timedelta(minutes=10 * index))
+            for index in range(count)
+        ])
+        return [share.timestamp for share in shares]
+    
+    def set_latest(self, timestamp):
+        LatestLocation.objects.update_or_create(membership=self.membership, defaults={
+            'group_id': self.membership.group_id, 'latitude': 10, 'longitude': 106, 'timestamp': timestamp
+        })
+    
+    def stored(self):
+        return sorted(LocationShare.objects.values_list('timestamp', flat=True))
+    
+    def test_tracks_are_simplified_one_day_at_a_time(self):
+        first_day = self.walk(10)
+        second_day = self.walk(9)
+        recent = self.walk(2)
+        self.set_latest(recent[-1])
+        
+        removed = self.compactor().downsample()
+        
+        # Each day window keeps its own endpoints; the full-resolution window is untouched
+        self.assertEqual(removed, 8)
+        self.assertEqual(self.stored(), [first_day[0], first_day[-1], second_day[0], second_day[-1]] + recent)
+    
+    def test_compaction_resumes_from_its_state(self):
+        self.walk(10)
+        self.set_latest(self.now)
+        self.compactor().downsample()
+        state = LocationCompactionState.objects.get(membership=self.membership)
+        self.assertEqual(state.compacted_until, self.now - timedelta(days=7))
+        
+        # A late upload into the compacted range is not revisited
+        late = self.walk(12)
+        self.assertEqual(self.compactor().downsample(), 0)
+        self.assertTrue(set(late) <= set(self.stored()))
+        
+        # A day later only the newly aged day is examined
+        aged = self.walk(7, count=3)
+        self.assertEqual(self.compactor(days_later=1).downsample(), 1)
+        self.assertEqual([timestamp for timestamp in self.stored() if timestamp in aged], [aged[0], aged[-1]])
+    
+    def test_purge_keeps_only_the_latest_fix_past_the_horizon(self):
+        expired = self.walk(40)
+        kept = self.walk(20)
+        self.set_latest(expired[-1])
+        
+        result = self.compactor().run()
+        
+        self.assertEqual(result['purged'], 5)
+        self.assertIn(expired[-1], self.stored())
+        self.assertTrue(set(kept[:1] + kept[-1:]) <= set(self.stored()))
+        self.assertEqual(LatestLocation.objects.get(membership=self.membership).timestamp, expired[-1])
+    
+    def test_retention_shorter_than_full_resolution_is_refused(self):
+        with self.assertRaises(ValueError):
+            LocationCompactor(full_resolution_days=30, retention_days=7)
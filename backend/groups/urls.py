@@ -17,6 +17,11 @@ urlpatterns = [
     
     # Location sharing
     path('<uuid:group_id>/location-sharing/', views.update_location_sharing, name='location_sharing'),  
+    path('<uuid:group_id>/locations/', views.get_group_locations, name='group_locations'),
+    path('<uuid:group_id>/locations/ingest/', views.ingest_locations, name='ingest_locations'),
+    path('<uuid:group_id>/locations/nearby/', views.nearby_members, name='nearby_members'),
+    path('<uuid:group_id>/geofences/', views.group_geofences, name='group_geofences'),
+    path('<uuid:group_id>/geofences/<uuid:geofence_id>/', views.delete_geofence, name='delete_geofence'),
     
     # Invitations
     path('invitations/', views.get_group_invitations, name='group_invitations'),              
@@ -34,6 +39,12 @@ urlpatterns = [
 # POST   /api/groups/{id}/remove-member/  - Remove member from group
 # GET    /api/groups/{id}/members/        - Get group members
 # POST   /api/groups/{id}/location-sharing/ - Update location sharing preference
+# GET    /api/groups/{id}/locations/      - Latest positions of sharing members (ETag)
+# POST   /api/groups/{id}/locations/ingest/ - Upload a batch of location fixes
+# GET    /api/groups/{id}/locations/nearby/ - Nearest members (?k=) or within ?radius=
+# GET    /api/groups/{id}/geofences/      - List geofences
+# POST   /api/groups/{id}/geofences/      - Create geofence
+# DELETE /api/groups/{id}/geofences/{gid}/ - Delete geofence
 # GET    /api/groups/invitations/         - Get pending invitations
 # POST   /api/groups/invitations/{id}/respond/ - Accept/decline invitation
 # POST   /api/groups/{id}/invite/         - Send group invitations
\ No newline at end of file
@@ -3,7 +3,8 @@ from django.db import transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models import Count, Q
+from django.db.models import Count, Q, F, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
 from typing import List, Dict, Tuple
 import logging
 
@@ -26,6 +27,35 @@ def get_user_groups(user, include_inactive=False):
     
     return query.distinct()
 
+def with_group_stats(queryset):
+    """
+    Annotate member count and last activity for a group list in the same query.
+    Correlated subqueries keep the counts independent of any membership join
+    the caller filtered on; GroupSerializer reads these annotations.
+    """
+    from .models import GroupMembership
+    
+    active_memberships = GroupMembership.objects.filter(
+        group=OuterRef('pk'),
+        is_active=True
+    )
+    
+    return queryset.annotate(
+        annotated_member_count=Coalesce(
+            Subquery(
+                active_memberships.order_by().values('group').annotate(
+                    count=Count('id')
+                ).values('count'),
+                output_field=IntegerField()
+            ),
+            0
+        ),
+        annotated_last_activity=Coalesce(
+            Subquery(active_memberships.order_by('-joined_at').values('joined_at')[:1]),
+            F('created_at')
+        )
+    ).select_related('owner__profile')
+
 def get_group_membership(group, user):
     """Get a user's membership in a specific group"""
     from .models import GroupMembership
@@ -408,44 +438,35 @@ def get_group_statistics(group):
     return stats
 
 def get_user_group_summary(user):
-    """Get summary of all groups for a user"""
-    groups = get_user_groups(user)
-    
-    summary = {
-        'total_groups': groups.count(),
-        'owned_groups': groups.filter(owner=user).count(),
-        'member_groups': groups.exclude(owner=user).count(),
-        'groups': []
-    }
-    
-    for group in groups:
-        membership = get_group_membership(group, user)
-        group_data = {
-            'id': str(group.id),
-            'name': group.name,
-            'description': group.description,
-            'role': membership.role if membership else 'unknown',
-            'member_count': get_group_member_count(group),
-            'is_owner': is_group_owner(group, user),
-            'location_sharing': membership.is_location_visible if membership else False,
-            'joined_at': membership.joined_at if membership else None,
-        }
-        
-        # Add expense summary if available
-        try:
-            from expense.utils import get_group_expense_summary
-            expense_stats = get_group_expense_summary(group, user)
-            group_data['expense_summary'] = {
-                'total_expenses': expense_stats.get('total_expenses', 0),
-                'user_balance': expense_stats.get('user_balance', 0),
-                'pending_count': expense_stats.get('user_pending_count', 0),
+    """Get summary of all groups for a user (shares the cached dashboard data)"""
+    from .services.dashboard_service import get_dashboard
+    
+    dashboard = get_dashboard(user)
+    
+    return {
+        'total_groups': dashboard['total_groups'],
+        'owned_groups': dashboard['owned_groups'],
+        'member_groups': dashboard['member_groups'],
+        'groups': [
+            {
+                'id': group['id'],
+                'name': group['name'],
+                'description': group['description'],
+                'role': group['role'],
+                'member_count': group['member_count'],
+                'is_owner': group['is_owner'],
+                'location_sharing': group['location_sharing'],
+                'joined_at': group['joined_at'],
+                'expense_summary': {
+                    'total_expenses': group['total_expenses'],
+                    'currency': group['currency'],
+                    'user_balance': group['user_balance'],
+                    'pending_count': group['user_pending_count'],
+                },
             }
-        except ImportError:
-            pass
-        
-        summary['groups'].append(group_data)
-    
-    return summary
+            for group in dashboard['groups']
+        ]
+    }
 
 # ===== VALIDATION UTILITIES =====
 
@@ -4,15 +4,26 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
-from .models import Group, GroupMembership, GroupInvitation
+from django.utils.http import quote_etag, parse_etags
+import hashlib
+import json
+from api.idempotency import idempotent
+from .models import Group, GroupMembership, GroupInvitation, LatestLocation, Geofence
 from .serializers import (
     GroupSerializer, CreateGroupSerializer, GroupMemberSerializer,
     AddMembersSerializer, UpdateLocationSharingSerializer,
-    GroupInvitationSerializer
+    GroupInvitationSerializer, LocationBatchSerializer, LatestLocationSerializer,
+    GeofenceSerializer, UserSerializer
 )
+from .services.location_service import LocationIngestService
+from .services.proximity_service import ProximityService
+from .services.dashboard_service import get_dashboard
+from .utils import with_group_stats
 
 User = get_user_model()
 
@@ -20,17 +31,33 @@ User = get_user_model()
 @permission_classes([IsAuthenticated])
 def list_groups(request):
     """Get all groups where user is a member"""
-    groups = Group.objects.filter(
-        memberships__user=request.user,
-        memberships__is_active=True,
-        is_active=True
-    ).distinct()
+    groups = with_group_stats(
+        Group.objects.filter(
+            Exists(GroupMembership.objects.filter(
+                group=OuterRef('pk'),
+                user=request.user,
+                is_active=True
+            )),
+            is_active=True
+        )
+    )
     
     serializer = GroupSerializer(groups, many=True, context={'request': request})
     return Response(serializer.data)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard(request):
+    """
+    Home screen summary: every group with role, member count, balance,
+    pending approvals and last activity. Cached per user until one of
+    their groups changes.
+    """
+    return Response(get_dashboard(request.user))
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def create_group(request):
     """Create a new group"""
     serializer = CreateGroupSerializer(data=request.data, context={'request': request})
@@ -50,7 +77,7 @@ def create_group(request):
 def get_group_details(request, group_id):
     """Get group details with members"""
     group = get_object_or_404(
-        Group,
+        with_group_stats(Group.objects.all()),
         id=group_id,
         memberships__user=request.user,
         memberships__is_active=True,
@@ -62,6 +89,7 @@ def get_group_details(request, group_id):
 
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def update_group(request, group_id):
     """Update group details (owner only)"""
     group = get_object_or_404(Group, id=group_id, is_active=True)
@@ -84,6 +112,7 @@ def update_group(request, group_id):
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def delete_group(request, group_id):
     """Delete group (owner only)"""
     group = get_object_or_404(Group, id=group_id, is_active=True)
@@ -102,6 +131,7 @@ def delete_group(request, group_id):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def add_members_to_group(request, group_id):
     group = get_object_or_404(Group, id=group_id, is_active=True)
     
@@ -159,7 +189,7 @@ def add_members_to_group(request, group_id):
                         else:
                             print(f"⚠️ {user.username} is already an active member")
                             processed_memberships.append(membership)
-                            
+                
                 except User.DoesNotExist:
                     print(f"❌ User with ID {user_id} does not exist")
                     continue
@@ -181,6 +211,7 @@ def add_members_to_group(request, group_id):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def remove_member_from_group(request, group_id):
     """Remove a member from the group"""
     group = get_object_or_404(Group, id=group_id, is_active=True)
@@ -248,6 +279,7 @@ def get_group_members(request, group_id):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def update_location_sharing(request, group_id):
     """Update user's location sharing preference for this group"""
     group = get_object_or_404(Group, id=group_id, is_active=True)
@@ -271,6 +303,192 @@ def update_location_sharing(request, group_id):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def ingest_locations(request, group_id):
+    """Ingest a batch of location fixes for the current user in this group"""
+    group = get_object_or_404(Group, id=group_id, is_active=True)
+    
+    membership = get_object_or_404(
+        GroupMembership,
+        group=group,
+        user=request.user,
+        is_active=True
+    )
+    
+    serializer = LocationBatchSerializer(data=request.data)
+    if serializer.is_valid():
+        result = LocationIngestService(membership).ingest(serializer.validated_data['fixes'])
+        latest = result['latest']
+        
+        return Response({
+            'success': True,
+            'accepted': result['accepted'],
+            'dropped': result['dropped'],
+            'latest_timestamp': latest.timestamp if latest else None,
+            'geofence_events': result['geofence_events']
+        })
+    
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_group_locations(request, group_id):
+    """Get the latest position of every member who shares their location"""
+    group = get_object_or_404(Group, id=group_id, is_active=True)
+    
+    membership = get_object_or_404(
+        GroupMembership,
+        group=group,
+        user=request.user,
+        is_active=True
+    )
+    
+    # Location sharing is reciprocal: you only see others while sharing yourself
+    if not membership.is_location_visible:
+        return Response(
+            {'error': 'Enable location sharing to see member locations.'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    locations = list(
+        LatestLocation.objects.filter(
+            group=group,
+            membership__is_active=True,
+            membership__is_location_visible=True
+        ).select_related('membership__user__profile').order_by('-timestamp')
+    )
+    
+    # Hash the serialized payload so any field change (avatar, accuracy, ...) busts the ETag
+    data = LatestLocationSerializer(locations, many=True).data
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    etag = quote_etag(hashlib.md5(payload.encode()).hexdigest())
+    
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def nearby_members(request, group_id):
+    """
+    Members closest to the current user's latest position.
+    ?k=5 returns the k nearest; ?radius=<meters> returns everyone within it.
+    """
+    group = get_object_or_404(Group, id=group_id, is_active=True)
+    
+    membership = get_object_or_404(
+        GroupMembership,
+        group=group,
+        user=request.user,
+        is_active=True
+    )
+    
+    if not membership.is_location_visible:
+        return Response(
+            {'error': 'Enable location sharing to see member locations.'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    origin = LatestLocation.objects.filter(membership=membership).first()
+    if origin is None:
+        return Response(
+            {'error': 'Your location is not known yet.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        k = min(max(int(request.GET.get('k', 5)), 1), 50)
+        radius = request.GET.get('radius')
+        radius = float(radius) if radius else None
+    except ValueError:
+        return Response(
+            {'error': 'k and radius must be numbers.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    service = ProximityService(group.id)
+    
+    if radius is not None:
+        nearby = service.members_within(origin.latitude, origin.longitude, radius, exclude=membership)
+    else:
+        nearest = service.nearest_members(membership, origin.latitude, origin.longitude, k)
+        # The grid is a per-process cache; re-check visibility against the rows
+        locations = LatestLocation.objects.filter(
+            membership_id__in=[key for _, key in nearest],
+            membership__is_active=True,
+            membership__is_location_visible=True
+        ).select_related('membership__user__profile').in_bulk()
+        nearby = [
+            (distance, locations[key]) for distance, key in nearest
+            if key in locations
+        ]
+    
+    return Response([
+        {
+            'user': UserSerializer(location.membership.user).data,
+            'distance_meters': round(distance, 1),
+            'latitude': location.latitude,
+            'longitude': location.longitude,
+            'timestamp': location.timestamp,
+        }
+        for distance, location in nearby
+    ])
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def group_geofences(request, group_id):
+    """List or create geofences for a group"""
+    group = get_object_or_404(Group, id=group_id, is_active=True)
+    
+    get_object_or_404(
+        GroupMembership,
+        group=group,
+        user=request.user,
+        is_active=True
+    )
+    
+    if request.method == 'GET':
+        geofences = Geofence.objects.filter(
+            group=group,
+            is_active=True
+        ).select_related('created_by__profile')
+        serializer = GeofenceSerializer(geofences, many=True)
+        return Response(serializer.data)
+    
+    serializer = GeofenceSerializer(data=request.data)
+    if serializer.is_valid():
+        serializer.save(group=group, created_by=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def delete_geofence(request, group_id, geofence_id):
+    """Deactivate a geofence (creator or group owner)"""
+    group = get_object_or_404(Group, id=group_id, is_active=True)
+    geofence = get_object_or_404(Geofence, id=geofence_id, group=group, is_active=True)
+    
+    if request.user != group.owner and geofence.created_by_id != request.user.id:
+        return Response(
+            {'error': 'Only the creator or group owner can delete this geofence.'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    geofence.is_active = False
+    geofence.save(update_fields=['is_active'])
+    
+    return Response({'message': 'Geofence deleted successfully.'})
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_group_invitations(request):
@@ -278,7 +496,7 @@ def get_group_invitations(request):
     invitations = GroupInvitation.objects.filter(
         invited_user=request.user,
         status='pending'
-    ).select_related('group', 'invited_by')
+    ).select_related('group__owner__profile', 'invited_by__profile')
     
     # Filter out expired invitations
     active_invitations = [inv for inv in invitations if not inv.is_expired]
@@ -288,6 +506,7 @@ def get_group_invitations(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def respond_to_invitation(request, invitation_id):
     """Accept or decline a group invitation"""
     invitation = get_object_or_404(
@@ -337,6 +556,7 @@ def respond_to_invitation(request, invitation_id):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def invite_to_group(request, group_id):
     """Invite users to a group"""
     group = get_object_or_404(Group, id=group_id, is_active=True)
@@ -391,7 +611,7 @@ def invite_to_group(request, group_id):
                     invited_user=user
                 )
                 invited_users.append(user.username)
-                
+            
             except User.DoesNotExist:
                 errors.append(f'User with ID {user_id} does not exist.')
     
@@ -0,0 +1,94 @@
+import random
+import statistics
+import string
+import time
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from api.models import hash_email
+from users.services.user_search import search_users_queryset
+
+User = get_user_model()
+
+SEED_PREFIX = 'bench_'
+
+class Command(BaseCommand):
+    help = "Time user search latency over synthetic users (seeded only with --allow-writes)"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000, help="Seeded users to ensure exist")
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--queries', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--explain', action='store_true', help="Print the query plan for one search")
+        parser.add_argument(
+            '--allow-writes', action='store_true',
+            help="Seed missing users into the configured database; without it the command only reads"
+        )
+        parser.add_argument('--cleanup', action='store_true', help="Delete seeded users and exit")
+    
+    def handle(self, *args, **options):
+        seeded = User.objects.filter(username__startswith=SEED_PREFIX)
+        
+        if options['cleanup']:
+            deleted, _ = seeded.delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} seeded rows"))
+            return
+        
+        existing = seeded.count()
+        if existing < options['users'] and not options['allow_writes']:
+            raise CommandError(
+                f"Only {existing} of {options['users']} seeded users exist in database "
+                f"'{connection.settings_dict['NAME']}'. Pass --allow-writes to seed the rest, "
+                f"or a smaller --users."
+            )
+        
+        rng = random.Random(options['seed'])
+        self.seed_users(existing, options['users'], options['batch_size'], rng)
+        
+        searcher = seeded.order_by('id').first()
+        terms = [self.random_term(rng) for _ in range(options['queries'])]
+        
+        if options['explain'] and connection.vendor == 'postgresql':
+            sql, params = search_users_queryset(terms[0], searcher).query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN ANALYZE {sql}", params)
+                for (line,) in cursor.fetchall():
+                    self.stdout.write(line)
+        
+        timings = []
+        for term in terms:
+            start = time.perf_counter()
+            list(search_users_queryset(term, searcher))
+            timings.append((time.perf_counter() - start) * 1000)
+        
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(f"Users in table: {User.objects.count()}")
+        self.stdout.write(
+            f"Search latency over {len(timings)} queries: "
+            f"p50 {statistics.median(timings):.1f} ms, p95 {p95:.1f} ms, max {timings[-1]:.1f} ms"
+        )
+    
+    def seed_users(self, existing, target, batch_size, rng):
+        if existing >= target:
+            return
+        
+        password = make_password(None)
+        start = time.perf_counter()
+        for offset in range(existing, target, batch_size):
+            batch = []
+            for index in range(offset, min(offset + batch_size, target)):
+                name = f"{SEED_PREFIX}{self.random_word(rng)}{index}"
+                email = f"{name}@example.com"
+                batch.append(User(username=name, email=email, email_hash=hash_email(email), password=password))
+            User.objects.bulk_create(batch, batch_size=batch_size)
+        
+        self.stdout.write(f"Seeded {target - existing} users in {time.perf_counter() - start:.1f} s")
+    
+    def random_word(self, rng):
+        return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 8)))
+    
+    def random_term(self, rng):
+        return ''.join(rng.choices(string.ascii_lowercase, k=3))
@@ -0,0 +1,65 @@
+# users/services/user_search.py
+
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, When, Value, IntegerField, Exists, OuterRef, Q
+from django.db.models.functions import Greatest, Least
+
+User = get_user_model()
+
+MAX_SEARCH_RESULTS = 20
+
+def search_users_queryset(query, searcher, exclude_friends=False, exclude_group_id=None, limit=MAX_SEARCH_RESULTS):
+    """
+    Users whose username or email contains the query, best matches first.
+    
+    The icontains filter compiles to UPPER(col) LIKE UPPER('%q%'), which the
+    pg_trgm GIN indexes on UPPER(username)/UPPER(email) serve directly.
+    Exact prefixes rank first, then trigram similarity.
+    """
+    from friends.models import FriendShip
+    from groups.models import GroupMembership
+    
+    users = User.objects.filter(
+        Q(username__icontains=query) | Q(email__icontains=query)
+    ).exclude(id=searcher.id).select_related('profile')
+    
+    if exclude_friends:
+        users = users.exclude(Exists(
+            FriendShip.objects.filter(
+                user_low_id=Least(Value(searcher.id), OuterRef('pk')),
+                user_high_id=Greatest(Value(searcher.id), OuterRef('pk')),
+                status='accepted'
+            )
+        ))
+    
+    if exclude_group_id:
+        users = users.exclude(Exists(
+            GroupMembership.objects.filter(
+                group_id=exclude_group_id,
+                user=OuterRef('pk'),
+                is_active=True
+            )
+        ))
+    
+    users = users.annotate(
+        prefix_match=Case(
+            When(username__istartswith=query, then=Value(2)),
+            When(email__istartswith=query, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    )
+    
+    if connection.vendor == 'postgresql':
+        users = users.annotate(
+            similarity=Greatest(
+                TrigramSimilarity('username', query),
+                TrigramSimilarity('email', query)
+            )
+        ).order_by('-prefix_match', '-similarity', 'username')
+    else:
+        users = users.order_by('-prefix_match', 'username')
+    
+    return users[:limit]
@@ -1,3 +1,45 @@
+import hashlib
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.models import hash_email
+from .views import ContactMatchThrottle
 
-# Create your tests here.
+User = get_user_model()
+
+def email_digest(email):
+    """What the app sends for a contact"""
+    return hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()
+
+class MatchContactsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('searcher', 'searcher@example.com')
+        self.friend = User.objects.create_user('friend', 'Friend@Example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def match(self, hashes):
+        return self.client.post('/api/users/contacts/match/', {'hashes': hashes}, format='json')
+    
+    def test_stored_hash_is_keyed(self):
+        self.assertNotEqual(self.friend.email_hash, email_digest('friend@example.com'))
+        self.assertEqual(self.friend.email_hash, hash_email(' friend@example.com'))
+    
+    def test_matches_report_position_not_hash(self):
+        response = self.match([email_digest('nobody@example.com'), email_digest(' FRIEND@example.com ')])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['id'], self.friend.id)
+        self.assertEqual(response.data[0]['index'], 1)
+        self.assertNotIn('hash', response.data[0])
+    
+    def test_matching_is_throttled(self):
+        limit, _ = ContactMatchThrottle().parse_rate(ContactMatchThrottle().get_rate())
+        for _ in range(limit):
+            self.assertEqual(self.match([email_digest('x@example.com')]).status_code, status.HTTP_200_OK)
+        
+        self.assertEqual(self.match([email_digest('x@example.com')]).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
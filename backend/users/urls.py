@@ -4,4 +4,5 @@ from django.urls import path
 
 urlpatterns = [
     path('search/', views.search_users, name='search_users'),
+    path('contacts/match/', views.match_contacts, name='match_contacts'),
 ]
@@ -1,16 +1,32 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.throttling import UserRateThrottle
+import re
+import uuid
 from django.contrib.auth import get_user_model
 from django.db.models import Q
+from api.models import contact_hash
+from friends.models import FriendShip
+from .services.user_search import search_users_queryset
 
 User = get_user_model()
 
+MAX_CONTACT_HASHES = 5000
+EMAIL_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+class ContactMatchThrottle(UserRateThrottle):
+    """Per-user limit on contact matching (REST_FRAMEWORK DEFAULT_THROTTLE_RATES)"""
+    scope = 'contact_match'
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def search_users(request):
-    """Search for users by username or email"""
+    """
+    Search for users by username or email.
+    ?exclude=friends drops accepted friends; ?exclude_group=<id> drops its members.
+    """
     query = request.GET.get('q', '').strip()
     
     if not query:
@@ -21,29 +37,94 @@ def search_users(request):
         return Response({'error': 'Search query must be at least 2 characters'}, 
                        status=status.HTTP_400_BAD_REQUEST)
     
-    # Search users by username or email (case insensitive)
-    # Exclude the current user from results
-    users = User.objects.filter(
-        Q(username__icontains=query) | Q(email__icontains=query)
-    ).exclude(id=request.user.id)[:20]  # Limit to 20 results
+    exclude = request.GET.get('exclude', '')
+    exclude_group_id = request.GET.get('exclude_group')
+    
+    if exclude_group_id:
+        try:
+            exclude_group_id = uuid.UUID(exclude_group_id)
+        except ValueError:
+            return Response({'error': 'exclude_group must be a valid group id'}, 
+                           status=status.HTTP_400_BAD_REQUEST)
+    
+    users = search_users_queryset(
+        query,
+        request.user,
+        exclude_friends=exclude == 'friends',
+        exclude_group_id=exclude_group_id
+    )
     
-    # Create simple user data
+    # Profiles come from select_related, so no extra query per result
     user_data = []
     for user in users:
-        user_info = {
+        profile = getattr(user, 'profile', None)
+        user_data.append({
             'id': user.id,
             'username': user.username,
             'email': user.email,
-            'avatar': None,
-        }
-        
-        # Add avatar if user has a profile with avatar
-        try:
-            if hasattr(user, 'profile') and user.profile.avatar:
-                user_info['avatar'] = user.profile.avatar.url
-        except Exception as e:
-            pass
-            
-        user_data.append(user_info)
+            'avatar': profile.avatar.url if profile and profile.avatar else None,
+        })
     
     return Response(user_data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([ContactMatchThrottle])
+def match_contacts(request):
+    """
+    Match address-book contacts against registered users.
+    Accepts {"hashes": [...]}: sha256 hex of each trimmed, lowercased email.
+    Each match carries the position of its hash in the request; hashes are
+    only used for the lookup and are never stored or returned.
+    """
+    hashes = request.data.get('hashes')
+    
+    if not isinstance(hashes, list) or not hashes:
+        return Response({'error': 'hashes must be a non-empty list'}, 
+                       status=status.HTTP_400_BAD_REQUEST)
+    
+    if len(hashes) > MAX_CONTACT_HASHES:
+        return Response({'error': f'At most {MAX_CONTACT_HASHES} hashes per request'}, 
+                       status=status.HTTP_400_BAD_REQUEST)
+    
+    hashes = [str(value).lower() for value in hashes]
+    if not all(EMAIL_HASH_RE.match(value) for value in hashes):
+        return Response({'error': 'Each hash must be a 64-character sha256 hex digest'}, 
+                       status=status.HTTP_400_BAD_REQUEST)
+    
+    # Stored hashes are keyed, so key the client's digests the same way
+    positions = {}
+    for index, value in enumerate(hashes):
+        positions.setdefault(contact_hash(value), index)
+    
+    # One index lookup for all hashes, profiles joined
+    users = list(
+        User.objects.filter(email_hash__in=list(positions), is_active=True)
+        .exclude(id=request.user.id)
+        .select_related('profile')
+    )
+    
+    user_ids = [user.id for user in users]
+    friendships = {}
+    for friendship in FriendShip.objects.filter(
+        Q(user_low=request.user, user_high_id__in=user_ids) |
+        Q(user_high=request.user, user_low_id__in=user_ids),
+        status__in=['pending', 'accepted']
+    ):
+        other_id = friendship.user_high_id if friendship.user_low_id == request.user.id else friendship.user_low_id
+        friendships[other_id] = friendship
+    
+    matches = []
+    for user in users:
+        profile = getattr(user, 'profile', None)
+        friendship = friendships.get(user.id)
+        matches.append({
+            'index': positions[user.email_hash],
+            'id': user.id,
+            'username': user.username,
+            'avatar': profile.avatar.url if profile and profile.avatar else None,
+            'status': friendship.relationship_for(request.user) if friendship else 'none',
+            'request_id': friendship.id if friendship and friendship.status == 'pending' else None,
+        })
+    
+    return Response(matches)